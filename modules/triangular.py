@@ -1,19 +1,238 @@
-from typing import List, Dict
-from .arbitrage_utils import calculate_profit
+from typing import List, Dict, Optional, Set, Tuple
+import logging
+import math
+import time
+
+Edge = Tuple[str, str]
+Cycle = Tuple[str, ...]
+
+
+class CurrencyGraph:
+    """
+    Graphe des devises d'un exchange.
+
+    Chaque marché BASE/QUOTE donne deux arêtes :
+    - BASE -> QUOTE (vente au bid), taux = bid * (1 - fee)
+    - QUOTE -> BASE (achat à l'ask), taux = (1 / ask) * (1 - fee)
+    Le poids d'une arête vaut -log(taux) : un cycle de poids négatif
+    est un cycle d'échanges rentable.
+    """
+
+    def __init__(self, fee: float = 0.001):
+        self.fee = fee
+        self.edges: Dict[Edge, Dict] = {}
+        self.adjacency: Dict[str, Set[str]] = {}
+        self.symbol_edges: Dict[str, Tuple[Edge, Edge]] = {}
+
+    def add_market(self, symbol: str, base: str, quote: str) -> None:
+        sell, buy = (base, quote), (quote, base)
+        self.edges[sell] = {'symbol': symbol, 'side': 'sell', 'rate': 0.0, 'weight': math.inf}
+        self.edges[buy] = {'symbol': symbol, 'side': 'buy', 'rate': 0.0, 'weight': math.inf}
+        self.adjacency.setdefault(base, set()).add(quote)
+        self.adjacency.setdefault(quote, set()).add(base)
+        self.symbol_edges[symbol] = (sell, buy)
+
+    def update_rate(self, symbol: str, bid: Optional[float], ask: Optional[float]) -> Tuple[Edge, ...]:
+        """Met à jour les deux arêtes d'un marché, retourne les arêtes modifiées"""
+        if symbol not in self.symbol_edges:
+            return ()
+        sell, buy = self.symbol_edges[symbol]
+        self._set_rate(sell, bid * (1 - self.fee) if bid and bid > 0 else 0.0)
+        self._set_rate(buy, (1 - self.fee) / ask if ask and ask > 0 else 0.0)
+        return sell, buy
+
+    def _set_rate(self, edge: Edge, rate: float) -> None:
+        data = self.edges[edge]
+        data['rate'] = rate
+        data['weight'] = -math.log(rate) if rate > 0 else math.inf
+
+    def weight(self, edge: Edge) -> float:
+        data = self.edges.get(edge)
+        return data['weight'] if data else math.inf
+
+    def triangles(self) -> List[Cycle]:
+        """Enumère les cycles orientés a -> b -> c -> a (une rotation par cycle)"""
+        cycles = []
+        for a in self.adjacency:
+            for b in self.adjacency[a]:
+                if b <= a:
+                    continue
+                for c in self.adjacency[b]:
+                    if c <= b:
+                        continue
+                    if a in self.adjacency[c]:
+                        cycles.append((a, b, c))
+        return cycles
+
+    def find_negative_cycle(self) -> Optional[Cycle]:
+        """
+        Bellman-Ford depuis une source virtuelle reliée à toutes les devises.
+        Retourne un cycle de poids négatif (toute longueur) ou None.
+        """
+        nodes = list(self.adjacency)
+        distance = {node: 0.0 for node in nodes}
+        predecessor: Dict[str, str] = {}
+        live_edges = [(u, v, data['weight']) for (u, v), data in self.edges.items()
+                      if data['weight'] != math.inf]
+
+        updated = None
+        for _ in range(len(nodes)):
+            updated = None
+            for u, v, w in live_edges:
+                if distance[u] + w < distance[v] - 1e-12:
+                    distance[v] = distance[u] + w
+                    predecessor[v] = u
+                    updated = v
+            if updated is None:
+                return None
+
+        # Remonter n fois garantit d'être dans le cycle
+        node = updated
+        for _ in range(len(nodes)):
+            node = predecessor[node]
+        cycle = [node]
+        current = predecessor[node]
+        while current != node:
+            cycle.append(current)
+            current = predecessor[current]
+        cycle.reverse()
+        return tuple(cycle)
+
 
 class TriangularArbitrage:
+    """
+    Moteur d'arbitrage triangulaire incrémental.
+
+    Les triangles de chaque exchange sont énumérés une fois au chargement
+    des marchés et indexés par arête. Une mise à jour de ticker ne
+    réévalue que les cycles qui passent par les arêtes du marché modifié,
+    au lieu de reconstruire tout le graphe à chaque tick.
+    """
+
     def __init__(self, config: Dict):
         self.config = config
-        self.min_profit = config.get('min_profit', 0.5)
+        self.min_profit = config.get('min_profit', 0.5)  # en %
+        self.fee = config.get('fee', 0.001)
+        self.logger = logging.getLogger(__name__)
+        self.graphs: Dict[str, CurrencyGraph] = {}
+        self.edge_cycles: Dict[str, Dict[Edge, List[Cycle]]] = {}
+        self.opportunities: Dict[str, Dict[Cycle, Dict]] = {}
+
+    def load_markets(self, exchange_id: str, markets: Dict[str, Dict]) -> int:
+        """
+        Construit le graphe d'un exchange depuis load_markets() de ccxt.
+        Retourne le nombre de cycles indexés.
+        """
+        graph = CurrencyGraph(fee=self.fee)
+        for symbol, market in markets.items():
+            if market.get('active') is False or market.get('spot') is False:
+                continue
+            base, quote = market.get('base'), market.get('quote')
+            if base and quote:
+                graph.add_market(symbol, base, quote)
+
+        index: Dict[Edge, List[Cycle]] = {}
+        for a, b, c in graph.triangles():
+            # Les deux sens de parcours sont deux cycles distincts
+            for cycle in ((a, b, c), (a, c, b)):
+                for edge in self._cycle_edges(cycle):
+                    index.setdefault(edge, []).append(cycle)
+
+        self.graphs[exchange_id] = graph
+        self.edge_cycles[exchange_id] = index
+        self.opportunities[exchange_id] = {}
+        cycle_count = len({cycle for cycles in index.values() for cycle in cycles})
+        self.logger.info(f"{exchange_id}: {len(graph.symbol_edges)} marchés, {cycle_count} cycles indexés")
+        return cycle_count
+
+    @staticmethod
+    def _cycle_edges(cycle: Cycle) -> List[Edge]:
+        return [(cycle[i], cycle[(i + 1) % len(cycle)]) for i in range(len(cycle))]
+
+    def update_ticker(self, exchange_id: str, symbol: str,
+                      bid: Optional[float], ask: Optional[float]) -> List[Dict]:
+        """
+        Applique un ticker et réévalue uniquement les cycles touchés.
+        Retourne les opportunités rentables parmi ces cycles.
+        """
+        graph = self.graphs.get(exchange_id)
+        if graph is None:
+            return []
+        touched: Set[Cycle] = set()
+        for edge in graph.update_rate(symbol, bid, ask):
+            touched.update(self.edge_cycles[exchange_id].get(edge, ()))
+        return self._evaluate_cycles(exchange_id, touched)
+
+    def update_tickers(self, exchange_id: str, tickers: Dict[str, Dict]) -> List[Dict]:
+        """Version groupée de update_ticker (ex: résultat de fetch_tickers)"""
+        graph = self.graphs.get(exchange_id)
+        if graph is None:
+            return []
+        touched: Set[Cycle] = set()
+        for symbol, ticker in tickers.items():
+            for edge in graph.update_rate(symbol, ticker.get('bid'), ticker.get('ask')):
+                touched.update(self.edge_cycles[exchange_id].get(edge, ()))
+        return self._evaluate_cycles(exchange_id, touched)
+
+    def _evaluate_cycles(self, exchange_id: str, cycles: Set[Cycle]) -> List[Dict]:
+        graph = self.graphs[exchange_id]
+        current = self.opportunities[exchange_id]
+        found = []
+        for cycle in cycles:
+            edges = self._cycle_edges(cycle)
+            weight = sum(graph.weight(edge) for edge in edges)
+            profit = (math.exp(-weight) - 1) * 100 if weight != math.inf else -100.0
+            if profit >= self.min_profit:
+                opportunity = self._build_opportunity(exchange_id, cycle, edges, profit)
+                current[cycle] = opportunity
+                found.append(opportunity)
+            else:
+                current.pop(cycle, None)
+        return sorted(found, key=lambda opp: opp['profit'], reverse=True)
+
+    def _build_opportunity(self, exchange_id: str, cycle: Cycle, edges: List[Edge], profit: float) -> Dict:
+        graph = self.graphs[exchange_id]
+        return {
+            'exchange': exchange_id,
+            'path': list(cycle) + [cycle[0]],
+            'symbols': [graph.edges[edge]['symbol'] for edge in edges],
+            'sides': [graph.edges[edge]['side'] for edge in edges],
+            'profit': profit,
+            'timestamp': time.time()
+        }
+
+    def find_negative_cycles(self, exchange_id: str) -> List[Dict]:
+        """
+        Recherche complète (Bellman-Ford) d'un cycle rentable de longueur
+        quelconque. Plus coûteux que le chemin incrémental : à réserver
+        aux balayages périodiques.
+        """
+        graph = self.graphs.get(exchange_id)
+        if graph is None:
+            return []
+        cycle = graph.find_negative_cycle()
+        if cycle is None:
+            return []
+        edges = self._cycle_edges(cycle)
+        weight = sum(graph.weight(edge) for edge in edges)
+        profit = (math.exp(-weight) - 1) * 100
+        if profit < self.min_profit:
+            return []
+        return [self._build_opportunity(exchange_id, cycle, edges, profit)]
 
-    async def find_opportunities(self, pairs: List[str]) -> List[Dict]:
+    async def find_opportunities(self, pairs: Optional[List[str]] = None) -> List[Dict]:
         """Trouve les opportunités d'arbitrage triangulaire"""
-        opportunities = []
-        # Votre logique existante ici
-        return [
-            opp for opp in opportunities 
-            if opp['profit'] >= self.min_profit
+        opportunities = [
+            opp
+            for current in self.opportunities.values()
+            for opp in current.values()
+            if pairs is None or set(opp['symbols']) <= set(pairs)
         ]
+        return sorted(
+            [opp for opp in opportunities if opp['profit'] >= self.min_profit],
+            key=lambda opp: opp['profit'],
+            reverse=True
+        )
 
 # Alias pour la rétrocompatibilité
 find_triangular_opportunities = TriangularArbitrage(config={}).find_opportunities
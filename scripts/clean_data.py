@@ -1,14 +1,38 @@
-import pandas as pd
+import argparse
+from pathlib import Path
+
+from src.data.cleaning import StreamingCleaner
+from src.data.market_store import MarketStore
+
+
+def clean_csv(input_file, symbol=None, timeframe=None, store_dir='data/store', chunksize=100_000):
+    """Nettoie un CSV en flux vers le store et écrit son rapport dans <store>/_reports/"""
+    cleaner = StreamingCleaner(MarketStore(store_dir), chunksize=chunksize)
+    report_path = Path(store_dir) / '_reports' / f"{Path(input_file).stem}.json"
+    report = cleaner.clean_file(input_file, symbol, timeframe, report_path)
+    print(f"✅ {Path(input_file).name} -> {report.symbol} {report.timeframe}: "
+          f"{report.rows_out}/{report.rows_in} lignes conservées")
+    dropped = {reason: count for reason, count in report.dropped.items() if count}
+    if dropped:
+        print(f"   Lignes rejetées : {dropped}")
+    if report.missing_candles:
+        print(f"   Bougies manquantes : {report.missing_candles}")
+    print(f"   Rapport : {report_path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='*', default=['data/historical/btc_usdt_1h.csv'])
+    parser.add_argument('--symbol', default=None, help="Déduit du nom de fichier par défaut")
+    parser.add_argument('--timeframe', default=None, help="Déduit du nom de fichier par défaut")
+    parser.add_argument('--store', default='data/store')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        clean_csv(path, args.symbol, args.timeframe, args.store, args.chunksize)
 
-def clean_csv(input_file, output_file):
-    df = pd.read_csv(input_file)
-    numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
-    df.to_csv(output_file, index=False)
 
 if __name__ == '__main__':
-    clean_csv(
-        'data/historical/btc_usdt_1h.csv',
-        'data/historical/btc_usdt_1h_clean.csv'
-    )
-    print("Nettoyage terminé. Fichier clean créé.")
+    main()
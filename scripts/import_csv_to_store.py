@@ -0,0 +1,30 @@
+import argparse
+from pathlib import Path
+
+from src.data.cleaning import infer_symbol_timeframe
+from src.data.market_store import MarketStore
+
+
+def import_directory(source='data/historical', store_dir='data/store'):
+    """Fusionne les CSV de bougies dans le store colonnaire (doublons de timestamp éliminés)"""
+    store = MarketStore(store_dir)
+    for path in sorted(Path(source).glob('*.csv')):
+        try:
+            symbol, timeframe = infer_symbol_timeframe(path)
+        except ValueError:
+            print(f"⚠️ Ignoré (nom non reconnu): {path.name}")
+            continue
+        rows = store.import_csv(path, symbol, timeframe)
+        print(f"✅ {path.name} -> {symbol} {timeframe} ({rows} lignes)")
+    return store.catalog()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default='data/historical')
+    parser.add_argument('--store', default='data/store')
+    args = parser.parse_args()
+
+    for symbol, timeframes in import_directory(args.source, args.store).items():
+        for timeframe, info in timeframes.items():
+            print(f"{symbol} {timeframe}: {info['rows']} lignes, {info['partitions']} partitions")
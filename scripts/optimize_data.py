@@ -1,3 +1,5 @@
-import pandas as pd
-df = pd.read_csv('data/historical/btc_usdt_1h_ultraclean.csv')
-df[['timestamp','open','high','low','close','volume']].to_csv('data/historical/btc_usdt_1h_optimized.csv', index=False)
+# Remplacé par scripts/clean_data.py (nettoyage en flux vers le store, rapports dans <store>/_reports/)
+from scripts.clean_data import main
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,23 @@ import argparse
 import logging
 from pathlib import Path
 
+from src.data.market_store import MarketStore
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def main(data_dir, epochs, batch_size, file_name='btc_usdc_1h_clean.csv'):
+def main(data_dir, epochs, batch_size, file_name=None, symbol='BTCUSDT', timeframe='1h',
+         store_dir='data/store', start=None, end=None):
     try:
-        # Chemin complet du fichier
-        file_path = Path(data_dir) / file_name
-
-        logger.info(f"Chargement des données depuis {file_path}")
-        data = read_csv(file_path)
+        if file_name:
+            # Chemin complet du fichier
+            file_path = Path(data_dir) / file_name
+            logger.info(f"Chargement des données depuis {file_path}")
+            data = read_csv(file_path)
+        else:
+            logger.info(f"Chargement de {symbol} {timeframe} depuis le store {store_dir}")
+            data = MarketStore(store_dir).read(symbol, timeframe, start, end)
 
         # [Votre logique d'entraînement ici...]
         logger.info(f"Données chargées avec succès. Shape: {data.shape}")
@@ -28,8 +34,14 @@ if __name__ == '__main__':
     parser.add_argument('--data-dir', default='data/historical')
     parser.add_argument('--epochs', type=int, default=10)
     parser.add_argument('--batch-size', type=int, default=32)
-    parser.add_argument('--file', default='btc_usdt_1h_clean.csv',
-                        help="Nom du fichier de données")
+    parser.add_argument('--file', default=None,
+                        help="Nom d'un fichier CSV (par défaut : lecture depuis le store)")
+    parser.add_argument('--store-dir', default='data/store')
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
     args = parser.parse_args()
 
-    main(args.data_dir, args.epochs, args.batch_size, args.file)
+    main(args.data_dir, args.epochs, args.batch_size, args.file, args.symbol, args.timeframe,
+         args.store_dir, args.start, args.end)
@@ -0,0 +1,179 @@
+"""
+Nettoyage en flux des CSV de bougies vers le store colonnaire, avec rapport de validation
+@author: Patmoorea
+"""
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+import json
+import logging
+import re
+import time
+import numpy as np
+import pandas as pd
+
+from .historical.kline_downloader import interval_ms
+from .market_store import MarketStore, normalize_frame
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+REQUIRED_COLUMNS = ['timestamp'] + PRICE_COLUMNS + ['volume']
+NA_VALUES = ['null', 'None', 'NaN', 'nan', ' ', '']
+# btc_usdt_1h.csv, btc_usdt_1h_clean.csv, BTCUSDT_1h.csv...
+CSV_NAME = re.compile(r'^(?P<base>[a-z0-9]+)_?(?P<quote>[a-z]*)_(?P<tf>\d+[mhdw])', re.IGNORECASE)
+
+
+def infer_symbol_timeframe(path: Union[str, Path]) -> Tuple[str, str]:
+    """'btc_usdt_1h_clean.csv' -> ('BTCUSDT', '1h')"""
+    match = CSV_NAME.match(Path(path).stem)
+    if not match:
+        raise ValueError(f"Symbole/timeframe non reconnus dans {Path(path).name}")
+    return (match['base'] + match['quote']).upper(), match['tf']
+
+
+def coerce_timestamps(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Timestamps (ms numériques ou dates texte) -> (int64 ms, masque des valeurs valides)"""
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        valid = np.isfinite(values)
+        return np.where(valid, values, 0).astype(np.int64), valid
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        numeric = pd.to_numeric(series, errors='coerce')
+        if numeric.notna().all():
+            return coerce_timestamps(numeric)
+        series = pd.to_datetime(series, errors='coerce', utc=True, format='mixed')
+    elif series.dt.tz is None:
+        series = series.dt.tz_localize('UTC')
+    valid = series.notna().to_numpy()
+    ms = series.dt.tz_convert(None).astype('datetime64[ms]').to_numpy().view(np.int64)
+    return np.where(valid, ms, 0), valid
+
+
+@dataclass
+class ValidationReport:
+    source: str
+    symbol: str
+    timeframe: str
+    rows_in: int = 0
+    rows_out: int = 0
+    chunks: int = 0
+    dropped: Dict[str, int] = field(default_factory=lambda: {
+        'invalid_timestamp': 0, 'missing_values': 0, 'duplicates': 0,
+        'ohlc_inconsistent': 0, 'negative_volume': 0
+    })
+    reordered: int = 0              # lignes conservées mais antérieures à une ligne déjà lue
+    missing_candles: int = 0        # bougies absentes dans le store entre première et dernière ligne
+    first_timestamp: Optional[int] = None
+    last_timestamp: Optional[int] = None
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class StreamingCleaner:
+    """
+    Lit un CSV par morceaux de chunksize lignes et, en une passe
+    vectorisée par morceau : conversion des types, suppression des
+    timestamps invalides, des valeurs manquantes et des doublons,
+    contrôle OHLC (low <= open/close <= high, high >= low) et
+    volume >= 0. Chaque morceau est trié par timestamp : un fichier en
+    ordre décroissant ou partiellement désordonné est conservé en entier
+    (lignes comptées dans reordered), et le MarketStore fusionne les
+    morceaux entre eux (un doublon entre deux morceaux non contigus y est
+    résolu, la dernière écriture gagne). La mémoire utilisée dépend de
+    chunksize, pas de la taille du fichier.
+    """
+
+    def __init__(self, store: MarketStore, chunksize: int = 100_000):
+        self.store = store
+        self.chunksize = chunksize
+        self.logger = logging.getLogger(__name__)
+
+    def _clean_chunk(self, chunk: pd.DataFrame, report: ValidationReport,
+                     state: Dict[str, Optional[int]]) -> Optional[Dict[str, np.ndarray]]:
+        missing = [name for name in REQUIRED_COLUMNS if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes dans {report.source}: {missing}")
+
+        ts, keep = coerce_timestamps(chunk['timestamp'])
+        report.dropped['invalid_timestamp'] += int((~keep).sum())
+        chunk = chunk.assign(timestamp=ts)[keep]
+        columns = normalize_frame(chunk)
+        ts = columns['timestamp']
+
+        o, h, l, c, v = (columns[name] for name in PRICE_COLUMNS + ['volume'])
+        finite = np.isfinite(o) & np.isfinite(h) & np.isfinite(l) & np.isfinite(c) & np.isfinite(v)
+        with np.errstate(invalid='ignore'):
+            consistent = (l <= np.minimum(o, c)) & (np.maximum(o, c) <= h)
+            volume_ok = v >= 0
+        report.dropped['missing_values'] += int((~finite).sum())
+        report.dropped['ohlc_inconsistent'] += int((finite & ~consistent).sum())
+        report.dropped['negative_volume'] += int((finite & consistent & ~volume_ok).sum())
+        valid = finite & consistent & volume_ok
+        columns = {name: values[valid] for name, values in columns.items()}
+        ts = columns['timestamp']
+
+        # Lignes antérieures au maximum déjà lu (morceaux précédents compris) :
+        # conservées, le tri les remet en place
+        previous = state['last']
+        running = np.maximum.accumulate(np.concatenate(
+            [[previous if previous is not None else np.iinfo(np.int64).min], ts]))[:-1]
+        report.reordered += int((ts < running).sum())
+
+        order = np.argsort(ts, kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+        ts = columns['timestamp']
+        # Doublons du morceau (première occurrence conservée) et répétition
+        # de la dernière ligne du morceau précédent
+        duplicate = np.append(False, ts[1:] == ts[:-1]) | (ts == previous)
+        report.dropped['duplicates'] += int(duplicate.sum())
+        columns = {name: values[~duplicate] for name, values in columns.items()}
+        ts = columns['timestamp']
+        if not len(ts):
+            return None
+
+        state['last'] = max(int(ts[-1]), previous) if previous is not None else int(ts[-1])
+        report.first_timestamp = min(int(ts[0]), report.first_timestamp) \
+            if report.first_timestamp is not None else int(ts[0])
+        report.last_timestamp = state['last']
+        return columns
+
+    def clean_file(self, path: Union[str, Path], symbol: Optional[str] = None,
+                   timeframe: Optional[str] = None,
+                   report_path: Optional[Union[str, Path]] = None) -> ValidationReport:
+        """Nettoie un CSV dans le store ; symbole/timeframe déduits du nom si absents"""
+        started = time.perf_counter()
+        if symbol is None or timeframe is None:
+            inferred_symbol, inferred_tf = infer_symbol_timeframe(path)
+            symbol, timeframe = symbol or inferred_symbol, timeframe or inferred_tf
+        report = ValidationReport(str(path), symbol, timeframe)
+        try:
+            step = interval_ms(timeframe)
+        except (KeyError, ValueError):
+            step = None
+        state: Dict[str, Optional[int]] = {'last': None, 'step': step}
+
+        for chunk in pd.read_csv(path, chunksize=self.chunksize, na_values=NA_VALUES):
+            report.chunks += 1
+            report.rows_in += len(chunk)
+            columns = self._clean_chunk(chunk, report, state)
+            if columns is not None:
+                report.rows_out += self.store.write(symbol, timeframe, columns)
+
+        if step and report.first_timestamp is not None:
+            # Compté sur le store après fusion : indépendant de l'ordre du fichier
+            stored = self.store.read_arrays(symbol, timeframe, report.first_timestamp,
+                                            report.last_timestamp + 1, columns=['timestamp'])
+            expected = (report.last_timestamp - report.first_timestamp) // step + 1
+            report.missing_candles = max(int(expected - len(stored['timestamp'])), 0)
+        report.elapsed = time.perf_counter() - started
+        if report_path is not None:
+            report.save(report_path)
+        self.logger.info(f"{Path(path).name}: {report.rows_out}/{report.rows_in} lignes conservées")
+        return report
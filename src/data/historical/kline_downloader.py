@@ -0,0 +1,275 @@
+"""
+Téléchargement parallèle et reprenable des klines historiques
+@author: Patmoorea
+"""
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+import asyncio
+import logging
+import random
+import time
+import numpy as np
+import pandas as pd
+
+BINANCE_KLINES_URL = 'https://api.binance.com/api/v3/klines'
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume',
+                 'close_time', 'quote_volume', 'trades',
+                 'taker_buy_volume', 'taker_buy_quote', 'ignore']
+FLOAT_COLUMNS = ['open', 'high', 'low', 'close', 'volume',
+                 'quote_volume', 'taker_buy_volume', 'taker_buy_quote']
+INTERVAL_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+PageFetcher = Callable[[str, str, int, int, int], Awaitable[Tuple[list, Dict]]]
+Sink = Callable[[str, str, pd.DataFrame], None]
+
+
+def interval_ms(interval: str) -> int:
+    return int(interval[:-1]) * INTERVAL_MS[interval[-1]]
+
+
+def klines_to_frame(rows: list) -> pd.DataFrame:
+    """Réponse /klines -> DataFrame typé (timestamp en datetime UTC, colonne 'ignore' retirée)"""
+    frame = pd.DataFrame([row[:11] for row in rows], columns=KLINE_COLUMNS[:11])
+    frame = frame.astype({'timestamp': np.int64, 'close_time': np.int64, 'trades': np.int64,
+                          **{c: np.float64 for c in FLOAT_COLUMNS}})
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='ms')
+    return frame
+
+
+class RateLimitError(ConnectionError):
+    """Réponse 418/429 : retry_after est le délai imposé par l'exchange (s)"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class KlineRequestError(ValueError):
+    """Réponse 4xx hors rate limit (symbole, intervalle ou paramètres invalides) : inutile de réessayer"""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class IncompleteDownloadError(ConnectionError):
+    """Des chunks restent manquants après tous les essais ; stats décrit le téléchargement"""
+
+    def __init__(self, message: str, stats: Dict[str, int]):
+        super().__init__(message)
+        self.stats = stats
+
+
+# Erreurs transitoires retentées : rate limit, 5xx et erreurs réseau
+RETRYABLE_ERRORS = (ConnectionError, OSError, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """
+    Seau à jetons partagé par toutes les requêtes (poids Binance par minute).
+    sync_used() recale le seau sur le poids consommé annoncé par l'exchange
+    (en-tête X-MBX-USED-WEIGHT-1M), qui inclut les autres clients.
+    """
+
+    def __init__(self, capacity: float = 6000, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, weight: float = 1) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+
+    def sync_used(self, used: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+class CsvChunkSink:
+    """Écrit chaque chunk dans son propre fichier (idempotent en cas de reprise)"""
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+
+    def __call__(self, symbol: str, interval: str, frame: pd.DataFrame) -> None:
+        if frame.empty:
+            return
+        target = self.directory / f"{symbol.lower()}_{interval}"
+        target.mkdir(parents=True, exist_ok=True)
+        start = int(frame['timestamp'].iloc[0].value // 1_000_000)
+        frame.to_csv(target / f"{start:013d}.csv", index=False)
+
+
+class KlineDownloader:
+    """
+    Découpe [start, end) en chunks d'une page (limit bougies) et les
+    télécharge en parallèle (concurrency) sous un TokenBucket commun.
+
+    Les chunks suivent une grille fixe (multiples de limit bougies depuis
+    l'epoch), indépendante de start : une même plage donne toujours les
+    mêmes chunks d'une exécution à l'autre ; le premier est demandé à
+    partir de start seulement. Chaque chunk terminé est passé au sink ;
+    s'il est complet et clos, il est consigné dans un fichier de
+    checkpoint (<symbole>_<interval>.done) : une exécution interrompue
+    reprend sans retélécharger les chunks déjà écrits, et un chunk tronqué
+    par start ou end est retéléchargé en entier plus tard. Rien n'est
+    accumulé en mémoire au-delà des chunks en vol.
+
+    Seuls les rate limits, les 5xx et les erreurs réseau sont retentés ;
+    une autre erreur 4xx interrompt le téléchargement (KlineRequestError)
+    et des chunks encore en échec à la fin lèvent IncompleteDownloadError.
+    """
+
+    def __init__(self,
+                 sink: Sink,
+                 checkpoint_dir: Union[str, Path] = 'data/historical/.checkpoints',
+                 concurrency: int = 8,
+                 bucket: Optional[TokenBucket] = None,
+                 request_weight: int = 2,
+                 limit: int = 1000,
+                 retries: int = 5,
+                 fetch_page: Optional[PageFetcher] = None):
+        self.sink = sink
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.concurrency = concurrency
+        self.bucket = bucket or TokenBucket()
+        self.request_weight = request_weight
+        self.limit = limit
+        self.retries = retries
+        self._fetch_page = fetch_page
+        self._session = None
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'chunks': 0, 'skipped': 0, 'rows': 0, 'retries': 0, 'failed': 0}
+
+    def _checkpoint(self, symbol: str, interval: str) -> Path:
+        return self.checkpoint_dir / f"{symbol}_{interval}.done"
+
+    def completed(self, symbol: str, interval: str) -> Set[int]:
+        path = self._checkpoint(symbol, interval)
+        if not path.exists():
+            return set()
+        with open(path) as f:
+            return {int(line) for line in f if line.strip()}
+
+    def _mark_done(self, symbol: str, interval: str, chunk_start: int) -> None:
+        with open(self._checkpoint(symbol, interval), 'a') as f:
+            f.write(f"{chunk_start}\n")
+
+    def span(self, interval: str) -> int:
+        """Durée d'un chunk complet (une page) en ms"""
+        return interval_ms(interval) * self.limit
+
+    def plan(self, interval: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Chunks [début, fin) en ms, alignés sur la grille des pages"""
+        span = self.span(interval)
+        first = start - start % span
+        return [(chunk, min(chunk + span, end)) for chunk in range(first, end, span)]
+
+    async def _binance_page(self, symbol: str, interval: str, start: int, end: int,
+                            limit: int) -> Tuple[list, Dict]:
+        import aiohttp
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        params = {'symbol': symbol, 'interval': interval, 'startTime': start,
+                  'endTime': end - 1, 'limit': limit}
+        try:
+            async with self._session.get(BINANCE_KLINES_URL, params=params) as response:
+                if response.status in (418, 429):
+                    retry_after = float(response.headers.get('Retry-After', 1))
+                    raise RateLimitError(f"Rate limit ({response.status}), attente {retry_after}s", retry_after)
+                if response.status >= 500:
+                    raise ConnectionError(f"Erreur serveur {response.status}")
+                if response.status >= 400:
+                    raise KlineRequestError(f"Requête refusée ({response.status}): {await response.text()}",
+                                            response.status)
+                return await response.json(), dict(response.headers)
+        except aiohttp.ClientError as e:
+            raise ConnectionError(f"Erreur réseau: {str(e)}") from e
+
+    async def _fetch_chunk(self, symbol: str, interval: str, start: int, end: int) -> pd.DataFrame:
+        fetch = self._fetch_page or self._binance_page
+        for attempt in range(self.retries):
+            await self.bucket.acquire(self.request_weight)
+            try:
+                rows, headers = await fetch(symbol, interval, start, end, self.limit)
+            except RETRYABLE_ERRORS as e:
+                self.stats['retries'] += 1
+                self.logger.warning(f"{symbol} {interval} chunk {start}: {str(e)} (essai {attempt + 1})")
+                # Un 418/429 impose d'attendre au moins Retry-After (sinon ban IP)
+                await asyncio.sleep(max(getattr(e, 'retry_after', 0.0),
+                                        random.uniform(0, min(30.0, 0.5 * 2 ** attempt))))
+                continue
+            used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('x-mbx-used-weight-1m')
+            if used is not None:
+                self.bucket.sync_used(float(used))
+            return klines_to_frame(rows)
+        raise ConnectionError(f"{symbol} {interval} chunk {start}: échec après {self.retries} essais")
+
+    async def download(self, symbols: Iterable[str], interval: str,
+                       start: int, end: Optional[int] = None) -> Dict[str, int]:
+        """
+        Télécharge [start, end) (ms) pour chaque symbole ; retourne les statistiques.
+        Lève IncompleteDownloadError si des chunks sont encore en échec.
+        """
+        end = end if end is not None else int(time.time() * 1000)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        closed_before = int(time.time() * 1000) - interval_ms(interval)
+        span = self.span(interval)
+
+        async def run_chunk(symbol: str, chunk_start: int, chunk_end: int):
+            # Le chunk reste identifié par son début sur la grille, mais rien
+            # n'est demandé (ni écrit) avant start
+            fetch_start = max(chunk_start, start)
+            async with semaphore:
+                try:
+                    frame = await self._fetch_chunk(symbol, interval, fetch_start, chunk_end)
+                except ConnectionError as e:
+                    self.stats['failed'] += 1
+                    self.logger.error(str(e))
+                    return
+            await asyncio.to_thread(self.sink, symbol, interval, frame)
+            # Un chunk tronqué par end ou qui recouvre la bougie en cours sera
+            # complété au prochain passage
+            if fetch_start == chunk_start and chunk_end - chunk_start == span and chunk_end <= closed_before:
+                self._mark_done(symbol, interval, chunk_start)
+            self.stats['chunks'] += 1
+            self.stats['rows'] += len(frame)
+
+        tasks = []
+        for symbol in symbols:
+            done = self.completed(symbol, interval)
+            for chunk_start, chunk_end in self.plan(interval, start, end):
+                if chunk_start in done:
+                    self.stats['skipped'] += 1
+                    continue
+                tasks.append(asyncio.ensure_future(run_chunk(symbol, chunk_start, chunk_end)))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Erreur non retentable : les autres chunks sont abandonnés
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+        if self.stats['failed']:
+            raise IncompleteDownloadError(
+                f"{self.stats['failed']} chunks {interval} en échec, relancer pour reprendre",
+                dict(self.stats))
+        return dict(self.stats)
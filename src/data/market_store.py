@@ -0,0 +1,396 @@
+"""
+Stockage colonnaire des bougies, partitionné par symbole / timeframe / mois
+@author: Patmoorea
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+from .historical.kline_downloader import interval_ms
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+FORMATS = ('npy', 'arrow')
+# Noms hérités des différents scripts de téléchargement -> schéma du store
+COLUMN_ALIASES = {'count': 'trades', 'taker_buy_base': 'taker_buy_volume'}
+DROPPED_COLUMNS = ('ignore',)
+INT_COLUMNS = ('timestamp', 'close_time', 'trades')
+
+Timestamp = Union[int, str, pd.Timestamp, np.datetime64]
+Interval = Tuple[int, int]
+
+
+def to_ms(value: Timestamp) -> int:
+    """Timestamp (ms, chaîne, datetime) -> ms depuis l'epoch UTC"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+def merge_intervals(intervals: Iterable[Sequence[int]]) -> List[Interval]:
+    """Union d'intervalles [début, fin), triée ; les intervalles contigus sont fusionnés"""
+    merged: List[List[int]] = []
+    for start, end in sorted((int(s), int(e)) for s, e in intervals if e > s):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(start: int, end: int, covered: Sequence[Interval]) -> List[Interval]:
+    """Sous-intervalles de [start, end) non couverts (covered trié et fusionné)"""
+    gaps = []
+    cursor = start
+    for lo, hi in covered:
+        if hi <= cursor:
+            continue
+        if lo >= end:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def contiguous_runs(ts: np.ndarray, step: int) -> List[Interval]:
+    """Plages [début, fin) des bougies consécutives (ts trié, sans doublon)"""
+    if not len(ts):
+        return []
+    breaks = np.flatnonzero(np.diff(ts) != step)
+    firsts = np.append(0, breaks + 1)
+    lasts = np.append(breaks, len(ts) - 1)
+    return [(int(ts[lo]), int(ts[hi]) + step) for lo, hi in zip(firsts, lasts)]
+
+
+def normalize_frame(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    DataFrame de bougies (CSV, klines_to_frame...) -> colonnes typées,
+    'timestamp' en int64 (ms), alias de colonnes résolus
+    """
+    frame = frame.rename(columns=COLUMN_ALIASES).drop(columns=list(DROPPED_COLUMNS), errors='ignore')
+    if 'timestamp' not in frame.columns:
+        raise ValueError("Colonne 'timestamp' manquante")
+    ts = frame['timestamp']
+    if pd.api.types.is_datetime64_any_dtype(ts):
+        ts = ts.astype('datetime64[ms]').astype(np.int64)
+    elif not pd.api.types.is_numeric_dtype(ts):
+        ts = pd.to_datetime(ts).astype('datetime64[ms]').astype(np.int64)
+    columns = {'timestamp': np.asarray(ts, dtype=np.int64)}
+    for name in frame.columns:
+        if name == 'timestamp':
+            continue
+        values = pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=np.float64)
+        # Une colonne entière incomplète reste en float (NaN)
+        integral = name in INT_COLUMNS and not np.isnan(values).any()
+        columns[name] = values.astype(np.int64) if integral else values
+    return columns
+
+
+class MarketStore:
+    """
+    Un dataset par (symbole, timeframe) : <root>/<SYMBOLE>/<tf>/ contient
+    une partition par mois et un index (_index.json : lignes, bornes
+    temporelles, format de chaque partition, schéma, et couverture :
+    intervalles [début, fin) déjà récupérés, vides compris).
+
+    Formats de partition :
+    - 'npy' (défaut, sans dépendance) : un fichier .npy par colonne, lu en
+      np.memmap ; seules les colonnes demandées sont ouvertes ;
+    - 'arrow' : fichier Arrow IPC mappé en mémoire (pyarrow requis).
+
+    read() élague les partitions via l'index puis localise [start, end)
+    par recherche dichotomique sur la colonne timestamp (triée), sans
+    lire les autres lignes. write() fusionne dans les partitions
+    existantes (dédoublonnage sur timestamp, la dernière écriture gagne)
+    et écrit chaque partition modifiée dans une nouvelle version
+    (<mois>.<version>) : la bascule se fait par réécriture atomique de
+    l'index, les versions précédentes ne sont supprimées qu'ensuite.
+
+    write(symbol, timeframe, frame) a la signature d'un sink de
+    KlineDownloader.
+    """
+
+    INDEX = '_index.json'
+
+    def __init__(self, root: Union[str, Path] = 'data/store', format: str = 'npy'):
+        if format not in FORMATS:
+            raise ValueError(f"Format inconnu: {format}")
+        if format == 'arrow' and pa is None:
+            raise ImportError("Le format 'arrow' nécessite pyarrow")
+        self.root = Path(root)
+        self.format = format
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    # ----- Catalogue -----
+
+    @staticmethod
+    def _key(symbol: str) -> str:
+        return symbol.replace('/', '').replace('-', '').upper()
+
+    def _dataset(self, symbol: str, timeframe: str) -> Path:
+        return self.root / self._key(symbol) / timeframe
+
+    def _lock(self, symbol: str, timeframe: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((self._key(symbol), timeframe), threading.Lock())
+
+    def index(self, symbol: str, timeframe: str) -> Dict[str, Any]:
+        path = self._dataset(symbol, timeframe) / self.INDEX
+        if not path.exists():
+            return {'columns': {}, 'partitions': {}, 'coverage': []}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_index(self, symbol: str, timeframe: str, index: Dict[str, Any]) -> None:
+        path = self._dataset(symbol, timeframe) / self.INDEX
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, path)
+
+    def symbols(self) -> List[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def timeframes(self, symbol: str) -> List[str]:
+        path = self.root / self._key(symbol)
+        if not path.exists():
+            return []
+        return sorted(p.name for p in path.iterdir() if (p / self.INDEX).exists())
+
+    def catalog(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{symbole: {timeframe: {rows, start, end, partitions, columns}}}"""
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for symbol in self.symbols():
+            for timeframe in self.timeframes(symbol):
+                index = self.index(symbol, timeframe)
+                parts = index['partitions'].values()
+                result.setdefault(symbol, {})[timeframe] = {
+                    'rows': sum(p['rows'] for p in parts),
+                    'start': min((p['t0'] for p in parts), default=None),
+                    'end': max((p['t1'] for p in parts), default=None),
+                    'partitions': len(parts),
+                    'columns': list(index['columns'])
+                }
+        return result
+
+    def coverage(self, symbol: str, timeframe: str) -> List[Interval]:
+        return [tuple(interval) for interval in self.index(symbol, timeframe).get('coverage', [])]
+
+    def missing(self, symbol: str, timeframe: str, start: Timestamp, end: Timestamp) -> List[Interval]:
+        """Sous-intervalles de [start, end) (ms) absents du store"""
+        return subtract_intervals(to_ms(start), to_ms(end), self.coverage(symbol, timeframe))
+
+    # ----- Partitions -----
+
+    def _partition_path(self, symbol: str, timeframe: str, month: str, fmt: str,
+                        version: Optional[int] = None) -> Path:
+        # Les entrées d'index sans version désignent l'ancien nommage (<mois>)
+        name = f"{month}.{version}" if version is not None else month
+        base = self._dataset(symbol, timeframe) / name
+        return base.with_name(name + '.arrow') if fmt == 'arrow' else base
+
+    def _entry_path(self, symbol: str, timeframe: str, month: str, entry: Dict[str, Any]) -> Path:
+        return self._partition_path(symbol, timeframe, month, entry['format'], entry.get('version'))
+
+    def _remove_stale_versions(self, symbol: str, timeframe: str, month: str, current: Path) -> None:
+        """Supprime les versions d'un mois autres que celle référencée par l'index"""
+        for path in self._dataset(symbol, timeframe).glob(f"{month}*"):
+            if path == current:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    def _load(self, path: Path, fmt: str, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        if fmt == 'arrow':
+            if pa is None:
+                raise ImportError(f"{path} est au format Arrow : pyarrow requis")
+            table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+            return {name: table.column(name).to_numpy() for name in columns if name in table.column_names}
+        return {name: np.load(path / f"{name}.npy", mmap_mode='r')
+                for name in columns if (path / f"{name}.npy").exists()}
+
+    def _store(self, path: Path, fmt: str, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Écrit une nouvelle version de partition (path n'est pas encore
+        référencé par l'index : un reste d'écriture interrompue est écrasé)
+        """
+        tmp = path.with_name(path.name + '.tmp')
+        if fmt == 'arrow':
+            table = pa.table(columns)
+            with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)
+            return
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name, values in columns.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(values))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _dedupe(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Tri stable sur timestamp ; à timestamp égal, la dernière ligne est conservée"""
+        order = np.argsort(columns['timestamp'], kind='stable')
+        ts = columns['timestamp'][order]
+        keep = order[np.append(ts[1:] != ts[:-1], True)]
+        return {name: values[keep] for name, values in columns.items()}
+
+    def _merge(self, existing: Dict[str, np.ndarray], new: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Les lignes nouvelles remplacent les anciennes de même timestamp ;
+        une colonne absente des nouvelles lignes garde sa valeur existante.
+        """
+        old_ts, new_ts = existing['timestamp'], new['timestamp']
+        pos = np.minimum(np.searchsorted(old_ts, new_ts), max(len(old_ts) - 1, 0))
+        matched = (old_ts[pos] == new_ts) if len(old_ts) else np.zeros(len(new_ts), dtype=bool)
+        merged = {}
+        for name in dict.fromkeys(list(existing) + list(new)):
+            old, fresh = existing.get(name), new.get(name)
+            if fresh is None:
+                fresh = np.full(len(new_ts), np.nan)
+                fresh[matched] = old[pos[matched]]
+                if matched.all():
+                    fresh = fresh.astype(old.dtype)
+            if old is None:
+                old = np.full(len(old_ts), np.nan)
+            if old.dtype != fresh.dtype:
+                old, fresh = old.astype(np.float64), fresh.astype(np.float64)
+            merged[name] = np.concatenate([old, fresh])
+        return self._dedupe(merged)
+
+    # ----- Écriture / lecture -----
+
+    def write(self, symbol: str, timeframe: str, frame: Union[pd.DataFrame, Dict[str, np.ndarray]],
+              covered: Optional[Tuple[Timestamp, Timestamp]] = None) -> int:
+        """
+        Fusionne des bougies dans le dataset, retourne le nombre de lignes reçues.
+
+        La couverture enregistrée est covered si fourni (plage demandée à
+        l'exchange, même sans données), sinon chaque suite de bougies
+        consécutives reçue : un trou dans les données reste manquant.
+        """
+        columns = normalize_frame(frame) if isinstance(frame, pd.DataFrame) else frame
+        ts = columns['timestamp']
+        if covered is None and not len(ts):
+            return 0
+        if len(ts):
+            columns = self._dedupe(columns)
+            ts = columns['timestamp']
+        if covered is not None:
+            spans = [(to_ms(covered[0]), to_ms(covered[1]))]
+        else:
+            try:
+                spans = contiguous_runs(ts, interval_ms(timeframe))
+            except (KeyError, ValueError):
+                spans = []              # Timeframe non standard : pas de couverture implicite
+        months = ts.astype('datetime64[ms]').astype('datetime64[M]')
+        starts = np.flatnonzero(np.append(True, months[1:] != months[:-1])) if len(ts) else np.empty(0, int)
+        bounds = np.append(starts, len(ts))
+
+        dataset = self._dataset(symbol, timeframe)
+        with self._lock(symbol, timeframe):
+            dataset.mkdir(parents=True, exist_ok=True)
+            index = self.index(symbol, timeframe)
+            written: Dict[str, Path] = {}
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                month = str(months[lo])
+                part = {name: values[lo:hi] for name, values in columns.items()}
+                entry = index['partitions'].get(month)
+                version = 1
+                if entry is not None:
+                    existing = self._load(self._entry_path(symbol, timeframe, month, entry),
+                                          entry['format'], list(index['columns']))
+                    part = self._merge(existing, part)
+                    del existing
+                    version = entry.get('version', 0) + 1
+                path = self._partition_path(symbol, timeframe, month, self.format, version)
+                self._store(path, self.format, part)
+                written[month] = path
+                index['partitions'][month] = {
+                    'rows': int(len(part['timestamp'])),
+                    't0': int(part['timestamp'][0]),
+                    't1': int(part['timestamp'][-1]),
+                    'format': self.format,
+                    'version': version
+                }
+                for name, values in part.items():
+                    index['columns'][name] = str(values.dtype)
+            index['partitions'] = dict(sorted(index['partitions'].items()))
+            index['coverage'] = [list(interval) for interval in
+                                 merge_intervals(index.get('coverage', []) + spans)]
+            self._save_index(symbol, timeframe, index)
+            # Bascule faite : les anciennes versions ne sont plus référencées
+            for month, path in written.items():
+                self._remove_stale_versions(symbol, timeframe, month, path)
+        return int(len(ts))
+
+    def read_arrays(self, symbol: str, timeframe: str,
+                    start: Optional[Timestamp] = None, end: Optional[Timestamp] = None,
+                    columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Colonnes de [start, end) en tableaux NumPy ('timestamp' en ms).
+        Pour une seule partition, les tableaux sont des vues sur les
+        fichiers mappés (aucune copie).
+        """
+        index = self.index(symbol, timeframe)
+        wanted = list(columns) if columns is not None else list(index['columns'])
+        unknown = [name for name in wanted if name not in index['columns']]
+        if unknown:
+            raise KeyError(f"Colonnes inconnues pour {symbol} {timeframe}: {unknown}")
+        load = wanted if 'timestamp' in wanted else ['timestamp'] + wanted
+        lo_ms = to_ms(start) if start is not None else None
+        hi_ms = to_ms(end) if end is not None else None
+
+        pieces: List[Dict[str, np.ndarray]] = []
+        for month in sorted(index['partitions']):
+            entry = index['partitions'][month]
+            if (lo_ms is not None and entry['t1'] < lo_ms) or (hi_ms is not None and entry['t0'] >= hi_ms):
+                continue
+            data = self._load(self._entry_path(symbol, timeframe, month, entry), entry['format'], load)
+            ts = data['timestamp']
+            lo = int(np.searchsorted(ts, lo_ms, 'left')) if lo_ms is not None else 0
+            hi = int(np.searchsorted(ts, hi_ms, 'left')) if hi_ms is not None else len(ts)
+            if hi > lo:
+                pieces.append({name: data[name][lo:hi] if name in data
+                               else np.full(hi - lo, np.nan) for name in wanted})
+
+        if not pieces:
+            return {name: np.empty(0, dtype=np.dtype(index['columns'][name])) for name in wanted}
+        if len(pieces) == 1:
+            return pieces[0]
+        return {name: np.concatenate([piece[name] for piece in pieces]) for name in wanted}
+
+    def read(self, symbol: str, timeframe: str,
+             start: Optional[Timestamp] = None, end: Optional[Timestamp] = None,
+             columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Comme read_arrays, en DataFrame avec 'timestamp' en datetime64"""
+        arrays = self.read_arrays(symbol, timeframe, start, end, columns)
+        if 'timestamp' in arrays:
+            arrays['timestamp'] = arrays['timestamp'].astype('datetime64[ms]')
+        return pd.DataFrame(arrays)
+
+    def import_csv(self, path: Union[str, Path], symbol: str, timeframe: str,
+                   chunksize: int = 500_000) -> int:
+        """Importe un CSV existant par morceaux, retourne le nombre de lignes"""
+        rows = 0
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            rows += self.write(symbol, timeframe, chunk)
+        return rows
@@ -0,0 +1,104 @@
+"""
+Rejeu déterministe et accéléré des flux enregistrés
+@author: Patmoorea
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import heapq
+import inspect
+import time
+
+from src.data_collection.ws_optimized import MultiplexedWSClient
+from .tick_recorder import Record
+
+Handler = Callable[[str, bytes, int], Any]      # (flux, message brut, timestamp µs)
+
+
+class ReplayEngine:
+    """
+    Relit des enregistrements (TickReader.read, listes de (ts, flux, message))
+    et les distribue dans l'ordre des timestamps aux handlers abonnés.
+
+    - speed=None : aussi vite que possible ; 1.0 : temps réel ; N : N× ;
+    - ordre déterministe : à timestamp égal, ordre des sources puis ordre
+      d'enregistrement dans la source (fusion k-voies stable) ;
+    - les handlers peuvent être synchrones ou des coroutines (attendues
+      avant l'événement suivant, comme le lecteur d'un socket live).
+    """
+
+    def __init__(self, sources: Sequence[Iterable[Record]], speed: Optional[float] = None):
+        if speed is not None and speed <= 0:
+            raise ValueError("speed doit être > 0 (None pour le mode le plus rapide)")
+        self.sources = sources
+        self.speed = speed
+        self.handlers: List[Tuple[Optional[frozenset], Handler]] = []
+        self.stats = {'events': 0, 'elapsed': 0.0, 'events_per_sec': 0.0, 'max_lag_ms': 0.0}
+
+    def subscribe(self, handler: Handler, streams: Optional[Iterable[str]] = None) -> None:
+        """handler(flux, message, ts) pour les flux donnés (tous par défaut)"""
+        self.handlers.append((frozenset(streams) if streams is not None else None, handler))
+
+    def events(self) -> Iterator[Record]:
+        """Fusion ordonnée de toutes les sources"""
+        def keyed(index: int, source: Iterable[Record]):
+            for seq, (ts, stream, payload) in enumerate(source):
+                yield ts, index, seq, stream, payload
+
+        merged = heapq.merge(*[keyed(i, source) for i, source in enumerate(self.sources)])
+        for ts, _, _, stream, payload in merged:
+            yield ts, stream, payload
+
+    async def run(self, limit: Optional[int] = None) -> Dict[str, float]:
+        """Rejoue les événements (au plus limit) et retourne les statistiques de débit"""
+        started = time.perf_counter()
+        first_ts = None
+        count = 0
+        max_lag = 0.0
+        for ts, stream, payload in self.events():
+            if limit is not None and count >= limit:
+                break
+            if self.speed is not None:
+                first_ts = ts if first_ts is None else first_ts
+                target = started + (ts - first_ts) / 1e6 / self.speed
+                delay = target - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            for streams, handler in self.handlers:
+                if streams is None or stream in streams:
+                    result = handler(stream, payload, ts)
+                    if inspect.isawaitable(result):
+                        await result
+            count += 1
+
+        elapsed = time.perf_counter() - started
+        self.stats = {
+            'events': count,
+            'elapsed': elapsed,
+            'events_per_sec': count / elapsed if elapsed > 0 else 0.0,
+            'max_lag_ms': max_lag * 1000
+        }
+        return self.stats
+
+
+class ReplayWSClient(MultiplexedWSClient):
+    """
+    Remplaçant de MultiplexedWSClient pour le rejeu : même API (subscribe,
+    get, stream, get_stats), mais run() injecte les messages enregistrés
+    via dispatch() au lieu d'ouvrir des connexions. Les files sont en mode
+    'block' par défaut pour un rejeu sans perte.
+    """
+
+    def __init__(self, sources: Sequence[Iterable[Record]], speed: Optional[float] = None,
+                 overflow: str = 'block', **kwargs):
+        super().__init__(overflow=overflow, **kwargs)
+        self.engine = ReplayEngine(sources, speed)
+        self.engine.subscribe(lambda stream, payload, ts: self.dispatch(payload))
+
+    async def run(self) -> None:
+        self._should_stop = False
+        await self.engine.run()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), 'replay': dict(self.engine.stats)}
@@ -0,0 +1,227 @@
+"""
+Enregistrement des messages bruts en segments LZ4 append-only avec index
+@author: Patmoorea
+"""
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import json
+import logging
+import queue
+import struct
+import threading
+import time
+
+from .compressors.lz4_handler import LZ4Compressor
+
+# Enregistrement : horodatage (µs), longueur du nom de flux, longueur du message
+RECORD_HEADER = struct.Struct('<qHI')
+
+Record = Tuple[int, str, bytes]
+
+
+def encode_block(records: Sequence[Record]) -> bytes:
+    parts = []
+    for ts, stream, payload in records:
+        name = stream.encode()
+        parts.append(RECORD_HEADER.pack(ts, len(name), len(payload)))
+        parts.append(name)
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def decode_block(data: bytes) -> Iterator[Record]:
+    pos = 0
+    view = memoryview(data)
+    while pos < len(data):
+        ts, name_len, payload_len = RECORD_HEADER.unpack_from(data, pos)
+        pos += RECORD_HEADER.size
+        stream = bytes(view[pos:pos + name_len]).decode()
+        pos += name_len
+        yield ts, stream, bytes(view[pos:pos + payload_len])
+        pos += payload_len
+
+
+class TickRecorder:
+    """
+    Capture sans perte des messages d'exchange.
+
+    record() est non bloquant : les messages sont accumulés en mémoire et
+    chaque lot (batch_size messages ou flush_interval secondes) est
+    compressé et écrit par un thread dédié, hors de la boucle asyncio.
+    Ce thread vide aussi périodiquement le lot en cours, si bien qu'un flux
+    devenu silencieux ne garde pas ses derniers messages en mémoire.
+
+    Chaque lot devient une frame LZ4 indépendante ajoutée au segment
+    courant ; une ligne d'index (<segment>.idx, JSON) décrit la frame :
+    bornes temporelles, offset, longueur et bornes par flux. Les segments
+    tournent au-delà de max_segment_bytes ou segment_seconds.
+    """
+
+    def __init__(self,
+                 directory: Union[str, Path],
+                 prefix: str = 'ticks',
+                 batch_size: int = 1000,
+                 flush_interval: float = 1.0,
+                 max_segment_bytes: int = 256 * 1024 * 1024,
+                 segment_seconds: float = 3600.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.segment_seconds = segment_seconds
+        self.compressor = LZ4Compressor()
+        self.logger = logging.getLogger(__name__)
+        self.stats = {'records': 0, 'blocks': 0, 'bytes_raw': 0, 'bytes_written': 0, 'segments': 0}
+
+        self._pending: List[Record] = []
+        self._pending_since = time.monotonic()
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._segment = None
+        self._index = None
+        self._segment_started = 0.0
+        self._writer = threading.Thread(target=self._write_loop, name='tick-recorder', daemon=True)
+        self._writer.start()
+
+    def record(self, stream: str, payload: Union[str, bytes], timestamp: Optional[int] = None) -> None:
+        """Ajoute un message brut (timestamp en µs, défaut : maintenant)"""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        ts = timestamp if timestamp is not None else time.time_ns() // 1000
+        with self._lock:
+            self._pending.append((ts, stream, payload))
+            if len(self._pending) >= self.batch_size or \
+                    time.monotonic() - self._pending_since >= self.flush_interval:
+                self._hand_off()
+
+    def _hand_off(self) -> None:
+        if self._pending:
+            self._queue.put(self._pending)
+            self._pending = []
+        self._pending_since = time.monotonic()
+
+    def flush(self, wait: bool = True) -> None:
+        """Envoie le lot en cours à l'écriture (et attend qu'il soit sur disque)"""
+        with self._lock:
+            self._hand_off()
+        if wait:
+            self._queue.join()
+
+    def close(self) -> None:
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _rotate(self, first_ts: int) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+        path = self.directory / f"{self.prefix}_{first_ts:016d}.lz4"
+        self._segment = open(path, 'ab')
+        self._index = open(path.with_suffix('.idx'), 'a')
+        self._segment_started = time.monotonic()
+        self.stats['segments'] += 1
+
+    def _flush_if_due(self) -> None:
+        with self._lock:
+            if self._pending and time.monotonic() - self._pending_since >= self.flush_interval:
+                self._hand_off()
+
+    def _write_loop(self) -> None:
+        poll = max(self.flush_interval / 2, 0.01)
+        while True:
+            try:
+                batch = self._queue.get(timeout=poll)
+            except queue.Empty:
+                self._flush_if_due()
+                continue
+            try:
+                if batch is None:
+                    if self._segment is not None:
+                        self._segment.close()
+                        self._index.close()
+                    return
+                self._write_block(batch)
+            except Exception as e:
+                self.logger.error(f"Écriture du lot de ticks échouée: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write_block(self, batch: List[Record]) -> None:
+        batch.sort(key=lambda record: record[0])
+        if self._segment is None or self._segment.tell() >= self.max_segment_bytes or \
+                time.monotonic() - self._segment_started >= self.segment_seconds:
+            self._rotate(batch[0][0])
+
+        raw = encode_block(batch)
+        frame = self.compressor.compress(raw)
+        offset = self._segment.tell()
+        self._segment.write(frame)
+        self._segment.flush()
+
+        streams: Dict[str, List[int]] = {}
+        for ts, stream, _ in batch:
+            bounds = streams.setdefault(stream, [ts, ts])
+            bounds[1] = ts
+        self._index.write(json.dumps({
+            't0': batch[0][0], 't1': batch[-1][0], 'offset': offset, 'length': len(frame),
+            'count': len(batch), 'streams': streams
+        }) + '\n')
+        self._index.flush()
+
+        self.stats['records'] += len(batch)
+        self.stats['blocks'] += 1
+        self.stats['bytes_raw'] += len(raw)
+        self.stats['bytes_written'] += len(frame)
+
+
+class TickReader:
+    """
+    Relecture des segments : seules les frames dont l'intervalle (et les
+    flux) recoupent la requête sont lues et décompressées, via l'index.
+    """
+
+    def __init__(self, directory: Union[str, Path], prefix: str = 'ticks'):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.compressor = LZ4Compressor()
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{self.prefix}_*.lz4"))
+
+    @staticmethod
+    def _entries(segment: Path) -> Iterator[Dict]:
+        index = segment.with_suffix('.idx')
+        if not index.exists():
+            return
+        with open(index) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read(self, start: Optional[int] = None, end: Optional[int] = None,
+             streams: Optional[Sequence[str]] = None) -> Iterator[Record]:
+        """(timestamp µs, flux, message brut) dans [start, end), par ordre chronologique"""
+        wanted = set(streams) if streams is not None else None
+        for segment in self.segments():
+            with open(segment, 'rb') as f:
+                for entry in self._entries(segment):
+                    if end is not None and entry['t0'] >= end:
+                        break
+                    if start is not None and entry['t1'] < start:
+                        continue
+                    if wanted is not None and not any(
+                            name in wanted and (start is None or t1 >= start) and (end is None or t0 < end)
+                            for name, (t0, t1) in entry['streams'].items()):
+                        continue
+                    f.seek(entry['offset'])
+                    block = self.compressor.decompress(f.read(entry['length']))
+                    for ts, stream, payload in decode_block(block):
+                        if start is not None and ts < start:
+                            continue
+                        if end is not None and ts >= end:
+                            break
+                        if wanted is None or stream in wanted:
+                            yield ts, stream, payload
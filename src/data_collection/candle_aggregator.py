@@ -0,0 +1,134 @@
+"""
+Agrégation incrémentale de bougies multi-timeframes depuis un flux de trades ou de klines 1m
+@author: Patmoorea
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+UNIT_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+MINUTE_MS = UNIT_MS['m']
+
+
+def timeframe_ms(timeframe: str) -> int:
+    """'15m' -> 900000"""
+    return int(timeframe[:-1]) * UNIT_MS[timeframe[-1]]
+
+
+def default_timeframes() -> List[str]:
+    """Timeframes de config/constants.py (Constants.TIMEFRAMES)"""
+    from config.constants import Constants
+    return list(Constants.TIMEFRAMES)
+
+
+@dataclass
+class Bar:
+    symbol: str
+    timeframe: str
+    open_time: int              # ms, aligné sur l'epoch UTC
+    close_time: int             # ms, exclusif
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0.0
+    quote_volume: float = 0.0
+    taker_buy_volume: float = 0.0
+    trades: int = 0
+    closed: bool = False
+
+    @property
+    def vwap(self) -> float:
+        return self.quote_volume / self.volume if self.volume else self.close
+
+
+class CandleAggregator:
+    """
+    Construit en O(timeframes) par événement les bougies de tous les
+    timeframes configurés à partir d'un unique flux (@trade ou @kline_1m).
+
+    on_close(bar) est appelé dès qu'une bougie est close :
+    - flux 1m : à l'arrivée de la kline 1m qui termine l'intervalle ;
+    - flux de trades : au premier trade de l'intervalle suivant, ou via
+      advance(now_ms) appelé sur un timer pour ne pas attendre ce trade.
+    """
+
+    def __init__(self, timeframes: Optional[Sequence[str]] = None,
+                 on_close: Optional[Callable[[Bar], None]] = None):
+        self.timeframes = list(timeframes or default_timeframes())
+        self._durations = [(tf, timeframe_ms(tf)) for tf in self.timeframes]
+        self.on_close = on_close
+        self.bars: Dict[Tuple[str, str], Bar] = {}       # (symbole, timeframe) -> bougie en cours
+
+    def current(self, symbol: str, timeframe: str) -> Optional[Bar]:
+        return self.bars.get((symbol, timeframe))
+
+    def _close(self, key: Tuple[str, str]) -> None:
+        bar = self.bars.pop(key)
+        bar.closed = True
+        if self.on_close is not None:
+            self.on_close(bar)
+
+    def _bar(self, symbol: str, timeframe: str, duration: int, ts: int, price: float) -> Bar:
+        key = (symbol, timeframe)
+        bar = self.bars.get(key)
+        if bar is not None and ts >= bar.close_time:
+            self._close(key)
+            bar = None
+        if bar is None:
+            open_time = ts - ts % duration
+            bar = self.bars[key] = Bar(symbol, timeframe, open_time, open_time + duration,
+                                       price, price, price, price)
+        return bar
+
+    def add_trade(self, symbol: str, price: float, qty: float, timestamp: int,
+                  buyer_is_maker: bool = False) -> None:
+        """Trade (format @trade : m=True si l'acheteur est maker, donc vente taker)"""
+        for timeframe, duration in self._durations:
+            bar = self._bar(symbol, timeframe, duration, timestamp, price)
+            if price > bar.high:
+                bar.high = price
+            if price < bar.low:
+                bar.low = price
+            bar.close = price
+            bar.volume += qty
+            bar.quote_volume += price * qty
+            if not buyer_is_maker:
+                bar.taker_buy_volume += qty
+            bar.trades += 1
+
+    def add_kline(self, symbol: str, open_time: int, open_: float, high: float, low: float,
+                  close: float, volume: float, quote_volume: float = 0.0,
+                  taker_buy_volume: float = 0.0, trades: int = 0) -> None:
+        """Kline 1m close ; la bougie supérieure se ferme avec sa dernière minute"""
+        end = open_time + MINUTE_MS
+        for timeframe, duration in self._durations:
+            bar = self._bar(symbol, timeframe, duration, open_time, open_)
+            bar.high = max(bar.high, high)
+            bar.low = min(bar.low, low)
+            bar.close = close
+            bar.volume += volume
+            bar.quote_volume += quote_volume or close * volume
+            bar.taker_buy_volume += taker_buy_volume
+            bar.trades += trades
+            if end >= bar.close_time:
+                self._close((symbol, timeframe))
+
+    def handle_message(self, message: Dict) -> None:
+        """Message Binance décodé (@trade, @aggTrade ou @kline_1m, klines closes uniquement)"""
+        message = message.get('data', message)
+        event = message.get('e')
+        if event in ('trade', 'aggTrade'):
+            self.add_trade(message['s'], float(message['p']), float(message['q']),
+                           message['T'], message.get('m', False))
+        elif event == 'kline' and message['k'].get('x') and message['k'].get('i', '1m') == '1m':
+            k = message['k']
+            self.add_kline(message['s'], k['t'], float(k['o']), float(k['h']), float(k['l']),
+                           float(k['c']), float(k['v']), float(k.get('q', 0)),
+                           float(k.get('V', 0)), k.get('n', 0))
+
+    def advance(self, now: int) -> int:
+        """Ferme les bougies dont l'intervalle est écoulé, retourne leur nombre"""
+        expired = [key for key, bar in self.bars.items() if now >= bar.close_time]
+        for key in expired:
+            self._close(key)
+        return len(expired)
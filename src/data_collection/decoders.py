@@ -0,0 +1,177 @@
+"""
+Décodage rapide des messages websocket vers des tableaux typés préalloués
+@author: Patmoorea
+"""
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    loads: Callable[[Any], Any] = orjson.loads
+except ImportError:
+    loads = json.loads
+
+KLINE_DTYPE = np.dtype([
+    ('symbol_id', np.int32), ('open_time', np.int64), ('close_time', np.int64),
+    ('open', np.float64), ('high', np.float64), ('low', np.float64), ('close', np.float64),
+    ('volume', np.float64), ('quote_volume', np.float64), ('trades', np.int64), ('closed', np.bool_)
+])
+TRADE_DTYPE = np.dtype([
+    ('symbol_id', np.int32), ('trade_id', np.int64), ('time', np.int64),
+    ('price', np.float64), ('qty', np.float64), ('buyer_maker', np.bool_)
+])
+DEPTH_DTYPE = np.dtype([
+    ('symbol_id', np.int32), ('event_time', np.int64), ('first_id', np.int64), ('final_id', np.int64),
+    ('side', np.int8), ('price', np.float64), ('qty', np.float64)    # side : 1 bid, -1 ask
+])
+
+
+class RecordBatch:
+    """Tableau structuré préalloué rempli ligne à ligne, converti en DataFrame au flush"""
+
+    def __init__(self, dtype: np.dtype, capacity: int):
+        self.rows = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size >= len(self.rows)
+
+    def view(self) -> np.ndarray:
+        return self.rows[:self.size]
+
+    def to_frame(self, symbols: List[str]) -> pd.DataFrame:
+        frame = pd.DataFrame(self.view())
+        frame.insert(0, 'symbol', pd.Categorical.from_codes(frame.pop('symbol_id'), categories=symbols))
+        self.size = 0
+        return frame
+
+
+class DecodeStats:
+    """Débit (messages/s) et histogramme des durées de décodage (µs)"""
+
+    BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.messages = 0
+        self.errors = 0
+        self.histogram = [0] * (len(self.BUCKETS_US) + 1)
+
+    def record(self, elapsed: float) -> None:
+        self.messages += 1
+        self.histogram[bisect_right(self.BUCKETS_US, elapsed * 1e6)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        labels = [f"<={b}us" for b in self.BUCKETS_US] + [f">{self.BUCKETS_US[-1]}us"]
+        return {
+            'messages': self.messages,
+            'errors': self.errors,
+            'messages_per_sec': self.messages / elapsed if elapsed > 0 else 0.0,
+            'decode_us_histogram': dict(zip(labels, self.histogram))
+        }
+
+
+class FastDecoder:
+    """
+    Décode les flux Binance (kline, trade/aggTrade, depthUpdate) directement
+    dans des lots typés préalloués : aucun DataFrame/Series par message,
+    symboles internés en entiers. Un lot plein est passé à on_batch
+    (kind, DataFrame) ; flush() vide les lots partiels. Un message est
+    entièrement parsé avant d'occuper des lignes : un message invalide
+    n'en laisse aucune.
+    """
+
+    def __init__(self, batch_size: int = 1024,
+                 on_batch: Optional[Callable[[str, pd.DataFrame], None]] = None):
+        self.batches = {
+            'kline': RecordBatch(KLINE_DTYPE, batch_size),
+            'trade': RecordBatch(TRADE_DTYPE, batch_size),
+            'depth': RecordBatch(DEPTH_DTYPE, batch_size)
+        }
+        self.on_batch = on_batch
+        self.symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+        self.stats = DecodeStats()
+
+    def _symbol_id(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def _append(self, kind: str, row: Tuple) -> None:
+        """Écrit une ligne déjà parsée ; la ligne n'est comptée qu'une fois écrite"""
+        batch = self.batches[kind]
+        if batch.full:
+            self._emit(kind)
+        batch.rows[batch.size] = row
+        batch.size += 1
+
+    def _emit(self, kind: str) -> Optional[pd.DataFrame]:
+        batch = self.batches[kind]
+        if not batch.size:
+            return None
+        frame = batch.to_frame(self.symbols)
+        if self.on_batch is not None:
+            self.on_batch(kind, frame)
+        return frame
+
+    def decode(self, raw: Any) -> Optional[str]:
+        """Décode un message (brut ou enveloppe combinée), retourne son type ou None"""
+        start = time.perf_counter()
+        try:
+            message = loads(raw) if isinstance(raw, (str, bytes)) else raw
+            message = message.get('data', message)
+            event = message.get('e')
+            if event == 'kline':
+                kind = self._decode_kline(message)
+            elif event in ('trade', 'aggTrade'):
+                kind = self._decode_trade(message)
+            elif event == 'depthUpdate':
+                kind = self._decode_depth(message)
+            else:
+                kind = None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.stats.errors += 1
+            return None
+        self.stats.record(time.perf_counter() - start)
+        return kind
+
+    def _decode_kline(self, message: Dict) -> str:
+        k = message['k']
+        row = (k['t'], k['T'], float(k['o']), float(k['h']), float(k['l']), float(k['c']),
+               float(k['v']), float(k.get('q', 0)), k.get('n', 0), k.get('x', False))
+        self._append('kline', (self._symbol_id(message['s']),) + row)
+        return 'kline'
+
+    def _decode_trade(self, message: Dict) -> str:
+        row = (message['t'] if 't' in message else message['a'],
+               message['T'], float(message['p']), float(message['q']), message.get('m', False))
+        self._append('trade', (self._symbol_id(message['s']),) + row)
+        return 'trade'
+
+    def _decode_depth(self, message: Dict) -> str:
+        header = (message['E'], message['U'], message['u'])
+        levels = [(side, float(price), float(qty))
+                  for side, side_levels in ((1, message['b']), (-1, message['a']))
+                  for price, qty in side_levels]
+        symbol_id = self._symbol_id(message['s'])
+        for level in levels:
+            self._append('depth', (symbol_id,) + header + level)
+        return 'depth'
+
+    def flush(self) -> Dict[str, pd.DataFrame]:
+        """Convertit les lots partiels en DataFrames (frontière de lot)"""
+        frames = {}
+        for kind in self.batches:
+            frame = self._emit(kind)
+            if frame is not None:
+                frames[kind] = frame
+        return frames
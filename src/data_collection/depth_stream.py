@@ -0,0 +1,338 @@
+"""
+Flux de profondeur websocket -> carnets L2 locaux
+@author: Patmoorea
+"""
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+import asyncio
+import json
+import logging
+import random
+import time
+
+from .order_book import BookGapError, LocalOrderBook, okx_checksum
+
+
+@dataclass
+class DepthEvent:
+    """Message de profondeur normalisé (snapshot ou diff)"""
+    native_symbol: str
+    kind: str                           # snapshot | diff
+    bids: List = field(default_factory=list)
+    asks: List = field(default_factory=list)
+    first_id: int = 0
+    final_id: int = 0
+    prev_id: Optional[int] = None
+    checksum: Optional[int] = None
+    timestamp: Optional[float] = None   # Horodatage exchange (s)
+
+
+class DepthAdapter:
+    """Protocole de profondeur d'un exchange (URL, abonnement, parsing)"""
+    name = ''
+    default_url = ''
+    rest_snapshot = False               # True : snapshot initial via REST
+    checksum_fn = None
+
+    def stream_url(self, base_url: str) -> str:
+        return base_url
+
+    def native(self, symbol: str) -> str:
+        return symbol.replace('/', '')
+
+    def subscribe_message(self, natives: Sequence[str]) -> Dict:
+        raise NotImplementedError
+
+    def unsubscribe_message(self, natives: Sequence[str]) -> Dict:
+        raise NotImplementedError
+
+    def parse(self, message: Dict) -> List[DepthEvent]:
+        raise NotImplementedError
+
+
+class BinanceDepthAdapter(DepthAdapter):
+    """
+    Binance spot : diffs <symbol>@depth@100ms (U/u), snapshot REST
+    (lastUpdateId, exposé par ccxt sous 'nonce').
+    """
+    name = 'binance'
+    default_url = 'wss://stream.binance.com:9443/ws'
+    rest_snapshot = True
+
+    def subscribe_message(self, natives):
+        return {'method': 'SUBSCRIBE', 'params': [f"{n.lower()}@depth@100ms" for n in natives],
+                'id': int(time.time() * 1000)}
+
+    def unsubscribe_message(self, natives):
+        return {'method': 'UNSUBSCRIBE', 'params': [f"{n.lower()}@depth@100ms" for n in natives],
+                'id': int(time.time() * 1000)}
+
+    def parse(self, message):
+        message = message.get('data', message)     # Flux combiné ou brut
+        if message.get('e') != 'depthUpdate':
+            return []
+        return [DepthEvent(message['s'], 'diff', message['b'], message['a'],
+                           first_id=message['U'], final_id=message['u'],
+                           timestamp=message['E'] / 1000)]
+
+
+class OkxDepthAdapter(DepthAdapter):
+    """
+    OKX canal 'books' : snapshot puis updates chaînés par prevSeqId/seqId,
+    checksum CRC32 des 25 meilleurs niveaux. La resynchronisation se fait
+    en se réabonnant (nouveau snapshot poussé par l'exchange).
+    """
+    name = 'okx'
+    default_url = 'wss://ws.okx.com:8443/ws/v5'
+    checksum_fn = staticmethod(okx_checksum)
+
+    def stream_url(self, base_url):
+        return base_url if base_url.endswith('/public') else f"{base_url}/public"
+
+    def native(self, symbol):
+        return symbol.replace('/', '-')
+
+    def subscribe_message(self, natives):
+        return {'op': 'subscribe', 'args': [{'channel': 'books', 'instId': n} for n in natives]}
+
+    def unsubscribe_message(self, natives):
+        return {'op': 'unsubscribe', 'args': [{'channel': 'books', 'instId': n} for n in natives]}
+
+    def parse(self, message):
+        arg = message.get('arg') or {}
+        if arg.get('channel') != 'books' or 'data' not in message:
+            return []
+        kind = 'snapshot' if message.get('action') == 'snapshot' else 'diff'
+        events = []
+        for data in message['data']:
+            seq_id = int(data['seqId'])
+            events.append(DepthEvent(
+                arg['instId'], kind, data.get('bids', []), data.get('asks', []),
+                first_id=seq_id, final_id=seq_id,
+                prev_id=int(data['prevSeqId']) if kind == 'diff' else None,
+                checksum=data.get('checksum'),
+                timestamp=int(data['ts']) / 1000 if data.get('ts') else None
+            ))
+        return events
+
+
+DEPTH_ADAPTERS = {
+    'binance': BinanceDepthAdapter,
+    'okx': OkxDepthAdapter
+}
+
+SnapshotFetcher = Callable[[str], Union[Dict, Awaitable[Dict]]]
+
+
+class DepthBookManager:
+    """
+    Maintient en mémoire les carnets L2 d'un exchange à partir de son flux
+    websocket de profondeur (URL lue dans config/exchanges.py).
+
+    - snapshot initial (REST ou poussé par l'exchange), puis diffs validés
+      par numéro de séquence et checksum ;
+    - sur trou détecté, resynchronisation du seul symbole concerné dans
+      une tâche séparée : la lecture du flux continue et les messages du
+      symbole reçus entre-temps sont mis de côté puis rejoués sur le
+      nouveau snapshot ; un snapshot en échec est retenté avec backoff
+      exponentiel jusqu'au succès (ou à l'arrêt) ;
+    - reconnexion automatique avec backoff.
+
+    get_order_book(symbol) a la même signature que BaseExchange : les
+    scanners lisent ainsi le book courant en mémoire au lieu du réseau.
+    """
+
+    def __init__(self,
+                 exchange: str,
+                 symbols: Sequence[str],
+                 snapshot_fetcher: Optional[SnapshotFetcher] = None,
+                 universe: Any = None,
+                 capacity: int = 1024,
+                 snapshot_depth: int = 1000,
+                 ws_url: Optional[str] = None,
+                 resync_base_delay: float = 0.5,
+                 resync_max_delay: float = 30.0):
+        if exchange not in DEPTH_ADAPTERS:
+            raise ValueError(f"Flux de profondeur non supporté pour {exchange}")
+        self.exchange = exchange
+        self.adapter: DepthAdapter = DEPTH_ADAPTERS[exchange]()
+        self.universe = universe
+        self.snapshot_depth = snapshot_depth
+        self.resync_base_delay = resync_base_delay
+        self.resync_max_delay = resync_max_delay
+        self.ws_url = self.adapter.stream_url(ws_url or self._configured_url())
+        self._snapshot_fetcher = snapshot_fetcher
+        self.logger = logging.getLogger(__name__)
+
+        self.books: Dict[str, LocalOrderBook] = {}
+        self._by_native: Dict[str, str] = {}
+        for symbol in symbols:
+            native = self._native(symbol)
+            self._by_native[native] = symbol
+            self.books[symbol] = LocalOrderBook(exchange, symbol, capacity, self.adapter.checksum_fn)
+
+        self.listeners: List[Callable[[str, str, LocalOrderBook], None]] = []
+        self._ws = None
+        self._should_stop = False
+        self._resync_tasks: Dict[str, asyncio.Task] = {}
+        self._pending: Dict[str, List[DepthEvent]] = {}
+
+    def _configured_url(self) -> str:
+        """URL websocket de config/exchanges.py (défaut de l'adapter si absente)"""
+        from config.exchanges import ExchangesConfig
+        return ExchangesConfig.get_exchange_config(self.exchange).get('ws_url') or self.adapter.default_url
+
+    def _native(self, symbol: str) -> str:
+        if self.universe is not None:
+            try:
+                return self.universe.to_native(self.exchange, symbol)
+            except KeyError:
+                pass
+        return self.adapter.native(symbol)
+
+    def add_listener(self, callback: Callable[[str, str, LocalOrderBook], None]) -> None:
+        """callback(exchange, symbole, book) après chaque mise à jour appliquée"""
+        self.listeners.append(callback)
+
+    def get_order_book(self, symbol: str, depth: Optional[int] = None) -> Dict:
+        book = self.books.get(symbol)
+        if book is None or not book.synced:
+            raise ConnectionError(f"Book {self.exchange} {symbol} non synchronisé")
+        return book.to_ccxt(depth)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        return {symbol: {**book.stats, 'synced': book.synced, 'last_update_id': book.last_update_id}
+                for symbol, book in self.books.items()}
+
+    async def _fetch_snapshot(self, symbol: str) -> Dict:
+        if self._snapshot_fetcher is None:
+            import ccxt
+            client = getattr(ccxt, self.exchange)({'enableRateLimit': True})
+            self._snapshot_fetcher = lambda sym: client.fetch_order_book(sym, self.snapshot_depth)
+        if asyncio.iscoroutinefunction(self._snapshot_fetcher):
+            return await self._snapshot_fetcher(symbol)
+        return await asyncio.to_thread(self._snapshot_fetcher, symbol)
+
+    async def resync(self, symbol: str) -> None:
+        """Recharge le book d'un symbole (snapshot REST ou réabonnement)"""
+        book = self.books[symbol]
+        book.synced = False
+        if not self.adapter.rest_snapshot:
+            if self._ws is not None:
+                natives = [self._native(symbol)]
+                await self._ws.send(json.dumps(self.adapter.unsubscribe_message(natives)))
+                await self._ws.send(json.dumps(self.adapter.subscribe_message(natives)))
+            return
+        snapshot = await self._fetch_snapshot(symbol)
+        ts = snapshot.get('timestamp')
+        book.apply_snapshot(snapshot['bids'], snapshot['asks'], int(snapshot['nonce']),
+                            ts / 1000 if ts else None)
+        self.logger.info(f"Book {self.exchange} {symbol} resynchronisé (id {book.last_update_id})")
+
+    def _apply_event(self, symbol: str, event: DepthEvent) -> None:
+        """Applique un événement ; sur trou, programme la resynchronisation"""
+        book = self.books[symbol]
+        if event.kind == 'snapshot':
+            book.apply_snapshot(event.bids, event.asks, event.final_id, event.timestamp)
+        elif not book.synced:
+            return                      # En attente du snapshot
+        else:
+            try:
+                if not book.apply_diff(event.first_id, event.final_id, event.bids, event.asks,
+                                       event.prev_id, event.checksum, event.timestamp):
+                    return
+            except BookGapError as e:
+                self.logger.warning(str(e))
+                self._schedule_resync(symbol)
+                return
+        for callback in self.listeners:
+            callback(self.exchange, symbol, book)
+
+    def _schedule_resync(self, symbol: str) -> None:
+        if symbol in self._resync_tasks:
+            return
+        self._pending[symbol] = []
+        self._resync_tasks[symbol] = asyncio.ensure_future(self._resync_and_replay(symbol))
+
+    async def _resync_and_replay(self, symbol: str) -> None:
+        """Resynchronise (avec retries) puis rejoue les messages reçus pendant le chargement"""
+        attempt = 0
+        try:
+            while not self._should_stop:
+                try:
+                    await self.resync(symbol)
+                    break
+                except Exception as e:
+                    delay = random.uniform(0, min(self.resync_max_delay,
+                                                  self.resync_base_delay * 2 ** attempt))
+                    self.logger.error(f"Resynchronisation {self.exchange} {symbol} échouée, "
+                                      f"nouvel essai dans {delay:.2f}s: {str(e)}")
+                    await asyncio.sleep(delay)
+                    # Messages reçus avant le prochain snapshot : antérieurs à celui-ci
+                    self._pending[symbol] = []
+                    attempt += 1
+        finally:
+            self._resync_tasks.pop(symbol, None)
+            pending = self._pending.pop(symbol, [])
+        # Les diffs antérieurs au snapshot sont ignorés comme périmés
+        for event in pending:
+            self._apply_event(symbol, event)
+
+    async def wait_resyncs(self) -> None:
+        """Attend la fin des resynchronisations en cours"""
+        while self._resync_tasks:
+            await asyncio.gather(*self._resync_tasks.values(), return_exceptions=True)
+
+    def _cancel_resyncs(self) -> None:
+        for task in self._resync_tasks.values():
+            task.cancel()
+        self._resync_tasks.clear()
+        self._pending.clear()
+
+    async def handle_message(self, message: Union[str, bytes, Dict]) -> None:
+        """Applique un message websocket aux books concernés"""
+        if not isinstance(message, dict):
+            message = json.loads(message)
+        for event in self.adapter.parse(message):
+            symbol = self._by_native.get(event.native_symbol)
+            if symbol is None:
+                continue
+            if symbol in self._pending:
+                self._pending[symbol].append(event)     # Resynchronisation en cours
+                continue
+            self._apply_event(symbol, event)
+
+    async def run(self, max_backoff: float = 30.0) -> None:
+        """Boucle de connexion : abonnement, snapshots, lecture, reconnexion"""
+        import websockets
+
+        attempt = 0
+        while not self._should_stop:
+            try:
+                async with websockets.connect(self.ws_url, max_size=None) as ws:
+                    self._ws = ws
+                    await ws.send(json.dumps(self.adapter.subscribe_message(list(self._by_native))))
+                    if self.adapter.rest_snapshot:
+                        # Les diffs reçus pendant le chargement restent dans le buffer
+                        # du websocket ; les plus anciens seront ignorés à la relecture
+                        await asyncio.gather(*[self.resync(symbol) for symbol in self.books])
+                    attempt = 0
+                    while not self._should_stop:
+                        try:
+                            message = await asyncio.wait_for(ws.recv(), timeout=1)
+                        except asyncio.TimeoutError:
+                            continue
+                        await self.handle_message(message)
+            except Exception as e:
+                self.logger.error(f"Flux de profondeur {self.exchange} interrompu: {str(e)}")
+            finally:
+                self._ws = None
+                self._cancel_resyncs()
+                for book in self.books.values():
+                    book.synced = False
+            if not self._should_stop:
+                await asyncio.sleep(random.uniform(0, min(max_backoff, 0.5 * 2 ** attempt)))
+                attempt += 1
+
+    def stop(self) -> None:
+        self._should_stop = True
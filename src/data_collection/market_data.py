@@ -1,59 +1,104 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
 import asyncio
+import time
 from ..exchanges.base_exchange import BaseExchange
+from ..utils.cache import TTLCache
+from ..data.market_store import MarketStore
+from ..data.historical.kline_downloader import interval_ms
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
 
 class MarketDataCollector:
-    def __init__(self, exchange: BaseExchange):
+    def __init__(self, exchange: BaseExchange, cache_size: int = 1024,
+                 cache_duration: timedelta = timedelta(minutes=5),
+                 store: Optional[MarketStore] = None, page_limit: int = 1000):
         self.exchange = exchange
+        # Store local : get_historical_data ne récupère que les plages manquantes
+        self.store = store
+        self.page_limit = page_limit
         self.logger = logging.getLogger(__name__)
-        self.cache = {}
-        self.cache_duration = timedelta(minutes=5)
+        self.cache_duration = cache_duration
+        # Les appels concurrents sur un même ticker partagent une seule requête
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_duration.total_seconds())
 
     async def get_ticker_data(self, symbol: str) -> Dict:
         cache_key = f"ticker_{symbol}"
-        
-        # Vérification du cache
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            if datetime.now() - timestamp < self.cache_duration:
-                return cached_data
 
         try:
-            ticker_data = await asyncio.to_thread(self.exchange.get_ticker, symbol)
-            self.cache[cache_key] = (ticker_data, datetime.now())
-            return ticker_data
+            return await self.cache.get_or_fetch(
+                cache_key, lambda: asyncio.to_thread(self.exchange.get_ticker, symbol)
+            )
         except Exception as e:
             self.logger.error(f"Erreur get_ticker_data: {str(e)}")
             raise
 
+    def get_cache_stats(self) -> Dict:
+        return self.cache.get_stats()
+
+    async def _fetch_range(self, symbol: str, timeframe: str, start: int, end: int) -> List[list]:
+        """
+        Bougies de [start, end) (ms), page par page (convention ccxt since/limit).
+        Une page plus courte que page_limit ne marque pas la fin : beaucoup
+        d'exchanges plafonnent leurs pages plus bas (OKX, Kraken...) ; seule
+        une page vide ou la fin de la plage arrête la pagination.
+        """
+        step = interval_ms(timeframe)
+        rows: List[list] = []
+        since = start
+        while since < end:
+            page = await asyncio.to_thread(self.exchange.fetch_ohlcv, symbol, timeframe, since, self.page_limit)
+            if not page or page[-1][0] < since:
+                break
+            rows.extend(row for row in page if since <= row[0] < end)
+            since = page[-1][0] + step
+        return rows
+
+    async def sync_history(self, symbol: str, timeframe: str,
+                           start_time: datetime, end_time: datetime) -> Dict[str, int]:
+        """
+        Complète le store sur [start_time, end_time) : seules les plages
+        absentes de sa couverture sont demandées à l'exchange, puis
+        fusionnées (dédoublonnage sur timestamp, remplacement atomique des
+        partitions). La couverture enregistrée s'arrête après la dernière
+        bougie effectivement reçue ; la bougie en cours n'est pas marquée
+        comme couverte.
+        """
+        start = int(start_time.timestamp() * 1000)
+        end = int(end_time.timestamp() * 1000)
+        now = int(time.time() * 1000)
+        step = interval_ms(timeframe)
+        closed_end = now - now % step
+        stats = {'gaps': 0, 'rows': 0}
+
+        for gap_start, gap_end in self.store.missing(symbol, timeframe, start, end):
+            rows = await self._fetch_range(symbol, timeframe, gap_start, gap_end)
+            frame = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+            received_end = rows[-1][0] + step if rows else gap_start
+            covered = (gap_start, max(gap_start, min(received_end, gap_end, closed_end)))
+            await asyncio.to_thread(self.store.write, symbol, timeframe, frame, covered)
+            stats['gaps'] += 1
+            stats['rows'] += len(rows)
+        if stats['gaps']:
+            self.logger.info(f"{symbol} {timeframe}: {stats['gaps']} plages complétées ({stats['rows']} bougies)")
+        return stats
+
     async def get_historical_data(self, symbol: str, timeframe: str, 
                                 start_time: datetime, end_time: datetime) -> pd.DataFrame:
         try:
-            # Conversion des paramètres pour l'API
-            params = {
-                'symbol': symbol,
-                'interval': timeframe,
-                'start': int(start_time.timestamp() * 1000),
-                'end': int(end_time.timestamp() * 1000)
-            }
-
-            # Récupération des données historiques
-            historical_data = await asyncio.to_thread(
-                self.exchange.fetch_ohlcv,
-                symbol,
-                timeframe,
-                params['start'],
-                params['end']
-            )
+            start = int(start_time.timestamp() * 1000)
+            end = int(end_time.timestamp() * 1000)
+            if self.store is not None:
+                await self.sync_history(symbol, timeframe, start_time, end_time)
+                df = await asyncio.to_thread(self.store.read, symbol, timeframe, start, end, OHLCV_COLUMNS)
+            else:
+                rows = await self._fetch_range(symbol, timeframe, start, end)
+                df = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
 
-            # Conversion en DataFrame
-            df = pd.DataFrame(historical_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
             df.set_index('timestamp', inplace=True)
-            
             return df
 
         except Exception as e:
@@ -67,3 +112,11 @@ class MarketDataCollector:
         except Exception as e:
             self.logger.error(f"Erreur save_to_csv: {str(e)}")
             raise
+
+    def save_to_store(self, data: pd.DataFrame, symbol: str, timeframe: str) -> int:
+        """Fusionne les bougies (index timestamp) dans le store au lieu d'écraser un fichier"""
+        if self.store is None:
+            raise ValueError("Aucun store configuré")
+        rows = self.store.write(symbol, timeframe, data.reset_index())
+        self.logger.info(f"{rows} bougies fusionnées dans le store ({symbol} {timeframe})")
+        return rows
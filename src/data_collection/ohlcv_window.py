@@ -0,0 +1,151 @@
+"""
+Fenêtre OHLCV à taille fixe sur buffers circulaires NumPy
+@author: Patmoorea
+"""
+from typing import Dict, Optional
+import math
+import numpy as np
+import pandas as pd
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class IncrementalIndicator:
+    """
+    Indicateur mis à jour en O(1) à chaque tick.
+
+    update(window, new_bar) est appelé après chaque écriture : new_bar=True
+    quand une bougie vient d'être ouverte (l'état de la précédente est
+    alors figé), False quand la bougie courante est modifiée. value est la
+    valeur provisoire calculée sur la bougie courante, NaN tant que
+    l'indicateur est en amorçage (ready est alors False).
+    """
+    value: float = math.nan
+
+    @property
+    def ready(self) -> bool:
+        return not math.isnan(self.value)
+
+    def update(self, window: 'OHLCVWindow', new_bar: bool) -> None:
+        raise NotImplementedError
+
+
+class EMA(IncrementalIndicator):
+    def __init__(self, period: int, field: str = 'close'):
+        self.alpha = 2 / (period + 1)
+        self.field = field
+        self._committed: Optional[float] = None
+        self.value = math.nan
+
+    def update(self, window, new_bar):
+        if new_bar and not math.isnan(self.value):
+            self._committed = self.value
+        x = window.last(self.field)
+        self.value = x if self._committed is None else \
+            self._committed + self.alpha * (x - self._committed)
+
+
+class RSI(IncrementalIndicator):
+    """RSI de Wilder (moyenne simple pendant l'amorçage puis lissage 1/period)"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._count = 0                 # Deltas figés
+        self._prev_close: Optional[float] = None
+        self._pending = None            # (avg_gain, avg_loss) provisoires de la bougie courante
+        self.value = math.nan
+
+    def update(self, window, new_bar):
+        close = window.last('close')
+        if new_bar:
+            if self._pending is not None:
+                self._avg_gain, self._avg_loss = self._pending
+                self._count += 1
+            self._prev_close = window.last('close', 1) if len(window) > 1 else None
+        if self._prev_close is None:
+            return
+        delta = close - self._prev_close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        n = min(self._count + 1, self.period)
+        avg_gain = self._avg_gain + (gain - self._avg_gain) / n
+        avg_loss = self._avg_loss + (loss - self._avg_loss) / n
+        self._pending = (avg_gain, avg_loss)
+        if self._count + 1 < self.period:
+            self.value = math.nan
+        elif avg_loss == 0:
+            self.value = 100.0 if avg_gain > 0 else 50.0
+        else:
+            self.value = 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+class OHLCVWindow:
+    """
+    Les `capacity` dernières bougies, un buffer NumPy contigu par champ.
+
+    Chaque valeur est écrite deux fois (i et i + capacity) dans un buffer
+    de 2 * capacity : la fenêtre ordonnée de la plus ancienne à la plus
+    récente est donc toujours une tranche contiguë, renvoyée sans copie
+    par view(). Aucune allocation par tick.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._data = {field: np.zeros(2 * capacity, dtype=np.float64) for field in FIELDS}
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._head = 0          # Position de la prochaine écriture (modulo capacity)
+        self.size = 0
+        self.indicators: Dict[str, IncrementalIndicator] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add_indicator(self, name: str, indicator: IncrementalIndicator) -> IncrementalIndicator:
+        """Branche un indicateur incrémental, mis à jour à chaque tick"""
+        self.indicators[name] = indicator
+        return indicator
+
+    def _write(self, slot: int, timestamp: int, values) -> None:
+        for field, value in zip(FIELDS, values):
+            buffer = self._data[field]
+            buffer[slot] = value
+            buffer[slot + self.capacity] = value
+        self._times[slot] = self._times[slot + self.capacity] = timestamp
+
+    def update(self, timestamp: int, open_: float, high: float, low: float,
+               close: float, volume: float) -> bool:
+        """
+        Écrit une bougie : remplace la dernière si timestamp (ouverture) est
+        identique, sinon en ajoute une. Retourne True pour une nouvelle bougie.
+        """
+        values = (open_, high, low, close, volume)
+        last_slot = (self._head - 1) % self.capacity
+        new_bar = not self.size or int(self._times[last_slot]) != timestamp
+        if new_bar:
+            self._write(self._head, timestamp, values)
+            self._head = (self._head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        else:
+            self._write(last_slot, timestamp, values)
+        for indicator in self.indicators.values():
+            indicator.update(self, new_bar)
+        return new_bar
+
+    def _start(self) -> int:
+        return (self._head - self.size) % self.capacity
+
+    def view(self, field: str) -> np.ndarray:
+        """Série ordonnée (ancienne -> récente), vue sans copie"""
+        start = self._start()
+        source = self._times if field == 'timestamp' else self._data[field]
+        return source[start:start + self.size]
+
+    def last(self, field: str, offset: int = 0) -> float:
+        """Valeur de la bougie la plus récente (offset=1 : la précédente)"""
+        return float(self._data[field][(self._head - 1 - offset) % self.capacity])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Copie en DataFrame, pour les calculs complets hors du chemin par tick"""
+        return pd.DataFrame({field: self.view(field) for field in FIELDS},
+                            index=pd.to_datetime(self.view('timestamp'), unit='ms'))
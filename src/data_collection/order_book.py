@@ -0,0 +1,239 @@
+"""
+Carnet d'ordres L2 local alimenté par diffs websocket
+@author: Patmoorea
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import time
+import zlib
+import numpy as np
+
+Level = Sequence  # [prix, quantité] (nombres ou chaînes)
+
+
+class BookGapError(Exception):
+    """Trou de séquence ou checksum invalide : le book doit être resynchronisé"""
+
+
+class BookSide:
+    """
+    Un côté du carnet dans des tableaux NumPy triés.
+
+    Les niveaux sont rangés pour que le meilleur prix soit en fin de
+    tableau (bids croissants, asks décroissants) : la recherche d'un prix
+    est O(log n) (searchsorted) et les insertions/suppressions ne décalent
+    que les niveaux situés entre le prix modifié et le meilleur prix, ce
+    qui reste court pour le flux de diffs concentré près du spread.
+    top(n) renvoie des vues sur les tableaux, sans copie.
+    """
+
+    def __init__(self, is_bid: bool, capacity: int = 1024, keep_raw: bool = False):
+        self.is_bid = is_bid
+        self.sign = 1.0 if is_bid else -1.0
+        self._keys = np.empty(capacity, dtype=np.float64)     # sign * prix, croissant
+        self._prices = np.empty(capacity, dtype=np.float64)
+        self._sizes = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        # Chaînes d'origine (prix -> (prix, quantité)) pour les checksums exchange
+        self.raw: Optional[Dict[float, Tuple[str, str]]] = {} if keep_raw else None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def clear(self) -> None:
+        self.size = 0
+        if self.raw is not None:
+            self.raw.clear()
+
+    def _grow(self) -> None:
+        capacity = len(self._keys) * 2
+        for name in ('_keys', '_prices', '_sizes'):
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+
+    def update(self, price: float, size: float, raw: Optional[Tuple[str, str]] = None) -> None:
+        """Met à jour un niveau ; une quantité nulle supprime le niveau"""
+        key = self.sign * price
+        n = self.size
+        i = int(np.searchsorted(self._keys[:n], key))
+        exists = i < n and self._keys[i] == key
+
+        if size == 0:
+            if exists:
+                self._keys[i:n - 1] = self._keys[i + 1:n]
+                self._prices[i:n - 1] = self._prices[i + 1:n]
+                self._sizes[i:n - 1] = self._sizes[i + 1:n]
+                self.size -= 1
+                if self.raw is not None:
+                    self.raw.pop(price, None)
+            return
+
+        if exists:
+            self._sizes[i] = size
+        else:
+            if n == len(self._keys):
+                self._grow()
+            self._keys[i + 1:n + 1] = self._keys[i:n]
+            self._prices[i + 1:n + 1] = self._prices[i:n]
+            self._sizes[i + 1:n + 1] = self._sizes[i:n]
+            self._keys[i] = key
+            self._prices[i] = price
+            self._sizes[i] = size
+            self.size += 1
+        if self.raw is not None and raw is not None:
+            self.raw[price] = raw
+
+    def load(self, levels: Iterable[Level]) -> None:
+        """Remplace tout le côté (snapshot)"""
+        self.clear()
+        for price, size, *_ in levels:
+            self.update(float(price), float(size), (str(price), str(size)))
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self.size:
+            return None
+        return float(self._prices[self.size - 1]), float(self._sizes[self.size - 1])
+
+    def top(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(prix, quantités) des n meilleurs niveaux, du meilleur au pire (vues)"""
+        n = self.size if n is None else min(n, self.size)
+        if n <= 0:
+            return self._prices[:0], self._sizes[:0]
+        start = self.size - n
+        stop = start - 1 if start > 0 else None
+        return (self._prices[self.size - 1:stop:-1],
+                self._sizes[self.size - 1:stop:-1])
+
+    def levels(self, n: Optional[int] = None) -> List[List[float]]:
+        prices, sizes = self.top(n)
+        return np.column_stack((prices, sizes)).tolist()
+
+    def raw_levels(self, n: int) -> List[Tuple[str, str]]:
+        prices, _ = self.top(n)
+        return [self.raw[float(price)] for price in prices]
+
+
+def okx_checksum(book: 'LocalOrderBook') -> int:
+    """
+    CRC32 signé des 25 meilleurs niveaux entrelacés
+    (bid:qty:ask:qty...), schéma OKX/Blofin, sur les chaînes d'origine.
+    """
+    bids = book.bids.raw_levels(25)
+    asks = book.asks.raw_levels(25)
+    parts = []
+    for i in range(max(len(bids), len(asks))):
+        if i < len(bids):
+            parts.extend(bids[i])
+        if i < len(asks):
+            parts.extend(asks[i])
+    crc = zlib.crc32(':'.join(parts).encode())
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+
+class LocalOrderBook:
+    """
+    Carnet L2 d'un (exchange, symbole) reconstruit à partir d'un snapshot
+    puis des diffs successifs.
+
+    apply_diff vérifie la continuité des numéros de séquence (et le
+    checksum si checksum_fn est fourni) ; en cas d'écart le book est
+    marqué désynchronisé et BookGapError est levée pour que l'appelant
+    recharge un snapshot.
+    """
+
+    def __init__(self, exchange: str, symbol: str, capacity: int = 1024,
+                 checksum_fn: Optional[Callable[['LocalOrderBook'], int]] = None):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.checksum_fn = checksum_fn
+        keep_raw = checksum_fn is not None
+        self.bids = BookSide(True, capacity, keep_raw)
+        self.asks = BookSide(False, capacity, keep_raw)
+        self.last_update_id: Optional[int] = None
+        self.synced = False
+        self.timestamp: Optional[float] = None       # Horodatage exchange (s)
+        self.received_at: Optional[float] = None
+        self.stats = {'snapshots': 0, 'diffs': 0, 'stale_diffs': 0, 'gaps': 0, 'checksum_errors': 0}
+
+    def apply_snapshot(self, bids: Iterable[Level], asks: Iterable[Level], update_id: int,
+                       timestamp: Optional[float] = None) -> None:
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.last_update_id = update_id
+        self.timestamp = timestamp
+        self.received_at = time.time()
+        self.synced = True
+        self.stats['snapshots'] += 1
+
+    def apply_diff(self, first_update_id: int, final_update_id: int,
+                   bids: Iterable[Level], asks: Iterable[Level],
+                   prev_update_id: Optional[int] = None,
+                   checksum: Optional[int] = None,
+                   timestamp: Optional[float] = None) -> bool:
+        """
+        Applique un diff. Retourne False si le diff est antérieur au book
+        (ignoré), lève BookGapError si une mise à jour a été manquée.
+
+        La continuité est vérifiée via prev_update_id quand l'exchange le
+        fournit (OKX), sinon via first_update_id == last_update_id + 1
+        (Binance, premier diff après snapshot : first <= last + 1 <= final).
+        Avec prev_update_id, une séquence qui recule (reset du seqId côté
+        exchange) est un trou, pas un diff périmé.
+        """
+        if not self.synced:
+            raise BookGapError(f"{self.exchange} {self.symbol}: book non synchronisé")
+        if prev_update_id is not None and final_update_id < self.last_update_id:
+            self._desync('gaps')
+            raise BookGapError(
+                f"{self.exchange} {self.symbol}: séquence réinitialisée "
+                f"({self.last_update_id} -> {final_update_id})"
+            )
+        if final_update_id <= self.last_update_id:
+            self.stats['stale_diffs'] += 1
+            return False
+
+        if prev_update_id is not None:
+            contiguous = prev_update_id == self.last_update_id
+        else:
+            contiguous = first_update_id <= self.last_update_id + 1
+        if not contiguous:
+            self._desync('gaps')
+            raise BookGapError(
+                f"{self.exchange} {self.symbol}: trou de séquence "
+                f"({self.last_update_id} -> {prev_update_id if prev_update_id is not None else first_update_id})"
+            )
+
+        for price, size, *_ in bids:
+            self.bids.update(float(price), float(size), (str(price), str(size)))
+        for price, size, *_ in asks:
+            self.asks.update(float(price), float(size), (str(price), str(size)))
+        self.last_update_id = final_update_id
+        self.timestamp = timestamp
+        self.received_at = time.time()
+        self.stats['diffs'] += 1
+
+        if checksum is not None and self.checksum_fn is not None and self.checksum_fn(self) != checksum:
+            self._desync('checksum_errors')
+            raise BookGapError(f"{self.exchange} {self.symbol}: checksum invalide")
+        return True
+
+    def _desync(self, reason: str) -> None:
+        self.synced = False
+        self.stats[reason] += 1
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        return self.asks.best()
+
+    def to_ccxt(self, depth: Optional[int] = None) -> Dict:
+        """Copie du book au format ccxt (bids/asks/timestamp/nonce)"""
+        return {
+            'symbol': self.symbol,
+            'bids': self.bids.levels(depth),
+            'asks': self.asks.levels(depth),
+            'timestamp': int(self.timestamp * 1000) if self.timestamp else None,
+            'nonce': self.last_update_id,
+            'received_at': self.received_at
+        }
@@ -1,16 +1,164 @@
+"""
+Stockage compressé de DataFrames : format binaire colonnaire (LZ4 par colonne)
+@author: Patmoorea
+"""
+from io import StringIO
+from typing import Any, Dict, List, Tuple
+import json
+import struct
 import lz4.frame
+import numpy as np
 import pandas as pd
 
+MAGIC = b'CSTB'
+FORMAT_VERSION = 1
+# Magic, version, longueur du schéma JSON
+HEADER = struct.Struct('<4sBI')
+FORMATS = ('binary', 'json')
+
+
 class CompressedStorage:
-    def __init__(self):
+    """
+    Sauvegarde de DataFrames compressés en LZ4.
+
+    Format 'binary' (défaut) : en-tête + schéma JSON (nom, dtype, type
+    d'encodage et emplacement des buffers de chaque colonne et de l'index)
+    suivis d'un buffer typé par colonne, compressé indépendamment. Au
+    chargement, chaque buffer est décompressé puis vu directement en
+    tableau NumPy (np.frombuffer), sans passage par du texte.
+
+    Encodages : types NumPy (numériques, booléens, datetime64, timedelta64),
+    datetime avec fuseau (UTC + fuseau dans le schéma), entiers/booléens
+    nullables (valeurs + masque), chaînes (offsets + UTF-8 + masque) ;
+    les autres colonnes (catégories, objets) passent par JSON.
+
+    Format 'json' : ancien format (to_json puis LZ4). load() détecte le
+    format, les fichiers existants restent lisibles.
+    """
+
+    def __init__(self, format: str = 'binary', compression_level: int = 0):
+        if format not in FORMATS:
+            raise ValueError(f"Format inconnu: {format}")
         self.compression = lz4.frame
-    
+        self.format = format
+        self.compression_level = compression_level
+
+    # ----- Encodage des colonnes -----
+
+    def _encode(self, values: Any) -> Tuple[Dict[str, Any], List[bytes]]:
+        """Série/Index -> (description, buffers bruts)"""
+        dtype = values.dtype
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            naive = pd.Series(values).dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+            return {'kind': 'datetime_tz', 'dtype': str(naive.dtype), 'tz': str(dtype.tz)}, [naive.tobytes()]
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+            array = np.ascontiguousarray(values.to_numpy() if hasattr(values, 'to_numpy') else values)
+            return {'kind': 'numpy', 'dtype': array.dtype.str}, [array.tobytes()]
+        mask = np.asarray(pd.isna(values), dtype=np.bool_)
+        numpy_dtype = getattr(dtype, 'numpy_dtype', None)
+        if numpy_dtype is not None and numpy_dtype.kind in 'biuf':
+            array = np.ascontiguousarray(values.to_numpy(dtype=numpy_dtype, na_value=0))
+            return {'kind': 'masked', 'dtype': str(dtype), 'values': numpy_dtype.str}, [array.tobytes(), mask.tobytes()]
+        objects = np.asarray(values, dtype=object)
+        if pd.api.types.is_string_dtype(dtype) and all(isinstance(v, str) for v in objects[~mask]):
+            encoded = [b'' if missing else value.encode() for value, missing in zip(objects, mask)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(chunk) for chunk in encoded], out=offsets[1:])
+            return {'kind': 'str', 'dtype': str(dtype)}, [offsets.tobytes(), b''.join(encoded), mask.tobytes()]
+        items = [None if missing else value for value, missing in zip(objects.tolist(), mask)]
+        return {'kind': 'json', 'dtype': str(dtype)}, [json.dumps(items, default=str).encode()]
+
+    @staticmethod
+    def _decode(spec: Dict[str, Any], buffers: List[bytearray]) -> Any:
+        """(description, buffers décompressés) -> tableau pour pandas"""
+        kind = spec['kind']
+        if kind == 'numpy':
+            return np.frombuffer(buffers[0], dtype=np.dtype(spec['dtype']))
+        if kind == 'datetime_tz':
+            utc = pd.DatetimeIndex(np.frombuffer(buffers[0], dtype=np.dtype(spec['dtype'])))
+            return utc.tz_localize('UTC').tz_convert(spec['tz'])
+        if kind == 'masked':
+            values = np.frombuffer(buffers[0], dtype=np.dtype(spec['values']))
+            mask = np.frombuffer(buffers[1], dtype=np.bool_)
+            return pd.array(np.where(mask, None, values.astype(object)), dtype=spec['dtype'])
+        if kind == 'str':
+            offsets = np.frombuffer(buffers[0], dtype=np.int64)
+            data, mask = bytes(buffers[1]), np.frombuffer(buffers[2], dtype=np.bool_)
+            objects = np.array([None if missing else data[lo:hi].decode()
+                                for lo, hi, missing in zip(offsets[:-1], offsets[1:], mask)], dtype=object)
+            return pd.array(objects, dtype=spec['dtype']) if spec['dtype'] != 'object' else objects
+        items = json.loads(bytes(buffers[0]))
+        return pd.Series(items, dtype=object).astype(spec['dtype']).array
+
+    # ----- Sauvegarde / chargement -----
+
     def save(self, data: pd.DataFrame, path: str):
-        compressed = self.compression.compress(data.to_json().encode())
+        if self.format == 'json':
+            compressed = self.compression.compress(data.to_json().encode())
+            with open(path, 'wb') as f:
+                f.write(compressed)
+            return
+        if isinstance(data.columns, pd.MultiIndex) or isinstance(data.index, pd.MultiIndex):
+            raise ValueError("MultiIndex non supporté par le format binaire")
+
+        blocks: List[bytes] = []
+        position = 0
+
+        def describe(values: Any) -> Dict[str, Any]:
+            nonlocal position
+            spec, buffers = self._encode(values)
+            spec['buffers'] = []
+            for raw in buffers:
+                block = self.compression.compress(raw, compression_level=self.compression_level)
+                spec['buffers'].append([position, len(block)])
+                blocks.append(block)
+                position += len(block)
+            return spec
+
+        index = data.index
+        if isinstance(index, pd.RangeIndex):
+            index_spec = {'kind': 'range', 'start': index.start, 'stop': index.stop, 'step': index.step}
+        else:
+            index_spec = describe(index)
+        index_spec['name'] = index.name
+        schema = {
+            'rows': len(data),
+            'index': index_spec,
+            'columns': [{'name': name, **describe(data.iloc[:, i])} for i, name in enumerate(data.columns)]
+        }
+        header = json.dumps(schema, default=str).encode()
         with open(path, 'wb') as f:
-            f.write(compressed)
-    
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for block in blocks:
+                f.write(block)
+
     def load(self, path: str) -> pd.DataFrame:
         with open(path, 'rb') as f:
-            decompressed = self.compression.decompress(f.read())
-        return pd.read_json(decompressed.decode())
+            content = f.read()
+        if not content.startswith(MAGIC):
+            # Ancien format : JSON compressé
+            decompressed = self.compression.decompress(content)
+            return pd.read_json(StringIO(decompressed.decode()))
+
+        _, version, header_len = HEADER.unpack_from(content)
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Version de format {version} non supportée")
+        schema = json.loads(content[HEADER.size:HEADER.size + header_len])
+        view = memoryview(content)[HEADER.size + header_len:]
+
+        def restore(spec: Dict[str, Any]) -> Any:
+            buffers = [self.compression.decompress(view[offset:offset + length], return_bytearray=True)
+                       for offset, length in spec['buffers']]
+            return self._decode(spec, buffers)
+
+        index_spec = schema['index']
+        if index_spec['kind'] == 'range':
+            index = pd.RangeIndex(index_spec['start'], index_spec['stop'], index_spec['step'],
+                                  name=index_spec['name'])
+        else:
+            index = pd.Index(restore(index_spec), name=index_spec['name'])
+        columns = {i: restore(spec) for i, spec in enumerate(schema['columns'])}
+        frame = pd.DataFrame(columns, index=index, copy=False)
+        frame.columns = [spec['name'] for spec in schema['columns']]
+        return frame
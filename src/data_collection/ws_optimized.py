@@ -1,26 +1,282 @@
-import lz4.frame
-import websockets
+"""
+Client websocket multi-flux : connexions combinées, sharding et files bornées
+@author: Patmoorea
+"""
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit
 import asyncio
+import json
+import logging
+import random
+import time
 from signal import SIGINT, SIGTERM
 
-class OptimizedWSClient:
-    def __init__(self):
+import websockets
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+# Les messages combinés Binance commencent par le nom du flux
+STREAM_PREFIX = '{"stream":"'
+
+
+def peek_stream(raw: Any) -> Optional[str]:
+    """Nom du flux lu en tête du message brut, sans le décoder (None si absent)"""
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw[:256].decode(errors='ignore')
+    if not isinstance(raw, str) or not raw.startswith(STREAM_PREFIX):
+        return None
+    end = raw.find('"', len(STREAM_PREFIX))
+    return raw[len(STREAM_PREFIX):end] if end > 0 else None
+
+
+class StreamQueue:
+    """
+    File bornée d'un flux.
+
+    drop_oldest / drop_newest : le lecteur du socket n'attend jamais, les
+    messages en excès sont comptés dans dropped ; block : le lecteur attend
+    que le consommateur libère de la place (backpressure sur le shard).
+    """
+
+    def __init__(self, maxsize: int = 1000, overflow: str = 'drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {overflow}")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflow = overflow
+        self.received = 0
+        self.dropped = 0
+
+    async def put(self, message: Any) -> None:
+        self.received += 1
+        if self.overflow == 'block':
+            await self.queue.put(message)
+            return
+        if self.queue.full():
+            self.dropped += 1
+            if self.overflow == 'drop_newest':
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+    def qsize(self) -> int:
+        return self.queue.qsize()
+
+
+class MultiplexedWSClient:
+    """
+    Regroupe de nombreux flux sur des connexions "combined stream"
+    (format Binance : /stream?streams=a/b/c, messages {"stream", "data"}).
+
+    Les flux sont répartis en shards de streams_per_connection ; chaque
+    shard a sa connexion, son lecteur et sa reconnexion avec backoff
+    (l'URL combinée réabonne tous ses flux ; ceux ajoutés pendant la
+    connexion sont abonnés dès qu'elle est établie). Les messages sont routés
+    vers une file bornée par flux, si bien qu'un consommateur lent ne
+    bloque pas la lecture du socket (sauf politique 'block').
+
+    Les abonnements ajoutés en cours de route sont regroupés par shard en
+    un seul SUBSCRIBE (découpé par params_per_message flux) et les
+    messages de contrôle d'une connexion sont espacés pour ne pas dépasser
+    control_rate par seconde (limite Binance : 5).
+    """
+
+    def __init__(self,
+                 base_url: str = 'wss://stream.binance.com:9443',
+                 streams_per_connection: int = 200,
+                 queue_size: int = 1000,
+                 overflow: str = 'drop_oldest',
+                 max_backoff: float = 30.0,
+                 decode: Callable[[Any], Any] = json.loads,
+                 recorder: Any = None,
+                 control_rate: float = 5.0,
+                 params_per_message: int = 200):
+        self.base_url = base_url.rstrip('/')
+        self.streams_per_connection = streams_per_connection
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.max_backoff = max_backoff
+        self.decode = decode
+        self.control_rate = control_rate
+        self.params_per_message = params_per_message
+        # TickRecorder optionnel : capture des messages bruts avant décodage
+        self.recorder = recorder
+        self.logger = logging.getLogger(__name__)
+        self.queues: Dict[str, StreamQueue] = {}
+        self.shards: List[List[str]] = []
+        self.connections: Dict[int, Any] = {}
+        self.reconnects: Dict[int, int] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._control_slots: Dict[int, float] = {}     # Prochain envoi de contrôle autorisé par shard
         self._should_stop = False
-        asyncio.get_event_loop().add_signal_handler(SIGINT, self.stop)
-        asyncio.get_event_loop().add_signal_handler(SIGTERM, self.stop)
+        self._stopped = asyncio.Event()
 
-    def stop(self):
-        self._should_stop = True
+    def subscribe(self, streams: Iterable[str]) -> None:
+        """Ajoute des flux ; pendant run(), ils sont envoyés aux shards existants ou ouvrent un shard"""
+        new = [stream for stream in streams if stream not in self.queues]
+        for stream in new:
+            self.queues[stream] = StreamQueue(self.queue_size, self.overflow)
+        by_shard: Dict[int, List[str]] = {}
+        for stream in new:
+            by_shard.setdefault(self._assign(stream), []).append(stream)
+        for shard_id, streams in by_shard.items():
+            ws = self.connections.get(shard_id)
+            if ws is not None:
+                asyncio.ensure_future(self._send_subscribe(shard_id, ws, streams))
+            elif self._tasks and shard_id not in self._tasks:
+                self._tasks[shard_id] = asyncio.ensure_future(self._run_shard(shard_id))
+
+    def _assign(self, stream: str) -> int:
+        for shard_id, shard in enumerate(self.shards):
+            if len(shard) < self.streams_per_connection:
+                shard.append(stream)
+                return shard_id
+        self.shards.append([stream])
+        return len(self.shards) - 1
+
+    def shard_url(self, shard_id: int, streams: Optional[Sequence[str]] = None) -> str:
+        streams = self.shards[shard_id] if streams is None else streams
+        return f"{self.base_url}/stream?streams={'/'.join(streams)}"
+
+    async def _send_control(self, shard_id: int, ws, payload: Dict) -> None:
+        """Envoie un message de contrôle en respectant control_rate sur la connexion"""
+        now = time.monotonic()
+        # Créneau réservé avant d'attendre : les envois concurrents s'échelonnent
+        slot = max(now, self._control_slots.get(shard_id, now))
+        self._control_slots[shard_id] = slot + 1.0 / self.control_rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        await ws.send(json.dumps(payload))
+
+    async def _send_subscribe(self, shard_id: int, ws, streams: List[str]) -> None:
+        for start in range(0, len(streams), self.params_per_message):
+            await self._send_control(shard_id, ws, {
+                'method': 'SUBSCRIBE',
+                'params': streams[start:start + self.params_per_message],
+                'id': random.randint(1, 2 ** 31)
+            })
 
-    async def connect(self, urls):
-        async with websockets.connect(urls[0]) as ws:
+    async def dispatch(self, raw: Any) -> None:
+        """Route un message combiné vers la file de son flux"""
+        recorded = False
+        if self.recorder is not None:
+            # Capture avant décodage : horodatage de réception et message conservés
+            # même si le décodage échoue
+            stream = peek_stream(raw)
+            if stream in self.queues:
+                self.recorder.record(stream, raw)
+                recorded = True
+        message = self.decode(raw)
+        stream = message.get('stream') if isinstance(message, dict) else None
+        queue = self.queues.get(stream)
+        if queue is None:
+            return                  # Réponses d'abonnement, flux inconnus
+        if self.recorder is not None and not recorded:
+            self.recorder.record(stream, raw)     # Champ 'stream' hors de l'en-tête
+        await queue.put(message['data'])
+
+    async def _run_shard(self, shard_id: int) -> None:
+        attempt = 0
+        while not self._should_stop:
+            # Les shards ne font que grandir : les flux au-delà de ceux de l'URL
+            # ont été ajoutés pendant la connexion et doivent être abonnés
+            connected_streams = len(self.shards[shard_id])
+            try:
+                async with websockets.connect(self.shard_url(shard_id, self.shards[shard_id][:connected_streams]),
+                                              max_size=None) as ws:
+                    self.connections[shard_id] = ws
+                    self._control_slots.pop(shard_id, None)     # Nouvelle connexion, nouveau quota
+                    missed = self.shards[shard_id][connected_streams:]
+                    if missed:
+                        await self._send_subscribe(shard_id, ws, missed)
+                    attempt = 0
+                    self.logger.info(f"Shard {shard_id} connecté ({len(self.shards[shard_id])} flux)")
+                    async for raw in ws:
+                        if self._should_stop:
+                            break
+                        await self.dispatch(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"Shard {shard_id} déconnecté: {e}")
+            finally:
+                self.connections.pop(shard_id, None)
+            if not self._should_stop:
+                self.reconnects[shard_id] = self.reconnects.get(shard_id, 0) + 1
+                await asyncio.sleep(random.uniform(0, min(self.max_backoff, 0.5 * 2 ** attempt)))
+                attempt += 1
+
+    async def run(self) -> None:
+        """Ouvre un shard par groupe de flux et tourne jusqu'à stop()"""
+        self._should_stop = False
+        self._stopped.clear()
+        self._tasks = {shard_id: asyncio.ensure_future(self._run_shard(shard_id))
+                       for shard_id in range(len(self.shards))}
+        try:
             while not self._should_stop:
-                try:
-                    data = await asyncio.wait_for(ws.recv(), timeout=1)
-                    compressed = lz4.frame.compress(data.encode())
-                    print(f"Reçu {len(compressed)} octets (compressés)")
-                except asyncio.TimeoutError:
-                    continue
-                except Exception as e:
-                    print(f"Erreur: {e}")
-                    break
+                await asyncio.sleep(0.5)
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            self._tasks = {}
+
+    async def get(self, stream: str) -> Any:
+        return await self.queues[stream].get()
+
+    async def stream(self, stream: str) -> AsyncIterator[Any]:
+        """Itère sur les messages d'un flux jusqu'à stop()"""
+        queue = self.queues[stream].queue
+        while not self._should_stop:
+            if not queue.empty():
+                yield queue.get_nowait()
+                continue
+            # File vide : attente du prochain message ou de l'arrêt
+            getter = asyncio.ensure_future(queue.get())
+            stopper = asyncio.ensure_future(self._stopped.wait())
+            done, _ = await asyncio.wait({getter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            stopper.cancel()
+            if getter not in done:
+                getter.cancel()
+                return
+            yield getter.result()
+
+    def stop(self) -> None:
+        self._should_stop = True
+        self._stopped.set()
+
+    def install_signal_handlers(self) -> None:
+        """SIGINT/SIGTERM -> stop(), sur la boucle en cours d'exécution"""
+        loop = asyncio.get_running_loop()
+        for sig in (SIGINT, SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'shards': len(self.shards),
+            'connected': len(self.connections),
+            'reconnects': dict(self.reconnects),
+            'streams': {
+                stream: {'received': queue.received, 'dropped': queue.dropped, 'queued': queue.qsize()}
+                for stream, queue in self.queues.items()
+            }
+        }
+
+
+class OptimizedWSClient(MultiplexedWSClient):
+    """
+    Compatibilité : connect(urls) accepte des URLs de flux brut
+    (wss://host/ws/<stream>) et les multiplexe toutes, au lieu de
+    n'ouvrir que urls[0].
+    """
+
+    async def connect(self, urls: List[str]) -> None:
+        streams = []
+        for url in urls:
+            parts = urlsplit(url)
+            self.base_url = f"{parts.scheme}://{parts.netloc}"
+            streams.append(parts.path.rsplit('/', 1)[-1])
+        self.subscribe(streams)
+        self.install_signal_handlers()
+        await self.run()
@@ -1,12 +1,14 @@
 from typing import Dict, List
 import numpy as np
+from ..utils.cache import TTLCache
 
 class OrderExecutionOptimizer:
     """Optimiseur d'exécution qui travaille AVEC le module existant"""
     
-    def __init__(self, arbitrage_module):
+    def __init__(self, arbitrage_module, liquidity_ttl: float = 30.0, liquidity_cache_size: int = 512):
         self.arbitrage = arbitrage_module
-        self.liquidity_cache: Dict[str, float] = {}
+        # La liquidité évolue : entrées expirées après liquidity_ttl secondes
+        self.liquidity_cache = TTLCache(maxsize=liquidity_cache_size, ttl=liquidity_ttl)
     
     def calculate_optimal_size(self, pair: str, spread: float) -> float:
         """Calcule la taille d'ordre optimale basée sur la liquidité"""
@@ -16,6 +18,4 @@ class OrderExecutionOptimizer:
         
     def _get_liquidity(self, pair: str) -> float:
         """Récupère la liquidité du cache ou la calcule"""
-        if pair not in self.liquidity_cache:
-            self.liquidity_cache[pair] = self._fetch_liquidity(pair)
-        return self.liquidity_cache[pair]
+        return self.liquidity_cache.get_or_compute(pair, lambda: self._fetch_liquidity(pair))
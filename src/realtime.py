@@ -14,6 +14,7 @@ from pandas import Series, to_numeric
 
 # IMPORTS LOCAUX (chemin corrigé)
 from src.core_merged.technical import utils as technical_utils
+from src.data_collection.decoders import FastDecoder
 
 # CONFIGURATION LOGGING (nouveau)
 logger = logging.getLogger(__name__)
@@ -32,6 +33,12 @@ class RealTimeProcessor:
         self.config = config or {}
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self.data_buffer = pd.DataFrame()
+        # Chemin rapide : décodage dans des lots typés, pandas seulement au flush
+        self.decoder = FastDecoder(
+            batch_size=int(self.config.get('batch_size', 1024)),
+            on_batch=self._on_batch
+        )
+        self.batches: Dict[str, List[pd.DataFrame]] = {}
 
     async def connect(self, uri: str) -> None:
         """Connexion WebSocket originale conservée"""
@@ -55,6 +62,24 @@ class RealTimeProcessor:
             logger.error(f"Erreur de traitement: {e}")
             raise
 
+    def ingest(self, message: str) -> Optional[str]:
+        """Chemin rapide : décode le message dans les lots préalloués, retourne son type"""
+        return self.decoder.decode(message)
+
+    def _on_batch(self, kind: str, frame: pd.DataFrame) -> None:
+        self.batches.setdefault(kind, []).append(frame)
+
+    def flush(self) -> Dict[str, pd.DataFrame]:
+        """Frontière de lot : concatène les lots décodés par type de flux"""
+        self.decoder.flush()
+        frames = {kind: pd.concat(parts, ignore_index=True) for kind, parts in self.batches.items() if parts}
+        self.batches = {}
+        return frames
+
+    def get_decode_stats(self) -> Dict[str, Any]:
+        """Messages/s et histogramme des durées de décodage"""
+        return self.decoder.stats.snapshot()
+
 # FONCTIONS LEGACY (conservées sans modification)
 def legacy_function_1():
     """Ancienne fonction 1 conservée"""
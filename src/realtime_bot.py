@@ -5,6 +5,8 @@ import websockets
 from pandas import DataFrame, Series, read_csv, to_numeric
 from typing import Dict, List
 from src.core_merged.technical_engine import TechnicalEngine
+from src.data_collection.candle_aggregator import Bar, CandleAggregator
+from src.data_collection.ohlcv_window import RSI, OHLCVWindow
 
 # ============ NOUVELLE FONCTIONNALITÉ ============ #
 def safe_log(message: str, level: str = "info"):
@@ -30,20 +32,26 @@ logging.basicConfig(
 class RealTimeBot:
     def __init__(self):
         self.tech_engine = TechnicalEngine()
-        self.data_window = DataFrame(
-            columns=['open', 'high', 'low', 'close', 'volume'])
         self.window_size = 100
+        # Buffers circulaires : coût constant par tick, sans allocation
+        self.data_window = OHLCVWindow(self.window_size)
+        self.rsi = self.data_window.add_indicator('rsi', RSI(14))
+        # Timeframes supérieurs construits depuis le flux 1m, sans polling REST
+        self.aggregator = CandleAggregator(on_close=self._on_bar_close)
+        self.closed_bars: Dict[str, Bar] = {}
+        # Dernière analyse complète (calculée à la clôture de chaque bougie)
+        self.analysis: Dict = {}
 
-    def _update_data_window(self, new_row: dict):
-        """Met à jour la fenêtre de données"""
-        new_df = DataFrame([new_row])
-        if self.data_window.empty:
-            self.data_window = new_df
-        else:
-            self.data_window = concat(
-                [self.data_window, new_df],
-                ignore_index=True
-            ).tail(self.window_size)
+    def _on_bar_close(self, bar: Bar):
+        self.closed_bars[bar.timeframe] = bar
+        safe_log(f"Bougie {bar.timeframe} close: {bar.close:.2f} (VWAP {bar.vwap:.2f})")
+
+    def _update_data_window(self, new_row: dict) -> bool:
+        """Met à jour la fenêtre de données, retourne True à l'ouverture d'une bougie"""
+        return self.data_window.update(
+            new_row['timestamp'], new_row['open'], new_row['high'],
+            new_row['low'], new_row['close'], new_row['volume']
+        )
 
     async def handle_socket(self):
         uri = "wss://stream.binance.com:9443/ws/btcusdt@kline_1m"
@@ -56,6 +64,7 @@ class RealTimeBot:
                     kline = data['k']
 
                     self._update_data_window({
+                        'timestamp': kline['t'],
                         'open': float(kline['o']),
                         'high': float(kline['h']),
                         'low': float(kline['l']),
@@ -63,11 +72,17 @@ class RealTimeBot:
                         'volume': float(kline['v'])
                     })
 
+                    self.aggregator.handle_message(data)
+
                     if len(self.data_window) >= 20:
-                        analysis = self.tech_engine.compute(self.data_window)
-                        safe_log(f"Prix: {self.data_window['close'].iloc[-1]:.2f}")
-                        if 'rsi' in analysis.get('momentum', {}):
-                            safe_log(f"RSI: {analysis['momentum']['rsi'].iloc[-1]:.2f}")
+                        safe_log(f"Prix: {self.data_window.last('close'):.2f}")
+                        if self.rsi.ready:
+                            safe_log(f"RSI: {self.rsi.value:.2f}")
+                        else:
+                            safe_log(f"RSI: amorçage ({len(self.data_window)}/{self.rsi.period + 1} bougies)")
+                        # Analyse complète uniquement à la clôture de la bougie
+                        if kline.get('x'):
+                            self.analysis = self.tech_engine.compute(self.data_window.to_frame())
 
                 except json.JSONDecodeError as e:
                     safe_log(f"Erreur de décodage JSON: {str(e)}", "warning")
@@ -1,19 +1,245 @@
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+import math
+import time
+import numpy as np
+
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def empty_stats() -> Dict[str, float]:
+    return {'max': math.nan, 'min': math.nan, 'mean': math.nan, 'std': math.nan,
+            'count': 0, **{f"p{int(q * 100)}": math.nan for q in QUANTILES}}
+
+
+class LogHistogram:
+    """
+    Histogramme à bins logarithmiques fixes, symétrique autour de zéro.
+
+    Chaque octave [2^e, 2^(e+1)) est découpée en subdivisions bins, soit
+    une erreur relative d'environ 2^(1/subdivisions) - 1 sur les
+    percentiles. Ajout et retrait en O(1), lecture en O(nombre de bins)
+    indépendamment du nombre de valeurs ; deux histogrammes de mêmes
+    paramètres se fusionnent par simple somme des compteurs.
+    """
+
+    def __init__(self, subdivisions: int = 64, min_exponent: int = -30, max_exponent: int = 30):
+        self.subdivisions = subdivisions
+        self.min_exponent = min_exponent
+        self.half = (max_exponent - min_exponent) * subdivisions
+        self.counts = np.zeros(2 * self.half + 1, dtype=np.int64)   # bin central : zéro
+
+    def index(self, value: float) -> int:
+        magnitude = abs(value)
+        if magnitude < 2.0 ** self.min_exponent:
+            return self.half
+        k = min(int((math.log2(magnitude) - self.min_exponent) * self.subdivisions), self.half - 1)
+        return self.half + 1 + k if value > 0 else self.half - 1 - k
+
+    def value_at(self, index: int) -> float:
+        """Valeur représentative d'un bin (milieu géométrique)"""
+        if index == self.half:
+            return 0.0
+        k = abs(index - self.half) - 1
+        magnitude = 2.0 ** (self.min_exponent + (k + 0.5) / self.subdivisions)
+        return magnitude if index > self.half else -magnitude
+
+    def add(self, value: float) -> None:
+        self.counts[self.index(value)] += 1
+
+    def remove(self, value: float) -> None:
+        self.counts[self.index(value)] -= 1
+
+    def percentiles(self, counts: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Percentiles de QUANTILES (counts permet de lire un histogramme fusionné)"""
+        counts = self.counts if counts is None else counts
+        cumulative = np.cumsum(counts)
+        total = int(cumulative[-1])
+        if total == 0:
+            return {f"p{int(q * 100)}": math.nan for q in QUANTILES}
+        return {
+            f"p{int(q * 100)}": self.value_at(int(np.searchsorted(cumulative, max(1, math.ceil(q * total)))))
+            for q in QUANTILES
+        }
+
+
+def clip_percentiles(values: Dict[str, float], low: float, high: float) -> Dict[str, float]:
+    """Ramène les percentiles approchés dans [min, max] exacts"""
+    return {key: min(max(value, low), high) for key, value in values.items()}
+
+
+class SpreadRingBuffer:
+    """
+    Historique de spreads à capacité fixe (tableaux NumPy circulaires).
+
+    Les statistiques de la fenêtre glissante (window secondes) sont tenues
+    à jour à chaque insertion et expiration : somme et somme des carrés
+    pour la moyenne et l'écart-type (recalculées depuis le buffer à chaque
+    tour complet pour borner la dérive flottante), files monotones pour
+    min/max, histogramme logarithmique pour les percentiles (approchés,
+    bornés par le min/max exacts).
+
+    Avec spill_dir, chaque tour complet du buffer est écrit sur disque
+    (.npz) avant d'être écrasé.
+    """
+
+    def __init__(self, capacity: int = 86_400, window: float = 86_400.0,
+                 spill_dir: Optional[Union[str, Path]] = None, name: str = 'spreads'):
+        self.capacity = capacity
+        self.window = window
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.name = name
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.write_seq = 0      # Numéro de la prochaine écriture
+        self.oldest_seq = 0     # Plus ancienne entrée encore dans la fenêtre
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._min_queue: deque = deque()   # seqs, valeurs croissantes
+        self._max_queue: deque = deque()   # seqs, valeurs décroissantes
+        self.histogram = LogHistogram()
+
+    def __len__(self) -> int:
+        return self.write_seq - self.oldest_seq
+
+    def _evict_oldest(self):
+        value = self.values[self.oldest_seq % self.capacity]
+        self._sum -= value
+        self._sum_sq -= value * value
+        self.histogram.remove(value)
+        if self._min_queue and self._min_queue[0] == self.oldest_seq:
+            self._min_queue.popleft()
+        if self._max_queue and self._max_queue[0] == self.oldest_seq:
+            self._max_queue.popleft()
+        self.oldest_seq += 1
+
+    def expire(self, now: Optional[float] = None):
+        """Retire les entrées sorties de la fenêtre temporelle"""
+        cutoff = (now if now is not None else time.time()) - self.window
+        while self.oldest_seq < self.write_seq and \
+                self.timestamps[self.oldest_seq % self.capacity] < cutoff:
+            self._evict_oldest()
+
+    def append(self, value: float, timestamp: Optional[float] = None):
+        timestamp = timestamp if timestamp is not None else time.time()
+        if len(self) == self.capacity:
+            self._evict_oldest()
+
+        seq = self.write_seq
+        slot = seq % self.capacity
+        self.timestamps[slot] = timestamp
+        self.values[slot] = value
+        self.write_seq += 1
+
+        self._sum += value
+        self._sum_sq += value * value
+        self.histogram.add(value)
+        while self._min_queue and self.values[self._min_queue[-1] % self.capacity] >= value:
+            self._min_queue.pop()
+        self._min_queue.append(seq)
+        while self._max_queue and self.values[self._max_queue[-1] % self.capacity] <= value:
+            self._max_queue.pop()
+        self._max_queue.append(seq)
+
+        if self.write_seq % self.capacity == 0:
+            self._resync_moments()
+            if self.spill_dir is not None:
+                self._spill()
+        self.expire(timestamp)
+
+    def _resync_moments(self):
+        """Recalcule somme et somme des carrés depuis la fenêtre (dérive des soustractions)"""
+        values = self.view()[1]
+        self._sum = float(values.sum())
+        self._sum_sq = float(np.dot(values, values))
+
+    def _spill(self):
+        """Fin d'un tour complet : déversement sur disque avant écrasement"""
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        first_seq = self.write_seq - self.capacity
+        path = self.spill_dir / f"{self.name}_{first_seq:012d}.npz"
+        np.savez(path, timestamps=self.timestamps, spreads=self.values)
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, spreads) de la fenêtre, dans l'ordre chronologique"""
+        slots = np.arange(self.oldest_seq, self.write_seq) % self.capacity
+        return self.timestamps[slots], self.values[slots]
+
+    def stats(self) -> Dict[str, float]:
+        n = len(self)
+        if n == 0:
+            return empty_stats()
+        mean = float(self._sum / n)
+        variance = max(float(self._sum_sq / n) - mean * mean, 0.0)
+        low = float(self.values[self._min_queue[0] % self.capacity])
+        high = float(self.values[self._max_queue[0] % self.capacity])
+        return {
+            'max': high,
+            'min': low,
+            'mean': mean,
+            'std': math.sqrt(variance),
+            'count': n,
+            **clip_percentiles(self.histogram.percentiles(), low, high)
+        }
+
+
 class ArbitrageAnalytics:
     """Nouvelle fonctionnalité : Analyse historique des spreads"""
-    def __init__(self):
-        from datetime import datetime
-        import pandas as pd
-        self.data = pd.DataFrame(columns=['timestamp', 'spread'])
-        
-    def record_spread(self, spread):
+    def __init__(self, capacity: int = 86_400, window: float = 86_400.0,
+                 spill_dir: Optional[Union[str, Path]] = None):
+        self.capacity = capacity
+        self.window = window
+        self.spill_dir = spill_dir
+        self.buffers: Dict[Tuple[str, str], SpreadRingBuffer] = {}
+
+    def _buffer(self, exchange: str, pair: str) -> SpreadRingBuffer:
+        key = (exchange, pair)
+        if key not in self.buffers:
+            self.buffers[key] = SpreadRingBuffer(
+                self.capacity, self.window, self.spill_dir,
+                name=f"{exchange}_{pair}".replace('/', '-')
+            )
+        return self.buffers[key]
+
+    def record_spread(self, spread, exchange: str = 'default', pair: str = 'default',
+                      timestamp: Optional[float] = None):
         """Enregistre les spreads pour analyse"""
-        new_data = {'timestamp': datetime.now(), 'spread': spread}
-        self.data.loc[len(self.data)] = new_data
-        
-    def get_stats(self):
+        self._buffer(exchange, pair).append(float(spread), timestamp)
+
+    def get_stats(self, exchange: Optional[str] = None, pair: Optional[str] = None):
         """Retourne les statistiques sur 24h"""
+        if exchange is not None and pair is not None:
+            buffer = self.buffers.get((exchange, pair))
+            if buffer is None:
+                return empty_stats()
+            buffer.expire()
+            return buffer.stats()
+
+        # Agrégation des buffers correspondant au filtre
+        selected = [
+            buffer for (ex, pr), buffer in self.buffers.items()
+            if (exchange is None or ex == exchange) and (pair is None or pr == pair)
+        ]
+        for buffer in selected:
+            buffer.expire()
+        stats = [buffer.stats() for buffer in selected if len(buffer)]
+        if not stats:
+            return empty_stats()
+        if len(stats) == 1:
+            return stats[0]
+        # Moments combinés ; percentiles sur la somme des histogrammes
+        count = sum(s['count'] for s in stats)
+        mean = float(sum(s['mean'] * s['count'] for s in stats) / count)
+        mean_sq = sum((s['std'] ** 2 + s['mean'] ** 2) * s['count'] for s in stats) / count
+        low, high = min(s['min'] for s in stats), max(s['max'] for s in stats)
+        merged = sum(buffer.histogram.counts for buffer in selected)
         return {
-            'max': self.data['spread'].max(),
-            'min': self.data['spread'].min(),
-            'mean': self.data['spread'].mean()
+            'max': high,
+            'min': low,
+            'mean': mean,
+            'std': math.sqrt(max(mean_sq - mean * mean, 0.0)),
+            'count': count,
+            **clip_percentiles(selected[0].histogram.percentiles(merged), low, high)
         }
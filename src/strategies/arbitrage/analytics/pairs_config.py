@@ -4,24 +4,38 @@
 PAIRS_CONFIG = {
     'binance': {
         'format': '{base}/USDC',  # Binance en USDC
+        'quote': 'USDC',
         'assets': ['BTC', 'ETH', 'SOL']
     },
     'okx': {
         'format': '{base}/USDT',  
+        'quote': 'USDT',
         'assets': ['BTC', 'ETH', 'SOL']
     },
     'blofin': {
         'format': '{base}USDT',  # Format spécifique Blofin (sans slash)
+        'quote': 'USDT',
         'assets': ['BTC', 'ETH', 'SOL']
     },
     'gateio': {
         'format': '{base}_USDT',  # Format Gate.io
+        'quote': 'USDT',
         'assets': ['BTC', 'ETH']
     }
 }
 
-def get_symbol(exchange: str, base_asset: str) -> str:
-    """Génère le symbol exact pour chaque exchange"""
+def get_symbol(exchange: str, base_asset: str, universe=None) -> str:
+    """
+    Génère le symbol exact pour chaque exchange.
+    Avec un MarketUniverse, l'identifiant natif est lu dans l'index des marchés
+    chargés ; PAIRS_CONFIG ne sert plus qu'à choisir la devise de cotation ('quote').
+    """
+    if universe is not None and exchange in PAIRS_CONFIG:
+        symbol = f"{base_asset}/{PAIRS_CONFIG[exchange]['quote']}"
+        try:
+            return universe.to_native(exchange, symbol)
+        except KeyError:
+            raise ValueError(f"{symbol} non coté sur {exchange}") from None
     if exchange not in PAIRS_CONFIG:
         raise ValueError(f"Exchange {exchange} non configuré")
     if base_asset not in PAIRS_CONFIG[exchange]['assets']:
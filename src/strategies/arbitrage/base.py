@@ -0,0 +1,15 @@
+"""
+Classe de base des stratégies d'arbitrage
+@author: Patmoorea
+"""
+from typing import Any, Dict
+import logging
+
+
+class BaseStrategy:
+    """Socle commun : configuration et logger de la stratégie"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = dict(config or {})
+        self.name = self.config.get('name', self.__class__.__name__)
+        self.logger = logging.getLogger(self.__class__.__module__)
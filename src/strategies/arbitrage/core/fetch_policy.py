@@ -0,0 +1,246 @@
+"""
+Politique de récupération des prix : backoff, circuit breaker et requêtes doublées
+@author: Patmoorea
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Type
+import asyncio
+import logging
+import random
+import time
+
+
+class CircuitOpenError(ConnectionError):
+    """Levée quand un exchange est temporairement ignoré (circuit ouvert)"""
+
+
+@dataclass
+class VenueStats:
+    """Compteurs de succès/latence d'un exchange"""
+    successes: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    rejected: int = 0        # Appels refusés circuit ouvert
+    hedged: int = 0          # Requêtes doublées envoyées
+    hedge_wins: int = 0      # Requêtes doublées arrivées en premier
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=256))
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict:
+        total = self.successes + self.failures
+        return {
+            'successes': self.successes,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'rejected': self.rejected,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'success_rate': self.successes / total if total else None,
+            'p50_ms': self._ms(self.percentile(0.5)),
+            'p95_ms': self._ms(self.percentile(0.95))
+        }
+
+    @staticmethod
+    def _ms(value: Optional[float]) -> Optional[float]:
+        return value * 1000 if value is not None else None
+
+
+class CircuitBreaker:
+    """
+    Circuit par exchange : après failure_budget échecs consécutifs, le
+    circuit s'ouvre et l'exchange est ignoré pendant cooldown secondes.
+    Un seul appel d'essai est ensuite autorisé (semi-ouvert).
+    """
+
+    def __init__(self, failure_budget: int = 5, cooldown: float = 30.0):
+        self.failure_budget = failure_budget
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Libère l'appel d'essai sans conclure (erreur non imputable à l'exchange)"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_budget:
+            self.opened_at = time.monotonic()
+
+
+class FetchPolicy:
+    """
+    Exécute les appels réseau d'un exchange sans bloquer la boucle :
+    - retries avec backoff exponentiel et jitter complet ;
+    - circuit breaker par exchange ;
+    - requête doublée optionnelle (hedging) : si la première n'a pas
+      répondu après le p95 de latence observé, une seconde est envoyée
+      et la première réponse gagne.
+    Les fonctions synchrones (clients ccxt classiques) passent par un thread.
+
+    Seules les erreurs de type venue_errors (transport, exchange
+    indisponible) et les timeouts comptent pour le circuit et sont
+    retentées ; les autres (symbole invalide, données incohérentes)
+    remontent immédiatement sans pénaliser l'exchange.
+    """
+
+    def __init__(self,
+                 retries: int = 3,
+                 base_delay: float = 0.1,
+                 max_delay: float = 2.0,
+                 timeout: Optional[float] = 10.0,
+                 failure_budget: int = 5,
+                 cooldown: float = 30.0,
+                 hedge: bool = False,
+                 hedge_min_samples: int = 20,
+                 venue_errors: Tuple[Type[BaseException], ...] = (Exception,)):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.failure_budget = failure_budget
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.venue_errors = venue_errors
+        self.logger = logging.getLogger(__name__)
+        self.stats: Dict[str, VenueStats] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def _venue(self, venue: str):
+        if venue not in self.stats:
+            self.stats[venue] = VenueStats()
+            self.breakers[venue] = CircuitBreaker(self.failure_budget, self.cooldown)
+        return self.stats[venue], self.breakers[venue]
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Backoff exponentiel avec jitter complet"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_available(self, venue: str) -> bool:
+        """True si le circuit de l'exchange n'est pas ouvert"""
+        return self._venue(venue)[1].state != 'open'
+
+    def record(self, venue: str, success: bool, latency: Optional[float] = None) -> None:
+        """Enregistre le résultat d'un appel fait hors de la politique"""
+        stats, breaker = self._venue(venue)
+        if success:
+            stats.successes += 1
+            if latency is not None:
+                stats.latencies.append(latency)
+            breaker.record_success()
+        else:
+            stats.failures += 1
+            breaker.record_failure()
+
+    @staticmethod
+    async def _invoke(fn: Callable, *args) -> Any:
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def _attempt(self, venue: str, fn: Callable, *args) -> Any:
+        stats, _ = self._venue(venue)
+        hedge_after = stats.percentile(0.95) if (
+            self.hedge and len(stats.latencies) >= self.hedge_min_samples) else None
+
+        primary = asyncio.ensure_future(self._invoke(fn, *args))
+        if hedge_after is None:
+            return await asyncio.wait_for(primary, self.timeout)
+
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        stats.hedged += 1
+        secondary = asyncio.ensure_future(self._invoke(fn, *args))
+        pending = {primary, secondary}
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is secondary:
+                        stats.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        for task in pending:
+            task.cancel()
+        raise error if error is not None else asyncio.TimeoutError()
+
+    async def call(self, venue: str, fn: Callable, *args) -> Any:
+        """Appelle fn(*args) selon la politique, lève la dernière erreur en cas d'échec"""
+        stats, breaker = self._venue(venue)
+        last_error: Optional[BaseException] = None
+
+        attempts = max(1, self.retries)
+        for attempt in range(attempts):
+            if not breaker.allow():
+                stats.rejected += 1
+                raise CircuitOpenError(f"Circuit ouvert pour {venue}") from last_error
+
+            start = time.perf_counter()
+            try:
+                result = await self._attempt(venue, fn, *args)
+            except asyncio.TimeoutError as e:
+                stats.timeouts += 1
+                last_error = e
+            except Exception as e:
+                if not isinstance(e, self.venue_errors):
+                    breaker.release()
+                    raise
+                last_error = e
+            else:
+                self.record(venue, True, time.perf_counter() - start)
+                return result
+
+            self.record(venue, False)
+            self.logger.debug(f"{venue}: tentative {attempt + 1}/{attempts} échouée: {last_error!r}")
+            if attempt < attempts - 1:
+                await asyncio.sleep(self.backoff_delay(attempt))
+
+        raise last_error
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Compteurs par exchange, avec l'état du circuit"""
+        return {
+            venue: {**stats.to_dict(), 'circuit': self.breakers[venue].state}
+            for venue, stats in self.stats.items()
+        }
@@ -1,8 +1,16 @@
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
 import ccxt
+import numpy as np
 import time
 import logging
 from ..base import BaseStrategy
+from .fetch_policy import CircuitOpenError, FetchPolicy
+from ..multi_exchange.services.market_universe import UniverseBuilder
+
+# Erreurs imputables à l'exchange (réseau, indisponibilité, rate limit) : elles
+# seules comptent pour le circuit ; un symbole invalide ne pénalise pas l'exchange
+VENUE_ERRORS = (ccxt.NetworkError, OSError)
 
 class USDCArbitrage(BaseStrategy):
     """
@@ -13,9 +21,29 @@ class USDCArbitrage(BaseStrategy):
         super().__init__(config)
         self.min_spread = float(config.get('min_spread', 0.002))
         self.timeout = int(config.get('timeout', 30000))  # 30s par défaut
+        self.bulk_scan = bool(config.get('bulk_scan', True))
+        self.markets_ttl = float(config.get('markets_ttl', 3600))  # Rafraîchissement des marchés (s)
+        self.max_concurrency = int(config.get('max_concurrency', 8))
+        self.fetch_policy = FetchPolicy(
+            retries=int(config.get('retries', 3)),
+            base_delay=float(config.get('retry_base_delay', 0.1)),
+            max_delay=float(config.get('retry_max_delay', 2.0)),
+            timeout=self.timeout / 1000,
+            failure_budget=int(config.get('failure_budget', 10)),
+            cooldown=float(config.get('circuit_cooldown', 30.0)),
+            hedge=bool(config.get('hedge_requests', False)),
+            venue_errors=VENUE_ERRORS
+        )
         self.logger = logging.getLogger(__name__)
         self.exchanges = self._init_exchanges(config.get('exchanges', ['binance']))
         self.exchange = next(iter(self.exchanges.values())) if self.exchanges else None
+        # Univers de marchés partagé : snapshot local relu au démarrage, load_markets
+        # de tous les exchanges en parallèle et en arrière-plan ensuite
+        self.universe_builder = UniverseBuilder(
+            self.exchanges,
+            snapshot_path=config.get('universe_snapshot'),
+            max_age=self.markets_ttl
+        ) if config.get('use_universe', True) else None
 
     def _init_exchanges(self, exchange_names: List[str]) -> Dict[str, ccxt.Exchange]:
         exchanges = {}
@@ -54,24 +82,58 @@ class USDCArbitrage(BaseStrategy):
             self.logger.warning(f"Erreur extraction prix: {str(e)}")
             return 0.0
 
-    def _safe_fetch_prices(self, exchange, symbol: str, retries: int = 3) -> tuple:
-        """Récupération ultra-robuste des prix avec fallback"""
-        methods = [
+    @staticmethod
+    def _venue_name(exchange) -> str:
+        return getattr(exchange, 'id', None) or exchange.__class__.__name__
+
+    def _price_methods(self) -> list:
+        return [
             self._fetch_via_order_book,
             self._fetch_via_ticker,
             self._fetch_via_trades
         ]
+
+    def _safe_fetch_prices(self, exchange, symbol: str, retries: int = 3) -> tuple:
+        """Récupération ultra-robuste des prix avec fallback"""
+        venue = self._venue_name(exchange)
         
+        retries = max(1, retries)
         for attempt in range(retries):
-            for method in methods:
+            for method in self._price_methods():
+                if not self.fetch_policy.is_available(venue):
+                    raise CircuitOpenError(f"Circuit ouvert pour {venue}, {symbol} ignoré")
+                start = time.perf_counter()
                 try:
-                    return method(exchange, symbol)
+                    prices = method(exchange, symbol)
+                    self.fetch_policy.record(venue, True, time.perf_counter() - start)
+                    return prices
                 except Exception as e:
+                    if isinstance(e, VENUE_ERRORS):
+                        self.fetch_policy.record(venue, False)
                     self.logger.warning(f"Tentative {attempt+1}: Méthode {method.__name__} échouée pour {symbol}: {str(e)}")
-                    time.sleep(1)
+            # Backoff entre deux tours complets seulement
+            if attempt < retries - 1:
+                time.sleep(self.fetch_policy.backoff_delay(attempt))
         
         raise ConnectionError(f"Échec après {retries} tentatives pour {symbol}")
 
+    async def _safe_fetch_prices_async(self, exchange, symbol: str) -> tuple:
+        """
+        Version non bloquante : chaque méthode passe par la FetchPolicy
+        (backoff avec jitter, circuit par exchange, requêtes doublées).
+        """
+        venue = self._venue_name(exchange)
+        last_error = None
+        for method in self._price_methods():
+            try:
+                return await self.fetch_policy.call(venue, method, exchange, symbol)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                last_error = e
+                self.logger.warning(f"Méthode {method.__name__} échouée pour {symbol}: {str(e)}")
+        raise ConnectionError(f"Échec de toutes les méthodes pour {symbol}") from last_error
+
     def _fetch_via_order_book(self, exchange, symbol: str) -> tuple:
         """Récupération via le carnet d'ordres"""
         data = exchange.fetch_order_book(symbol, {'limit': 1})
@@ -100,27 +162,126 @@ class USDCArbitrage(BaseStrategy):
         spread = mid_price * 0.001  # Estimation du spread
         return mid_price - spread/2, mid_price + spread/2
 
-    def scan_all_pairs(self) -> Dict[str, float]:
-        """Scan principal avec gestion d'erreur complète"""
+    def _get_usdc_symbols(self, name: str, exchange) -> List[str]:
+        """
+        Paires /USDC actives : depuis l'univers partagé (rafraîchi toutes
+        les markets_ttl secondes), sinon depuis load_markets(), que ccxt
+        garde en cache sur l'exchange.
+        """
+        if self.universe_builder is not None:
+            return self.universe_builder.get().symbols(name, quote='USDC')
+        markets = exchange.load_markets()
+        return [
+            symbol for symbol in markets
+            if symbol.endswith('/USDC') and markets[symbol].get('active')
+        ]
+
+    def _fetch_top_of_book_bulk(self, exchange, symbols: List[str]) -> Optional[Dict[str, Dict]]:
+        """Meilleur bid/ask de toutes les paires en un seul appel (None si non supporté)"""
+        if exchange.has.get('fetchBidsAsks'):
+            return exchange.fetch_bids_asks(symbols)
+        if exchange.has.get('fetchTickers'):
+            return exchange.fetch_tickers(symbols)
+        return None
+
+    def _shortlist_spreads(self, tickers: Dict[str, Dict], symbols: List[str]) -> List[str]:
+        """Calcule tous les spreads en une passe vectorisée et garde les candidats"""
+        rows = [tickers.get(symbol) or {} for symbol in symbols]
+        bids = np.array([row.get('bid') or 0.0 for row in rows], dtype=float)
+        asks = np.array([row.get('ask') or 0.0 for row in rows], dtype=float)
+        valid = (bids > 0) & (asks > 0) & (bids < asks)
+        spreads = np.zeros_like(asks)
+        np.divide(asks - bids, asks, out=spreads, where=valid)
+        return [symbols[i] for i in np.flatnonzero(valid & (spreads > self.min_spread))]
+
+    def scan_all_pairs(self, bulk: Optional[bool] = None) -> Dict[str, float]:
+        """
+        Scan principal avec gestion d'erreur complète.
+
+        En mode bulk (défaut, cf. config 'bulk_scan'), un seul appel
+        fetch_bids_asks/fetch_tickers par exchange sert à présélectionner
+        les paires ; seules celles-ci sont confirmées via l'order book.
+        """
+        bulk = self.bulk_scan if bulk is None else bulk
+        opportunities = {}
+        for name, exchange in self.exchanges.items():
+            try:
+                symbols = self._get_usdc_symbols(name, exchange)
+                if bulk and symbols:
+                    try:
+                        tickers = self._fetch_top_of_book_bulk(exchange, symbols)
+                    except Exception as e:
+                        self.logger.warning(f"Scan bulk indisponible sur {name}: {str(e)}")
+                        tickers = None
+                    if tickers is not None:
+                        symbols = self._shortlist_spreads(tickers, symbols)
+                for symbol in symbols:
+                    try:
+                        bid, ask = self._safe_fetch_prices(exchange, symbol)
+                        spread = (ask - bid) / ask
+                        if spread > self.min_spread:
+                            opportunities[f"{name}:{symbol}"] = spread
+                    except Exception as e:
+                        self.logger.warning(f"Erreur traitement {symbol}: {str(e)}")
+                        continue
+            except Exception as e:
+                self.logger.error(f"Erreur exchange {name}: {str(e)}")
+                continue
+        return opportunities
+
+    async def scan_all_pairs_async(self, bulk: Optional[bool] = None) -> Dict[str, float]:
+        """
+        Scan non bloquant : les paires sont interrogées en parallèle
+        (max_concurrency) et un exchange dont le circuit est ouvert est
+        sauté au lieu de bloquer le scan.
+        """
+        bulk = self.bulk_scan if bulk is None else bulk
+        semaphore = asyncio.Semaphore(self.max_concurrency)
         opportunities = {}
+
+        async def check(name: str, exchange, symbol: str):
+            async with semaphore:
+                try:
+                    bid, ask = await self._safe_fetch_prices_async(exchange, symbol)
+                except CircuitOpenError as e:
+                    self.logger.debug(str(e))
+                    return
+                except Exception as e:
+                    self.logger.warning(f"Erreur traitement {symbol}: {str(e)}")
+                    return
+            spread = (ask - bid) / ask
+            if spread > self.min_spread:
+                opportunities[f"{name}:{symbol}"] = spread
+
+        tasks = []
         for name, exchange in self.exchanges.items():
+            venue = self._venue_name(exchange)
+            if not self.fetch_policy.is_available(venue):
+                self.logger.info(f"Exchange {name} ignoré (circuit ouvert)")
+                continue
             try:
-                markets = exchange.load_markets()
-                for symbol in markets:
-                    if symbol.endswith('/USDC') and markets[symbol].get('active'):
-                        try:
-                            bid, ask = self._safe_fetch_prices(exchange, symbol)
-                            spread = (ask - bid) / ask
-                            if spread > self.min_spread:
-                                opportunities[f"{name}:{symbol}"] = spread
-                        except Exception as e:
-                            self.logger.warning(f"Erreur traitement {symbol}: {str(e)}")
-                            continue
+                symbols = await asyncio.to_thread(self._get_usdc_symbols, name, exchange)
+                if bulk and symbols:
+                    try:
+                        tickers = await self.fetch_policy.call(
+                            venue, self._fetch_top_of_book_bulk, exchange, symbols)
+                    except Exception as e:
+                        self.logger.warning(f"Scan bulk indisponible sur {name}: {str(e)}")
+                        tickers = None
+                    if tickers is not None:
+                        symbols = self._shortlist_spreads(tickers, symbols)
             except Exception as e:
                 self.logger.error(f"Erreur exchange {name}: {str(e)}")
                 continue
+            tasks.extend(check(name, exchange, symbol) for symbol in symbols)
+
+        await asyncio.gather(*tasks)
         return opportunities
 
+    def get_fetch_stats(self) -> Dict[str, Dict]:
+        """Compteurs succès/latence/circuit par exchange"""
+        return self.fetch_policy.get_stats()
+
     def get_opportunities(self) -> List[Tuple[str, float]]:
         return [
             (pair, spread)
@@ -1,20 +1,47 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from decimal import Decimal
-import asyncio
+from datetime import datetime, timezone
 import logging
+import os
 import time
+import numpy as np
 from ....exchanges.base_exchange import BaseExchange
+from .core.incremental_engine import IncrementalArbitrageEngine
+from .fee_calculator import FeeCalculator
+from .services.order_book_fetcher import BookFetchResult, OrderBookFetcher
+from .services.staleness import StalenessPolicy
+from .utils.depth_profile import DepthProfile, optimal_trade_size
+from .utils.opportunity_matrix import OpportunityMatrix
 
 class ArbitrageScanner:
-    def __init__(self, exchanges: List[BaseExchange], min_profit_threshold: Decimal = Decimal('0.001')):
+    def __init__(self, exchanges: List[BaseExchange], min_profit_threshold: Decimal = Decimal('0.001'),
+                 fetcher: Optional[OrderBookFetcher] = None,
+                 fee_calculator: Optional[FeeCalculator] = None,
+                 staleness_policy: Optional[StalenessPolicy] = None):
         if min_profit_threshold <= Decimal('0'):
             raise ValueError("Le seuil de profit minimum doit être positif")
             
         self.exchanges = exchanges
         self.min_profit_threshold = min_profit_threshold
         self.logger = logging.getLogger(__name__)
+        self.fetcher = fetcher or OrderBookFetcher()
+        # Sans calculateur, les frais restent à zéro (comportement historique)
+        self.fee_calculator = fee_calculator
+        self.incremental_engine: Optional[IncrementalArbitrageEngine] = None
+        # Expiration des opportunités dont une jambe est plus ancienne que le budget
+        self.staleness_policy = staleness_policy or StalenessPolicy()
+        self.last_scan_report: List[Dict] = []
 
-    async def scan_opportunities(self, symbol: str, *, trade_amount: Decimal = Decimal('1.0')) -> List[Dict]:
+    async def scan_opportunities(self, symbol: str, *, trade_amount: Decimal = Decimal('1.0'),
+                                 depth_aware: bool = False) -> List[Dict]:
+        """
+        Scan des opportunités d'un symbole entre toutes les paires d'exchanges.
+
+        Avec depth_aware, les prix d'achat/vente sont les VWAP exécutables
+        pour trade_amount (profils de profondeur cumulée construits une fois
+        par book) et chaque opportunité indique la taille optimale
+        (optimal_amount) et le profit correspondant (optimal_profit).
+        """
         start_time = time.perf_counter()
         opportunities = []
         
@@ -25,29 +52,39 @@ class ArbitrageScanner:
 
             self.logger.debug(f"Début scan pour {symbol} sur {len(self.exchanges)} exchanges")
             
-            # Récupération des order books
-            order_books = await asyncio.gather(
-                *[self._get_order_book(exchange, symbol) for exchange in self.exchanges],
-                return_exceptions=True
+            # Récupération concurrente des order books
+            results = await self.fetcher.fetch_all(
+                [(exchange, symbol) for exchange in self.exchanges]
             )
+            self._record_scan_report(results)
 
             valid_order_books = []
             valid_exchanges = []
+            valid_results = []
 
-            for i, result in enumerate(order_books):
-                if isinstance(result, Exception):
-                    self.logger.error(f"Erreur pour {self.exchanges[i].__class__.__name__}: {str(result)}")
+            for i, result in enumerate(results):
+                if not result.ok:
+                    self.logger.error(f"Erreur pour {result.exchange}: {result.error}")
                     continue
-                if not result.get('asks') or not result.get('bids'):
-                    self.logger.warning(f"Order book vide pour {self.exchanges[i].__class__.__name__}")
+                if not result.book.get('asks') or not result.book.get('bids'):
+                    self.logger.warning(f"Order book vide pour {result.exchange}")
                     continue
-                valid_order_books.append(result)
+                valid_order_books.append(result.book)
                 valid_exchanges.append(self.exchanges[i])
+                valid_results.append(result)
+
+            if depth_aware:
+                amount = float(trade_amount)
+                ask_profiles = [DepthProfile.from_book(book, 'asks') for book in valid_order_books]
+                bid_profiles = [DepthProfile.from_book(book, 'bids') for book in valid_order_books]
 
             for i, buy_exchange in enumerate(valid_exchanges):
                 buy_book = valid_order_books[i]
                 
-                if not buy_book['asks'] or buy_book['asks'][0][1] < trade_amount:
+                if depth_aware:
+                    if ask_profiles[i].depth < amount:
+                        continue
+                elif not buy_book['asks'] or buy_book['asks'][0][1] < trade_amount:
                     continue
 
                 for j, sell_exchange in enumerate(valid_exchanges):
@@ -55,33 +92,31 @@ class ArbitrageScanner:
                         continue
                         
                     sell_book = valid_order_books[j]
-                    if not sell_book['bids'] or sell_book['bids'][0][1] < trade_amount:
+                    if depth_aware:
+                        if bid_profiles[j].depth < amount:
+                            continue
+                        buy_price = Decimal(str(ask_profiles[i].vwap(amount)))
+                        sell_price = Decimal(str(bid_profiles[j].vwap(amount)))
+                    elif not sell_book['bids'] or sell_book['bids'][0][1] < trade_amount:
                         continue
+                    else:
+                        buy_price = buy_book['asks'][0][0]
+                        sell_price = sell_book['bids'][0][0]
 
-                    buy_price = buy_book['asks'][0][0]
-                    sell_price = sell_book['bids'][0][0]
-                    
-                    # Calcul du profit brut et net (pour l'instant sans frais)
-                    gross_profit = (sell_price - buy_price) * trade_amount
-                    total_fees = Decimal('0')  # À implémenter avec le calculateur de frais
-                    net_profit = gross_profit - total_fees
-                    profit_ratio = net_profit / (buy_price * trade_amount)
-
-                    if profit_ratio > self.min_profit_threshold:
-                        opportunities.append({
-                            'buy_exchange': buy_exchange.__class__.__name__,
-                            'sell_exchange': sell_exchange.__class__.__name__,
-                            'symbol': symbol,
-                            'amount': trade_amount,
-                            'buy_price': buy_price,
-                            'sell_price': sell_price,
-                            'gross_profit': gross_profit,
-                            'total_fees': total_fees,
-                            'net_profit': net_profit,
-                            'profit_ratio': profit_ratio
-                        })
+                    opportunity = self._build_opportunity(
+                        buy_exchange, sell_exchange, symbol, trade_amount,
+                        buy_price, sell_price
+                    )
+                    opportunity['legs'] = self._legs(valid_results[i], valid_results[j])
+                    if opportunity['profit_ratio'] > self.min_profit_threshold:
+                        if depth_aware:
+                            sizing = optimal_trade_size(ask_profiles[i], bid_profiles[j])
+                            opportunity['optimal_amount'] = Decimal(str(sizing['size']))
+                            opportunity['optimal_profit'] = Decimal(str(sizing['net_profit']))
+                        opportunities.append(opportunity)
 
             opportunities.sort(key=lambda x: x['net_profit'], reverse=True)
+            opportunities = self.staleness_policy.apply(opportunities)
 
         except Exception as e:
             self.logger.error(f"Erreur scan_opportunities: {str(e)}")
@@ -94,12 +129,254 @@ class ArbitrageScanner:
             
         return opportunities
 
-    async def _get_order_book(self, exchange: BaseExchange, symbol: str) -> Dict:
+    async def scan_opportunities_matrix(self, symbols: List[str], *,
+                                        trade_amount: Decimal = Decimal('1.0'),
+                                        top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Scan vectorisé de plusieurs symboles sur tous les exchanges.
+
+        Les meilleurs bid/ask de chaque (exchange, symbole) sont regroupés
+        dans une OpportunityMatrix et le tenseur des ratios de profit est
+        calculé en une seule opération NumPy. Seuls les top_k meilleurs
+        candidats sont ensuite recalculés en Decimal, si bien que les
+        dictionnaires retournés sont identiques à ceux de scan_opportunities.
+
+        Avec un fee_calculator, les frais de tous les candidats sont
+        calculés en lot (FeeTable) avant la sélection top_k, qui porte
+        alors sur le profit net.
+        """
+        start_time = time.perf_counter()
+        opportunities = []
+
         try:
-            return exchange.get_order_book(symbol)
+            if not self.exchanges or not symbols:
+                self.logger.debug("Liste d'exchanges ou de symboles vide")
+                return opportunities
+
+            keys = [(i, s) for i in range(len(self.exchanges)) for s in range(len(symbols))]
+            results = await self.fetcher.fetch_all(
+                [(self.exchanges[i], symbols[s]) for i, s in keys]
+            )
+            self._record_scan_report(results)
+
+            order_books = {}
+            valid_results = {}
+            for key, result in zip(keys, results):
+                if not result.ok:
+                    self.logger.error(f"Erreur pour {result.exchange} {result.symbol}: {result.error}")
+                    continue
+                if not result.book.get('asks') or not result.book.get('bids'):
+                    continue
+                order_books[key] = result.book
+                valid_results[key] = result
+
+            matrix = OpportunityMatrix.from_order_books(
+                [exchange.__class__.__name__ for exchange in self.exchanges],
+                symbols,
+                order_books
+            )
+            # Pré-filtre en float avec une marge, la décision finale est prise en Decimal
+            min_ratio = float(self.min_profit_threshold) - 1e-12
+            if self.fee_calculator is None:
+                candidates = matrix.top_opportunities(min_ratio, float(trade_amount), top_k)
+                fees = [Decimal('0')] * len(candidates)
+            else:
+                await self.fee_calculator.ensure_fee_table(self.exchanges)
+                candidates, fees = self._rank_after_fees(matrix, min_ratio, float(trade_amount), top_k)
+
+            for (buy_idx, sell_idx, sym_idx), total_fees in zip(candidates, fees):
+                opportunity = self._build_opportunity(
+                    self.exchanges[buy_idx], self.exchanges[sell_idx],
+                    symbols[sym_idx], trade_amount,
+                    order_books[(buy_idx, sym_idx)]['asks'][0][0],
+                    order_books[(sell_idx, sym_idx)]['bids'][0][0],
+                    total_fees
+                )
+                opportunity['legs'] = self._legs(valid_results[(buy_idx, sym_idx)],
+                                                 valid_results[(sell_idx, sym_idx)])
+                if opportunity['profit_ratio'] > self.min_profit_threshold:
+                    opportunities.append(opportunity)
+
+            opportunities.sort(key=lambda x: x['net_profit'], reverse=True)
+            opportunities = self.staleness_policy.apply(opportunities)
+
         except Exception as e:
-            self.logger.error(f"Erreur get_order_book pour {exchange.__class__.__name__}: {str(e)}")
-            return {'asks': [[Decimal('inf'), Decimal('0')]], 'bids': [[Decimal('0'), Decimal('0')]]}
+            self.logger.error(f"Erreur scan_opportunities_matrix: {str(e)}")
+        finally:
+            elapsed = time.perf_counter() - start_time
+            self.logger.debug(
+                f"Matrix scan completed in {elapsed:.3f}s - "
+                f"Found {len(opportunities)} opportunities for {len(symbols)} symbols"
+            )
+
+        return opportunities
+
+    async def scan_incremental(self, symbols: List[str], *,
+                               trade_amount: Decimal = Decimal('1.0'),
+                               top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Scan incrémental : les books récupérés alimentent un
+        IncrementalArbitrageEngine persistant, qui ne re-score que les
+        paires dont un haut de book a bougé depuis le scan précédent.
+
+        Les opportunités retenues par le moteur sont reconstruites au format
+        de scan_opportunities (prix Decimal du book, 'amount', frais, jambes) ;
+        les entrées du moteur ne sont jamais modifiées.
+        """
+        if self.incremental_engine is None:
+            fee_table = self.fee_calculator.fee_table if self.fee_calculator else None
+            self.incremental_engine = IncrementalArbitrageEngine(
+                float(self.min_profit_threshold), fee_table, float(trade_amount))
+        engine = self.incremental_engine
+        engine.set_min_size(float(trade_amount))
+        if self.fee_calculator is not None:
+            await self.fee_calculator.ensure_fee_table(self.exchanges)
+
+        results = await self.fetcher.fetch_all(
+            [(exchange, symbol) for exchange in self.exchanges for symbol in symbols]
+        )
+        self._record_scan_report(results)
+
+        fetched = {}
+        for result in results:
+            if result.ok:
+                engine.update_book(result.exchange, result.symbol, result.book, result.received_at)
+                fetched[(result.exchange, result.symbol)] = result
+            else:
+                engine.remove(result.exchange, result.symbol)
+
+        rescored = engine.recompute()
+        self.logger.debug(f"Scan incrémental: {rescored} paires réévaluées")
+
+        candidates = engine.best(top_k)
+        if self.fee_calculator is not None and candidates:
+            batch = self.fee_calculator.calculate_net_profits_batch(
+                [c['buy_exchange'] for c in candidates],
+                [c['sell_exchange'] for c in candidates],
+                [c['symbol'] for c in candidates],
+                float(trade_amount),
+                [c['buy_price'] for c in candidates],
+                [c['sell_price'] for c in candidates]
+            )
+            fees = [Decimal(str(fee)) for fee in batch['total_fees']]
+        else:
+            fees = [Decimal('0')] * len(candidates)
+
+        exchanges = {exchange.__class__.__name__: exchange for exchange in self.exchanges}
+        opportunities = []
+        for candidate, total_fees in zip(candidates, fees):
+            buy_exchange, sell_exchange = candidate['buy_exchange'], candidate['sell_exchange']
+            if buy_exchange not in exchanges or sell_exchange not in exchanges:
+                continue
+            symbol = candidate['symbol']
+            buy_result = fetched.get((buy_exchange, symbol))
+            sell_result = fetched.get((sell_exchange, symbol))
+            # Prix exacts du book courant, sinon ceux du moteur (alimenté hors scan)
+            buy_price = buy_result.book['asks'][0][0] if buy_result else Decimal(str(candidate['buy_price']))
+            sell_price = sell_result.book['bids'][0][0] if sell_result else Decimal(str(candidate['sell_price']))
+            opportunity = self._build_opportunity(
+                exchanges[buy_exchange], exchanges[sell_exchange], symbol, trade_amount,
+                buy_price, sell_price, total_fees
+            )
+            opportunity['legs'] = (self._legs(buy_result, sell_result) if buy_result and sell_result
+                                   else [dict(leg) for leg in candidate['legs']])
+            if opportunity['profit_ratio'] > self.min_profit_threshold:
+                opportunities.append(opportunity)
+
+        opportunities.sort(key=lambda x: x['net_profit'], reverse=True)
+        return self.staleness_policy.apply(opportunities)
+
+    def _rank_after_fees(self, matrix: OpportunityMatrix, min_ratio: float,
+                         trade_amount: float, top_k: Optional[int]):
+        """Frais en lot sur tous les candidats bruts, puis sélection sur le profit net"""
+        buy_idx, sell_idx, sym_idx = matrix.candidate_indices(min_ratio, trade_amount)
+        if buy_idx.size == 0:
+            return [], []
+
+        names = matrix.exchange_names
+        buy_prices = matrix.asks[buy_idx, sym_idx]
+        result = self.fee_calculator.calculate_net_profits_batch(
+            [names[i] for i in buy_idx],
+            [names[j] for j in sell_idx],
+            [matrix.symbols[s] for s in sym_idx],
+            trade_amount,
+            buy_prices,
+            matrix.bids[sell_idx, sym_idx]
+        )
+        net_profit = result['net_profit']
+        keep = np.flatnonzero(net_profit / (buy_prices * trade_amount) > min_ratio)
+        order = keep[OpportunityMatrix.rank(net_profit[keep], top_k)]
+
+        candidates = [(int(buy_idx[k]), int(sell_idx[k]), int(sym_idx[k])) for k in order]
+        fees = [Decimal(str(result['total_fees'][k])) for k in order]
+        return candidates, fees
+
+    def _build_opportunity(self, buy_exchange: BaseExchange, sell_exchange: BaseExchange,
+                           symbol: str, trade_amount: Decimal,
+                           buy_price: Decimal, sell_price: Decimal,
+                           total_fees: Decimal = Decimal('0')) -> Dict:
+        """Construit le dictionnaire d'opportunité commun aux deux modes de scan"""
+        gross_profit = (sell_price - buy_price) * trade_amount
+        net_profit = gross_profit - total_fees
+        profit_ratio = net_profit / (buy_price * trade_amount)
+
+        return {
+            'buy_exchange': buy_exchange.__class__.__name__,
+            'sell_exchange': sell_exchange.__class__.__name__,
+            'symbol': symbol,
+            'amount': trade_amount,
+            'buy_price': buy_price,
+            'sell_price': sell_price,
+            'gross_profit': gross_profit,
+            'total_fees': total_fees,
+            'net_profit': net_profit,
+            'profit_ratio': profit_ratio
+        }
+
+    async def _get_order_book(self, exchange: BaseExchange, symbol: str) -> Dict:
+        result = await self.fetcher.fetch(exchange, symbol)
+        if not result.ok:
+            raise ConnectionError(
+                f"Order book indisponible pour {result.exchange} {symbol}: {result.error}"
+            )
+        return result.book
+
+    @staticmethod
+    def _legs(buy_result: BookFetchResult, sell_result: BookFetchResult) -> List[Dict]:
+        """Jambes horodatées (réception locale et horodatage exchange) d'une opportunité"""
+        return [
+            {'venue': result.exchange, 'symbol': result.symbol,
+             'received_at': result.received_at, 'exchange_timestamp': result.exchange_timestamp}
+            for result in (buy_result, sell_result)
+        ]
+
+    def _record_scan_report(self, results: List[BookFetchResult]) -> None:
+        """Mémorise la latence et l'ancienneté de chaque book du dernier scan"""
+        now = time.time()
+        for result in results:
+            if result.ok:
+                self.staleness_policy.tracker.observe(
+                    result.exchange, result.received_at,
+                    result.exchange_timestamp, result.latency)
+        self.last_scan_report = [
+            {
+                'exchange': result.exchange,
+                'symbol': result.symbol,
+                'status': result.status,
+                'latency_ms': result.latency * 1000,
+                'staleness_ms': result.staleness(now) * 1000,
+                'error': result.error
+            }
+            for result in results
+        ]
+
+    def get_scan_report(self) -> List[Dict]:
+        """Latence et ancienneté par exchange pour le dernier scan"""
+        return list(self.last_scan_report)
+
+    def get_staleness_metrics(self) -> Dict:
+        """Taux d'expiration et latences aller simple estimées par exchange"""
+        return self.staleness_policy.get_metrics()
 
     def get_current_utc(self) -> str:
         """Retourne le timestamp UTC au format YYYY-MM-DD HH:MM:SS"""
@@ -122,6 +399,19 @@ class ArbitrageScanner:
             if not all(field in opportunity for field in required_fields):
                 raise ValueError("Opportunité invalide - champs manquants")
 
+            # Refus d'exécuter sur des cotations trop anciennes
+            if opportunity.get('legs') and not self.staleness_policy.is_fresh(opportunity):
+                self.logger.warning(
+                    f"Opportunité expirée ({opportunity['oldest_leg_age_ms']:.0f} ms, "
+                    f"{opportunity['oldest_leg_venue']}) - exécution annulée"
+                )
+                return {
+                    'execution_time': execution_time,
+                    'execution_user': execution_user,
+                    'status': 'expired',
+                    'details': opportunity
+                }
+
             # Logs d'exécution
             self.logger.info(f"[{execution_time}] Utilisateur {execution_user} - "
                            f"Exécution arbitrage {opportunity['symbol']} : "
@@ -2,46 +2,92 @@
 Moteur d'arbitrage multi-exchanges - Updated: 2025-05-17 23:18:55
 @author: Patmoorea
 """
+import asyncio
 import ccxt
+import ccxt.async_support as ccxt_async
 import os
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
+from ..services.staleness import StalenessPolicy, make_leg
+
 load_dotenv()
 
 class MultiExchangeArbitrage:
+    EXCHANGE_CONFIGS = {
+        'binance': {
+            'apiKey': 'BINANCE_API_KEY',
+            'secret': 'BINANCE_API_SECRET',
+            'enableRateLimit': True
+        },
+        'gateio': {
+            'apiKey': 'GATEIO_API_KEY',
+            'secret': 'GATEIO_API_SECRET'
+        },
+        'bingx': {
+            'apiKey': 'BINGX_API_KEY',
+            'secret': 'BINGX_API_SECRET'
+        },
+        'okx': {
+            'apiKey': 'OKX_API_KEY',
+            'secret': 'OKX_API_SECRET',
+            'password': 'OKX_PASSPHRASE'
+        },
+        'blofin': {
+            'apiKey': 'BLOFIN_API_KEY',
+            'secret': 'BLOFIN_API_SECRET',
+            'password': 'BLOFIN_PASSPHRASE'
+        }
+    }
+
     def __init__(self):
         self.exchanges = {
-            'binance': ccxt.binance({
-                'apiKey': os.getenv('BINANCE_API_KEY'),
-                'secret': os.getenv('BINANCE_API_SECRET'),
-                'enableRateLimit': True
-            }),
-            'gateio': ccxt.gateio({
-                'apiKey': os.getenv('GATEIO_API_KEY'),
-                'secret': os.getenv('GATEIO_API_SECRET')
-            }),
-            'bingx': ccxt.bingx({
-                'apiKey': os.getenv('BINGX_API_KEY'),
-                'secret': os.getenv('BINGX_API_SECRET')
-            }),
-            'okx': ccxt.okx({
-                'apiKey': os.getenv('OKX_API_KEY'),
-                'secret': os.getenv('OKX_API_SECRET'),
-                'password': os.getenv('OKX_PASSPHRASE')
-            }),
-            'blofin': ccxt.blofin({
-                'apiKey': os.getenv('BLOFIN_API_KEY'),
-                'secret': os.getenv('BLOFIN_API_SECRET'),
-                'password': os.getenv('BLOFIN_PASSPHRASE')
-            })
+            name: getattr(ccxt, name)(self._credentials(name))
+            for name in self.EXCHANGE_CONFIGS
         }
+        # Clients ccxt.async_support créés à la première utilisation du mode async
+        self.async_exchanges: Dict[str, ccxt_async.Exchange] = {}
         self.threshold = float(os.getenv('ARBITRAGE_THRESHOLD', 0.3))
+        # Budget de fraîcheur des books (secondes) avant expiration d'une opportunité,
+        # 1.0 par défaut pour check_arbitrage_async (books récupérés en parallèle)
+        self.staleness_policy = StalenessPolicy(float(os.getenv('ARBITRAGE_STALENESS_BUDGET', 1.0)))
+        # check_arbitrage récupère les books l'un après l'autre : pas d'expiration
+        # par défaut (âge des jambes seulement annoté), budget dédié si défini
+        sync_budget = os.getenv('ARBITRAGE_SYNC_STALENESS_BUDGET')
+        self.sync_staleness_policy = StalenessPolicy(float(sync_budget)) if sync_budget else None
         self.last_update = "2025-05-17 23:18:55"
         self.version = "2.0.0"
 
+    def _credentials(self, name: str) -> Dict:
+        """Paramètres ccxt d'un exchange, clés lues dans l'environnement"""
+        return {
+            key: os.getenv(value) if isinstance(value, str) else value
+            for key, value in self.EXCHANGE_CONFIGS[name].items()
+        }
+
+    def _evaluate_books(self, name: str, pair1: str, pair2: str,
+                        book1: Dict, book2: Dict) -> Optional[Dict]:
+        """Calcule le spread entre deux books et retourne l'opportunité éventuelle"""
+        bid = book1['bids'][0][0]
+        ask = book2['asks'][0][0]
+        spread = (bid / ask - 1) * 100
+
+        if spread <= self.threshold:
+            return None
+        return {
+            'exchange': name,
+            'spread': spread,
+            'pair1': pair1,
+            'pair2': pair2,
+            'bid': bid,
+            'ask': ask,
+            'timestamp': datetime.utcnow(),
+            'volume': min(book1['bids'][0][1], book2['asks'][0][1]),
+            'legs': [make_leg(name, pair1, book1), make_leg(name, pair2, book2)]
+        }
+
     def check_arbitrage(self, base='BTC', quote1='USDC', quote2='USDT') -> List[Dict]:
         opportunities = []
         
@@ -52,62 +98,178 @@ class MultiExchangeArbitrage:
                 pair2 = f"{base}/{quote2}"
                 
                 book1 = exchange.fetch_order_book(pair1)
+                book1['received_at'] = time.time()
                 book2 = exchange.fetch_order_book(pair2)
+                book2['received_at'] = time.time()
                 
-                # Calcul du spread
-                bid = book1['bids'][0][0]
-                ask = book2['asks'][0][0]
-                spread = (bid / ask - 1) * 100
-                
-                if spread > self.threshold:
-                    opportunities.append({
-                        'exchange': name,
-                        'spread': spread,
-                        'pair1': pair1,
-                        'pair2': pair2,
-                        'bid': bid,
-                        'ask': ask,
-                        'timestamp': datetime.utcnow(),
-                        'volume': min(book1['bids'][0][1], book2['asks'][0][1])
-                    })
+                opportunity = self._evaluate_books(name, pair1, pair2, book1, book2)
+                if opportunity:
+                    opportunities.append(opportunity)
                     
             except Exception as e:
                 print(f"Erreur sur {name}: {str(e)}")
         
-        return sorted(opportunities, key=lambda x: x['spread'], reverse=True)
+        opportunities.sort(key=lambda x: x['spread'], reverse=True)
+        if self.sync_staleness_policy is not None:
+            return self.sync_staleness_policy.apply(opportunities)
+        for opportunity in opportunities:
+            self.staleness_policy.annotate(opportunity)
+        return opportunities
+
+    def _get_async_exchange(self, name: str) -> ccxt_async.Exchange:
+        if name not in self.async_exchanges:
+            self.async_exchanges[name] = getattr(ccxt_async, name)(self._credentials(name))
+        return self.async_exchanges[name]
+
+    async def _fetch_books_async(self, exchange: ccxt_async.Exchange,
+                                 pairs: List[str], use_bulk: bool) -> Dict[str, Dict]:
+        """Récupère les books et les horodate à la réception"""
+        books = await self._request_books_async(exchange, pairs, use_bulk)
+        received_at = time.time()
+        for book in books.values():
+            book['received_at'] = received_at
+        return books
 
-    def monitor(self, interval: int = 30):
+    async def _request_books_async(self, exchange: ccxt_async.Exchange,
+                                   pairs: List[str], use_bulk: bool) -> Dict[str, Dict]:
+        """
+        Récupère les books de plusieurs paires sur un exchange.
+
+        Avec use_bulk, un seul appel fetch_order_books (ou fetch_bids_asks,
+        meilleur niveau uniquement) est utilisé si l'exchange le supporte ;
+        sinon, ou si l'appel groupé échoue, les fetch_order_book individuels
+        partent en parallèle.
+        """
+        if use_bulk and exchange.has.get('fetchOrderBooks'):
+            try:
+                books = await exchange.fetch_order_books(pairs)
+                if all(pair in books for pair in pairs):
+                    return books
+            except Exception as e:
+                print(f"fetch_order_books indisponible sur {exchange.id}: {str(e)}")
+        if use_bulk and exchange.has.get('fetchBidsAsks'):
+            try:
+                tickers = await exchange.fetch_bids_asks(pairs)
+            except Exception as e:
+                print(f"fetch_bids_asks indisponible sur {exchange.id}: {str(e)}")
+                tickers = {}
+            if all(pair in tickers for pair in pairs):
+                return {
+                    pair: {
+                        'bids': [[tickers[pair]['bid'], tickers[pair].get('bidVolume') or 0]],
+                        'asks': [[tickers[pair]['ask'], tickers[pair].get('askVolume') or 0]],
+                        'timestamp': tickers[pair].get('timestamp')
+                    }
+                    for pair in pairs
+                }
+        books = await asyncio.gather(*[exchange.fetch_order_book(pair) for pair in pairs])
+        return dict(zip(pairs, books))
+
+    async def check_arbitrage_async(self, base='BTC', quote1='USDC', quote2='USDT',
+                                    use_bulk: bool = True) -> List[Dict]:
+        """
+        Version async de check_arbitrage : tous les books de tous les
+        exchanges sont récupérés en parallèle, un cycle coûte donc le
+        round-trip le plus lent au lieu de la somme des round-trips.
+        """
+        pair1 = f"{base}/{quote1}"
+        pair2 = f"{base}/{quote2}"
+        names = list(self.exchanges)
+        results = await asyncio.gather(
+            *[self._fetch_books_async(self._get_async_exchange(name), [pair1, pair2], use_bulk)
+              for name in names],
+            return_exceptions=True
+        )
+
+        opportunities = []
+        for name, books in zip(names, results):
+            if isinstance(books, Exception):
+                print(f"Erreur sur {name}: {str(books)}")
+                continue
+            try:
+                opportunity = self._evaluate_books(name, pair1, pair2, books[pair1], books[pair2])
+                if opportunity:
+                    opportunities.append(opportunity)
+            except Exception as e:
+                print(f"Erreur sur {name}: {str(e)}")
+
+        opportunities.sort(key=lambda x: x['spread'], reverse=True)
+        return self.staleness_policy.apply(opportunities)
+
+    async def close_async(self):
+        """Ferme les sessions HTTP des clients async"""
+        await asyncio.gather(
+            *[exchange.close() for exchange in self.async_exchanges.values()],
+            return_exceptions=True
+        )
+        self.async_exchanges = {}
+
+    def _print_opportunities(self, opportunities: List[Dict]):
+        timestamp = time.strftime("%H:%M:%S")
+        if opportunities:
+            for opp in opportunities:
+                print(f"[{timestamp}] {opp['exchange'].upper()}:")
+                print(f"  {opp['pair1']} bid: {opp['bid']}")
+                print(f"  {opp['pair2']} ask: {opp['ask']}")
+                print(f"  SPREAD: {opp['spread']:.4f}%")
+                print(f"  VOLUME: {opp['volume']:.4f}")
+                print("-"*40)
+        else:
+            print(f"[{timestamp}] Aucune opportunité > {self.threshold}%", end='\r')
+
+    @staticmethod
+    def _next_deadline(deadline: float, interval: float) -> float:
+        """
+        Prochaine échéance sur une grille fixe : la cadence ne dérive pas
+        avec la durée des fetchs, et les ticks manqués sont sautés.
+        """
+        deadline += interval
+        now = time.monotonic()
+        if deadline < now:
+            deadline += ((now - deadline) // interval + 1) * interval
+        return deadline
+
+    def monitor(self, interval: int = 30, use_async: bool = False):
         """
         Surveillance continue des opportunités d'arbitrage
         @param interval: Intervalle de vérification en secondes
+        @param use_async: Récupère les books en parallèle (ccxt.async_support)
         """
         print("\n=== Surveillance Multi-Plateforme ===")
         print(f"Seuil: {self.threshold}% | Intervalle: {interval}s")
         print("Plateformes actives: Binance, Gate.io, BingX, OKX, Blofin")
         print("Appuyez sur Ctrl+C pour quitter\n")
+
+        if use_async:
+            try:
+                asyncio.run(self.monitor_async(interval))
+            except KeyboardInterrupt:
+                print("\nArrêt du monitoring")
+            return
         
+        deadline = time.monotonic()
         while True:
             try:
-                timestamp = time.strftime("%H:%M:%S")
-                opportunities = self.check_arbitrage()
-                
-                if opportunities:
-                    for opp in opportunities:
-                        print(f"[{timestamp}] {opp['exchange'].upper()}:")
-                        print(f"  {opp['pair1']} bid: {opp['bid']}")
-                        print(f"  {opp['pair2']} ask: {opp['ask']}")
-                        print(f"  SPREAD: {opp['spread']:.4f}%")
-                        print(f"  VOLUME: {opp['volume']:.4f}")
-                        print("-"*40)
-                else:
-                    print(f"[{timestamp}] Aucune opportunité > {self.threshold}%", end='\r')
+                self._print_opportunities(self.check_arbitrage())
                 
-                time.sleep(interval)
+                deadline = self._next_deadline(deadline, interval)
+                time.sleep(max(0.0, deadline - time.monotonic()))
                 
             except KeyboardInterrupt:
                 print("\nArrêt du monitoring")
                 break
 
+    async def monitor_async(self, interval: int = 30):
+        """Boucle de surveillance async à cadence fixe"""
+        deadline = time.monotonic()
+        try:
+            while True:
+                self._print_opportunities(await self.check_arbitrage_async())
+                deadline = self._next_deadline(deadline, interval)
+                await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+        finally:
+            await self.close_async()
+
     def get_best_spread(self) -> Dict:
         """
         Obtient la meilleure opportunité d'arbitrage
@@ -123,6 +285,13 @@ class MultiExchangeArbitrage:
         @return: Résultat de l'exécution
         """
         try:
+            if opportunity.get('legs') and not self.staleness_policy.is_fresh(opportunity):
+                return {
+                    'success': False,
+                    'error': f"Opportunité expirée ({opportunity['oldest_leg_age_ms']:.0f} ms)",
+                    'timestamp': datetime.utcnow()
+                }
+
             exchange = self.exchanges[opportunity['exchange']]
             
             # Vérification des balances
@@ -0,0 +1,272 @@
+"""
+Recalcul incrémental des opportunités d'arbitrage (dirty set)
+@author: Patmoorea
+"""
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+import heapq
+import time
+
+from ..fee_calculator import FeeTable
+
+BookKey = Tuple[str, str]           # (exchange, symbole)
+PairKey = Tuple[str, str, str]      # (exchange achat, exchange vente, symbole)
+
+
+@dataclass
+class TopOfBook:
+    bid: float
+    bid_size: float
+    ask: float
+    ask_size: float
+    timestamp: float
+
+
+class IndexedMaxHeap:
+    """
+    Tas binaire max indexé par clé : insertion, mise à jour et suppression
+    d'une clé en O(log n), lecture des k meilleurs en O(k log k).
+    """
+
+    def __init__(self):
+        self._keys: List[Hashable] = []
+        self._priorities: List[float] = []
+        self._positions: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._positions
+
+    def _swap(self, i: int, j: int) -> None:
+        self._keys[i], self._keys[j] = self._keys[j], self._keys[i]
+        self._priorities[i], self._priorities[j] = self._priorities[j], self._priorities[i]
+        self._positions[self._keys[i]] = i
+        self._positions[self._keys[j]] = j
+
+    def _sift_up(self, i: int) -> None:
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._priorities[i] <= self._priorities[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int) -> None:
+        n = len(self._keys)
+        while True:
+            largest, left, right = i, 2 * i + 1, 2 * i + 2
+            if left < n and self._priorities[left] > self._priorities[largest]:
+                largest = left
+            if right < n and self._priorities[right] > self._priorities[largest]:
+                largest = right
+            if largest == i:
+                return
+            self._swap(i, largest)
+            i = largest
+
+    def push(self, key: Hashable, priority: float) -> None:
+        """Insère ou met à jour la priorité d'une clé"""
+        if key in self._positions:
+            i = self._positions[key]
+            old = self._priorities[i]
+            self._priorities[i] = priority
+            if priority > old:
+                self._sift_up(i)
+            else:
+                self._sift_down(i)
+            return
+        self._keys.append(key)
+        self._priorities.append(priority)
+        self._positions[key] = len(self._keys) - 1
+        self._sift_up(len(self._keys) - 1)
+
+    def remove(self, key: Hashable) -> None:
+        i = self._positions.pop(key, None)
+        if i is None:
+            return
+        last = len(self._keys) - 1
+        if i != last:
+            self._keys[i], self._priorities[i] = self._keys[last], self._priorities[last]
+            self._positions[self._keys[i]] = i
+        self._keys.pop()
+        self._priorities.pop()
+        if i < len(self._keys):
+            self._sift_up(i)
+            self._sift_down(i)
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """Les k clés de plus forte priorité, sans modifier le tas"""
+        k = len(self._keys) if k is None else min(k, len(self._keys))
+        result = []
+        frontier = [(-self._priorities[0], 0)] if self._keys else []
+        while frontier and len(result) < k:
+            neg_priority, i = heapq.heappop(frontier)
+            result.append((self._keys[i], -neg_priority))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._keys):
+                    heapq.heappush(frontier, (-self._priorities[child], child))
+        return result
+
+
+class IncrementalArbitrageEngine:
+    """
+    Moteur d'arbitrage cross-exchange incrémental.
+
+    Les meilleurs bid/ask sont poussés par (exchange, symbole) ; seules
+    les entrées dont le haut de book a changé sont marquées "dirty".
+    recompute() ne réévalue que les paires d'exchanges impliquant ces
+    entrées et tient les opportunités courantes dans un tas indexé.
+    Un haut de book inchangé n'est pas réévalué mais rafraîchit l'horodatage
+    des opportunités qui l'utilisent (cotation reconfirmée).
+
+    min_size écarte les paires dont la taille au meilleur niveau (côté
+    achat ou vente) est inférieure à la quantité à traiter.
+
+    Les clés sont génériques : "exchange" peut désigner n'importe quel lieu
+    de cotation et "symbole" n'importe quel instrument comparable.
+    """
+
+    def __init__(self, min_profit_ratio: float = 0.001, fee_table: Optional[FeeTable] = None,
+                 min_size: float = 0.0):
+        self.min_profit_ratio = min_profit_ratio
+        self.fee_table = fee_table
+        self.min_size = min_size
+        self.books: Dict[BookKey, TopOfBook] = {}
+        self.venues_by_symbol: Dict[str, Set[str]] = {}
+        self.dirty: Set[BookKey] = set()
+        self.opportunities: Dict[PairKey, Dict] = {}
+        self.ranking = IndexedMaxHeap()
+        self.stats = {'updates': 0, 'unchanged': 0, 'recomputes': 0, 'pairs_scored': 0}
+
+    def update(self, exchange: str, symbol: str,
+               bid: float, bid_size: float, ask: float, ask_size: float,
+               timestamp: Optional[float] = None) -> bool:
+        """Enregistre un haut de book ; retourne True s'il a changé"""
+        key = (exchange, symbol)
+        current = self.books.get(key)
+        self.stats['updates'] += 1
+        if current is not None and (current.bid, current.bid_size, current.ask, current.ask_size) == \
+                (bid, bid_size, ask, ask_size):
+            current.timestamp = timestamp if timestamp is not None else time.time()
+            self._refresh_timing(exchange, symbol)
+            self.stats['unchanged'] += 1
+            return False
+        self.books[key] = TopOfBook(bid, bid_size, ask, ask_size,
+                                    timestamp if timestamp is not None else time.time())
+        self.venues_by_symbol.setdefault(symbol, set()).add(exchange)
+        self.dirty.add(key)
+        return True
+
+    def update_book(self, exchange: str, symbol: str, book: Dict,
+                    timestamp: Optional[float] = None) -> bool:
+        """Variante acceptant un order book au format ccxt"""
+        if not book.get('bids') or not book.get('asks'):
+            return self.remove(exchange, symbol)
+        bid, bid_size = book['bids'][0][:2]
+        ask, ask_size = book['asks'][0][:2]
+        return self.update(exchange, symbol, float(bid), float(bid_size),
+                           float(ask), float(ask_size), timestamp)
+
+    def on_local_book(self, exchange: str, symbol: str, book) -> bool:
+        """Listener de DepthBookManager : lit le haut du carnet L2 local"""
+        bid, ask = book.best_bid(), book.best_ask()
+        if bid is None or ask is None:
+            return self.remove(exchange, symbol)
+        return self.update(exchange, symbol, bid[0], bid[1], ask[0], ask[1], book.received_at)
+
+    def set_min_size(self, min_size: float) -> None:
+        """Change la taille minimale et réévalue toutes les paires au prochain recompute"""
+        if min_size != self.min_size:
+            self.min_size = min_size
+            self.dirty.update(self.books)
+
+    def remove(self, exchange: str, symbol: str) -> bool:
+        """Retire une cotation (book vide, exchange indisponible)"""
+        if self.books.pop((exchange, symbol), None) is None:
+            return False
+        self.venues_by_symbol.get(symbol, set()).discard(exchange)
+        for other in self.venues_by_symbol.get(symbol, ()):
+            self._drop((exchange, other, symbol))
+            self._drop((other, exchange, symbol))
+        self.dirty.discard((exchange, symbol))
+        return True
+
+    def _drop(self, pair: PairKey) -> None:
+        if self.opportunities.pop(pair, None) is not None:
+            self.ranking.remove(pair)
+
+    def _timing(self, pair: PairKey) -> Dict:
+        buy_exchange, sell_exchange, symbol = pair
+        buy = self.books[(buy_exchange, symbol)]
+        sell = self.books[(sell_exchange, symbol)]
+        return {
+            'timestamp': min(buy.timestamp, sell.timestamp),
+            'legs': [
+                {'venue': buy_exchange, 'symbol': symbol,
+                 'received_at': buy.timestamp, 'exchange_timestamp': None},
+                {'venue': sell_exchange, 'symbol': symbol,
+                 'received_at': sell.timestamp, 'exchange_timestamp': None}
+            ]
+        }
+
+    def _refresh_timing(self, exchange: str, symbol: str) -> None:
+        """Reporte l'horodatage d'une cotation reconfirmée sur ses opportunités"""
+        for other in self.venues_by_symbol.get(symbol, ()):
+            for pair in ((exchange, other, symbol), (other, exchange, symbol)):
+                opportunity = self.opportunities.get(pair)
+                if opportunity is not None:
+                    opportunity.update(self._timing(pair))
+
+    def _fee(self, exchange: str, symbol: str) -> float:
+        return self.fee_table.rate(exchange, symbol) if self.fee_table else 0.0
+
+    def _score(self, pair: PairKey) -> None:
+        buy_exchange, sell_exchange, symbol = pair
+        buy = self.books[(buy_exchange, symbol)]
+        sell = self.books[(sell_exchange, symbol)]
+        self.stats['pairs_scored'] += 1
+
+        if buy.ask <= 0 or min(buy.ask_size, sell.bid_size) < self.min_size:
+            self._drop(pair)
+            return
+        effective_buy = buy.ask * (1 + self._fee(buy_exchange, symbol))
+        effective_sell = sell.bid * (1 - self._fee(sell_exchange, symbol))
+        profit_ratio = (effective_sell - effective_buy) / buy.ask
+
+        if profit_ratio <= self.min_profit_ratio:
+            self._drop(pair)
+            return
+        self.opportunities[pair] = {
+            'buy_exchange': buy_exchange,
+            'sell_exchange': sell_exchange,
+            'symbol': symbol,
+            'buy_price': buy.ask,
+            'sell_price': sell.bid,
+            'volume': min(buy.ask_size, sell.bid_size),
+            'profit_ratio': profit_ratio,
+            **self._timing(pair)
+        }
+        self.ranking.push(pair, profit_ratio)
+
+    def recompute(self) -> int:
+        """Réévalue les paires touchées par les entrées dirty, retourne leur nombre"""
+        if not self.dirty:
+            return 0
+        pairs: Set[PairKey] = set()
+        for exchange, symbol in self.dirty:
+            for other in self.venues_by_symbol.get(symbol, ()):
+                if other != exchange:
+                    pairs.add((exchange, other, symbol))
+                    pairs.add((other, exchange, symbol))
+        self.dirty.clear()
+        for pair in pairs:
+            self._score(pair)
+        self.stats['recomputes'] += 1
+        return len(pairs)
+
+    def best(self, k: Optional[int] = None) -> List[Dict]:
+        """Les k meilleures opportunités courantes (recalcule les entrées dirty)"""
+        self.recompute()
+        return [self.opportunities[pair] for pair, _ in self.ranking.top(k)]
@@ -1,12 +1,87 @@
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, Iterable, Optional, Sequence, Union
+import time
+import numpy as np
 from ....exchanges.base_exchange import BaseExchange
+from ....utils.cache import TTLCache
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+
+class FeeTable:
+    """
+    Table de frais précalculée par (exchange, symbole, tier).
+
+    Les taux maker/taker sont des fractions (0.001 = 0.1%), les frais de
+    retrait sont exprimés en unités de l'actif retiré. Le symbole '*'
+    sert de valeur par défaut pour tout un exchange ; un tier sans taux
+    connu retombe sur le tier 0 avant les taux par défaut. La table
+    expire après ttl secondes.
+    """
+
+    def __init__(self, ttl: float = 3600.0,
+                 default_maker: float = 0.001,
+                 default_taker: float = 0.001):
+        self.ttl = ttl
+        self.default_maker = default_maker
+        self.default_taker = default_taker
+        self.refreshed_at: Optional[float] = None
+        self._rates: Dict[tuple, tuple] = {}        # (exchange, symbol, tier) -> (maker, taker)
+        self._withdrawals: Dict[tuple, float] = {}  # (exchange, asset) -> frais
+
+    def set_fees(self, exchange: str, symbol: str, maker: float, taker: float, tier: int = 0) -> None:
+        self._rates[(exchange, symbol, tier)] = (float(maker), float(taker))
+
+    def set_withdrawal_fee(self, exchange: str, asset: str, fee: float) -> None:
+        self._withdrawals[(exchange, asset)] = float(fee)
+
+    def mark_refreshed(self) -> None:
+        self.refreshed_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.ttl
+
+    def _rate(self, exchange: str, symbol: str, tier: int) -> tuple:
+        for key_tier in ((tier, 0) if tier else (0,)):
+            rate = (self._rates.get((exchange, symbol, key_tier))
+                    or self._rates.get((exchange, '*', key_tier)))
+            if rate:
+                return rate
+        return self.default_maker, self.default_taker
+
+    def rate(self, exchange: str, symbol: str, tier: int = 0, side: str = 'taker') -> float:
+        """Taux maker ou taker d'un couple (exchange, symbole)"""
+        return self._rate(exchange, symbol, tier)[0 if side == 'maker' else 1]
+
+    def rates(self, exchanges: Iterable[str], symbols: Iterable[str],
+              tier: int = 0, side: str = 'taker') -> np.ndarray:
+        """Taux maker ou taker pour chaque couple (exchange, symbole)"""
+        column = 0 if side == 'maker' else 1
+        return np.fromiter(
+            (self._rate(exchange, symbol, tier)[column] for exchange, symbol in zip(exchanges, symbols)),
+            dtype=float
+        )
+
+    def withdrawal_fee(self, exchange: str, symbol: str) -> float:
+        """Frais de retrait de l'actif de base du symbole"""
+        return self._withdrawals.get((exchange, symbol.split('/')[0]), 0.0)
+
+    def withdrawal_fees(self, exchanges: Iterable[str], symbols: Iterable[str]) -> np.ndarray:
+        """Frais de retrait de l'actif de base de chaque symbole"""
+        return np.fromiter(
+            (self.withdrawal_fee(exchange, symbol) for exchange, symbol in zip(exchanges, symbols)),
+            dtype=float
+        )
+
 
 class FeeCalculator:
     """Calculateur de frais pour les opérations d'arbitrage"""
 
-    def __init__(self):
-        self.fee_cache = {}  # Cache des frais par exchange
+    def __init__(self, fee_table_ttl: float = 3600.0, fee_cache_size: int = 64):
+        # Exchanges dont les frais sont chargés dans la table (une seule
+        # requête par exchange en parallèle, rechargés après le TTL)
+        self.fee_cache = TTLCache(maxsize=fee_cache_size, ttl=fee_table_ttl)
+        self.fee_table = FeeTable(ttl=fee_table_ttl)
 
     async def calculate_total_fees(self, 
                                  buy_exchange: BaseExchange,
@@ -42,7 +117,7 @@ class FeeCalculator:
         sell_fees = await self._get_trading_fees(sell_exchange, symbol, amount, sell_price)
         
         # Estimation des frais de transfert
-        transfer_fees = await self._estimate_transfer_fees(buy_exchange, sell_exchange, symbol, amount)
+        transfer_fees = await self._estimate_transfer_fees(buy_exchange, sell_exchange, symbol, amount, sell_price)
         
         # Calcul des frais totaux
         total_fees = buy_fees + sell_fees + transfer_fees
@@ -68,11 +143,9 @@ class FeeCalculator:
                               symbol: str,
                               amount: Decimal,
                               price: Decimal) -> Decimal:
-        """Récupère les frais de trading pour un exchange"""
-        if exchange not in self.fee_cache:
-            self.fee_cache[exchange] = await self._fetch_trading_fees(exchange)
-            
-        fee_rate = self.fee_cache[exchange].get(symbol, Decimal('0.001'))  # 0.1% par défaut
+        """Frais taker d'un ordre, au taux de la FeeTable (même source que le calcul vectorisé)"""
+        await self._ensure_exchange_fees(exchange)
+        fee_rate = Decimal(str(self.fee_table.rate(self._exchange_key(exchange), symbol)))
         return amount * price * fee_rate
 
     async def _fetch_trading_fees(self, exchange: BaseExchange) -> Dict:
@@ -80,11 +153,102 @@ class FeeCalculator:
         # À implémenter pour chaque exchange
         return {}
 
+    async def _fetch_withdrawal_fees(self, exchange: BaseExchange) -> Dict:
+        """Récupère les frais de retrait par actif ({'BTC': 0.0002, ...})"""
+        # À implémenter pour chaque exchange
+        return {}
+
     async def _estimate_transfer_fees(self,
                                     from_exchange: BaseExchange,
                                     to_exchange: BaseExchange,
                                     symbol: str,
-                                    amount: Decimal) -> Decimal:
-        """Estime les frais de transfert entre exchanges"""
-        # À implémenter : estimation basée sur les frais de réseau
-        return Decimal('0')
+                                    amount: Decimal,
+                                    price: Decimal) -> Decimal:
+        """Retrait de l'actif acheté vers l'exchange de vente, valorisé au prix de vente"""
+        await self._ensure_exchange_fees(from_exchange)
+        fee = self.fee_table.withdrawal_fee(self._exchange_key(from_exchange), symbol)
+        return Decimal(str(fee)) * price
+
+    @staticmethod
+    def _exchange_key(exchange: Union[str, BaseExchange]) -> str:
+        return exchange if isinstance(exchange, str) else exchange.__class__.__name__
+
+    async def refresh_fee_table(self, exchanges: Iterable[BaseExchange]) -> FeeTable:
+        """
+        Recharge la table de frais depuis les exchanges.
+
+        _fetch_trading_fees peut retourner par symbole soit un taux unique,
+        soit un dict {'maker': ..., 'taker': ..., 'tier': ...} ;
+        _fetch_withdrawal_fees retourne les frais de retrait par actif.
+        """
+        for exchange in exchanges:
+            self.fee_cache.set(self._exchange_key(exchange), await self._load_exchange_fees(exchange))
+        self.fee_table.mark_refreshed()
+        return self.fee_table
+
+    async def _load_exchange_fees(self, exchange: BaseExchange) -> bool:
+        """Charge les frais de trading et de retrait d'un exchange dans la table"""
+        name = self._exchange_key(exchange)
+        for symbol, rate in (await self._fetch_trading_fees(exchange)).items():
+            if isinstance(rate, dict):
+                self.fee_table.set_fees(name, symbol,
+                                        rate.get('maker', rate.get('taker')),
+                                        rate.get('taker', rate.get('maker')),
+                                        rate.get('tier', 0))
+            else:
+                self.fee_table.set_fees(name, symbol, rate, rate)
+        for asset, fee in (await self._fetch_withdrawal_fees(exchange)).items():
+            self.fee_table.set_withdrawal_fee(name, asset, fee)
+        return True
+
+    async def _ensure_exchange_fees(self, exchange: BaseExchange) -> None:
+        """Charge les frais de l'exchange au premier usage puis après expiration du TTL"""
+        name = self._exchange_key(exchange)
+        await self.fee_cache.get_or_fetch(name, lambda: self._load_exchange_fees(exchange))
+
+    async def ensure_fee_table(self, exchanges: Iterable[BaseExchange]) -> FeeTable:
+        """Recharge la table seulement si son TTL est dépassé"""
+        if self.fee_table.is_stale():
+            await self.refresh_fee_table(exchanges)
+        return self.fee_table
+
+    def calculate_net_profits_batch(self,
+                                    buy_exchanges: Sequence[Union[str, BaseExchange]],
+                                    sell_exchanges: Sequence[Union[str, BaseExchange]],
+                                    symbols: Sequence[str],
+                                    amounts: ArrayLike,
+                                    buy_prices: ArrayLike,
+                                    sell_prices: ArrayLike,
+                                    tier: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Version vectorisée de calculate_total_fees pour N candidats.
+
+        Synchrone et sans appel réseau : les taux viennent de la FeeTable,
+        ce qui permet le filtrage après frais dans la boucle de scan.
+        amounts/buy_prices/sell_prices peuvent être des scalaires (diffusés).
+        Les ordres sont supposés exécutés en taker.
+        """
+        buy_names = [self._exchange_key(exchange) for exchange in buy_exchanges]
+        sell_names = [self._exchange_key(exchange) for exchange in sell_exchanges]
+        amounts = np.asarray(amounts, dtype=float)
+        buy_prices = np.asarray(buy_prices, dtype=float)
+        sell_prices = np.asarray(sell_prices, dtype=float)
+
+        buy_fees = amounts * buy_prices * self.fee_table.rates(buy_names, symbols, tier)
+        sell_fees = amounts * sell_prices * self.fee_table.rates(sell_names, symbols, tier)
+        # Retrait de l'actif acheté vers l'exchange de vente, valorisé au prix de vente
+        transfer_fees = self.fee_table.withdrawal_fees(buy_names, symbols) * sell_prices
+
+        total_fees = buy_fees + sell_fees + transfer_fees
+        gross_profit = (sell_prices - buy_prices) * amounts
+        net_profit = gross_profit - total_fees
+
+        return {
+            'buy_fees': buy_fees,
+            'sell_fees': sell_fees,
+            'transfer_fees': transfer_fees,
+            'total_fees': total_fees,
+            'gross_profit': gross_profit,
+            'net_profit': net_profit,
+            'is_profitable': net_profit > 0
+        }
@@ -0,0 +1,262 @@
+"""
+Univers de marchés cross-exchange et snapshot persistant
+@author: Patmoorea
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+import json
+import logging
+import os
+import threading
+import time
+
+SNAPSHOT_VERSION = 2  # v2 : suffixe :SETTLE conservé pour les dérivés
+
+
+@dataclass
+class MarketRules:
+    """Marché normalisé d'un exchange : identifiants et règles de précision/lot"""
+    exchange: str
+    symbol: str                 # Symbole unifié BASE/QUOTE (BASE/QUOTE:SETTLE pour les dérivés)
+    native_id: str              # Identifiant natif de l'exchange (BTCUSDT, BTC_USDT...)
+    base: str
+    quote: str
+    price_precision: Optional[float] = None
+    amount_precision: Optional[float] = None
+    min_amount: Optional[float] = None
+    min_cost: Optional[float] = None
+    active: bool = True
+
+    @classmethod
+    def from_ccxt(cls, exchange: str, market: Dict) -> 'MarketRules':
+        precision = market.get('precision') or {}
+        limits = market.get('limits') or {}
+        pair, _, settle = market['symbol'].partition(':')
+        base, _, quote = pair.partition('/')
+        base, quote = market.get('base') or base, market.get('quote') or quote
+        return cls(
+            exchange=exchange,
+            symbol=f"{base}/{quote}:{settle}" if settle else f"{base}/{quote}",
+            native_id=str(market.get('id') or market['symbol']),
+            base=base,
+            quote=quote,
+            price_precision=precision.get('price'),
+            amount_precision=precision.get('amount'),
+            min_amount=(limits.get('amount') or {}).get('min'),
+            min_cost=(limits.get('cost') or {}).get('min'),
+            active=bool(market.get('active'))
+        )
+
+
+class MarketUniverse:
+    """
+    Index des symboles de tous les exchanges.
+
+    Traduction unifié <-> natif en O(1) dans les deux sens (deux dicts
+    par exchange) et ensemble des paires cotées sur plusieurs exchanges.
+    """
+
+    def __init__(self, markets: Iterable[MarketRules] = (), built_at: Optional[float] = None):
+        self.built_at = built_at if built_at is not None else time.time()
+        self.markets: Dict[Tuple[str, str], MarketRules] = {}
+        self._native: Dict[Tuple[str, str], str] = {}
+        self._venues: Dict[str, Set[str]] = {}
+        for market in markets:
+            self.add(market)
+
+    def add(self, market: MarketRules) -> None:
+        self.markets[(market.exchange, market.symbol)] = market
+        self._native[(market.exchange, market.native_id)] = market.symbol
+        if market.active:
+            self._venues.setdefault(market.symbol, set()).add(market.exchange)
+
+    @property
+    def exchanges(self) -> List[str]:
+        return sorted({exchange for exchange, _ in self.markets})
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.built_at
+
+    def to_native(self, exchange: str, symbol: str) -> str:
+        """Symbole unifié -> identifiant natif (KeyError si non coté)"""
+        return self.markets[(exchange, symbol)].native_id
+
+    def to_unified(self, exchange: str, native_id: str) -> str:
+        """Identifiant natif -> symbole unifié (KeyError si inconnu)"""
+        return self._native[(exchange, native_id)]
+
+    def rules(self, exchange: str, symbol: str) -> Optional[MarketRules]:
+        return self.markets.get((exchange, symbol))
+
+    def symbols(self, exchange: str, quote: Optional[str] = None, active_only: bool = True) -> List[str]:
+        """Symboles unifiés d'un exchange, éventuellement filtrés par devise de cotation"""
+        return [
+            symbol for (ex, symbol), market in self.markets.items()
+            if ex == exchange and (quote is None or market.quote == quote)
+            and (market.active or not active_only)
+        ]
+
+    def venues(self, symbol: str) -> Set[str]:
+        """Exchanges où le symbole est actif"""
+        return set(self._venues.get(symbol, ()))
+
+    def common_pairs(self, min_venues: int = 2, quote: Optional[str] = None,
+                     exchanges: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """Paires actives sur au moins min_venues exchanges -> liste des exchanges"""
+        allowed = set(exchanges) if exchanges is not None else None
+        common = {}
+        for symbol, venues in self._venues.items():
+            if quote is not None and not symbol.endswith(f"/{quote}"):
+                continue
+            selected = venues if allowed is None else venues & allowed
+            if len(selected) >= min_venues:
+                common[symbol] = sorted(selected)
+        return dict(sorted(common.items()))
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': SNAPSHOT_VERSION,
+            'built_at': self.built_at,
+            'markets': [asdict(market) for market in self.markets.values()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MarketUniverse':
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Version de snapshot non supportée: {data.get('version')}")
+        return cls((MarketRules(**market) for market in data['markets']), data['built_at'])
+
+
+class UniverseBuilder:
+    """
+    Construit le MarketUniverse en chargeant les marchés de tous les
+    exchanges en parallèle (un thread par exchange), puis le persiste.
+
+    Au démarrage, load() relit le snapshot local (quelques ms) et, s'il
+    est plus vieux que max_age, lance le rafraîchissement en arrière-plan ;
+    l'univers courant est remplacé atomiquement une fois reconstruit.
+    """
+
+    def __init__(self,
+                 exchanges: Dict[str, Any],
+                 snapshot_path: Optional[Union[str, Path]] = None,
+                 max_age: float = 3600.0,
+                 spot_only: bool = True):
+        self.exchanges = exchanges
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.max_age = max_age
+        self.spot_only = spot_only
+        self.logger = logging.getLogger(__name__)
+        self.universe: Optional[MarketUniverse] = None
+        self.errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _load_exchange(self, name: str) -> List[MarketRules]:
+        markets = self.exchanges[name].load_markets()
+        return [
+            MarketRules.from_ccxt(name, market)
+            for market in markets.values()
+            if not self.spot_only or market.get('spot', market.get('type', 'spot') == 'spot')
+        ]
+
+    def build(self) -> MarketUniverse:
+        """Charge les marchés de tous les exchanges en parallèle et persiste le résultat"""
+        start = time.perf_counter()
+        names = list(self.exchanges)
+        errors = {}
+        markets: List[MarketRules] = []
+        with ThreadPoolExecutor(max_workers=max(1, len(names)),
+                                thread_name_prefix='markets') as executor:
+            futures = {name: executor.submit(self._load_exchange, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    markets.extend(future.result())
+                except Exception as e:
+                    errors[name] = str(e)
+                    self.logger.error(f"Échec load_markets {name}: {str(e)}")
+
+        universe = MarketUniverse(markets)
+        # Un exchange en échec garde ses marchés du snapshot précédent
+        previous = self.universe
+        if previous is not None:
+            for (exchange, _), market in previous.markets.items():
+                if exchange in errors:
+                    universe.add(market)
+
+        with self._lock:
+            self.universe = universe
+            self.errors = errors
+        self.save(universe)
+        self.logger.info(
+            f"Univers construit en {time.perf_counter() - start:.2f}s: "
+            f"{len(universe.markets)} marchés, {len(universe.common_pairs())} paires communes"
+        )
+        return universe
+
+    def save(self, universe: MarketUniverse) -> None:
+        """Écriture atomique du snapshot (fichier temporaire puis renommage)"""
+        if self.snapshot_path is None:
+            return
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.snapshot_path.with_suffix(self.snapshot_path.suffix + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(universe.to_dict(), f, separators=(',', ':'))
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            self.logger.warning(f"Snapshot des marchés non écrit: {str(e)}")
+
+    def load_snapshot(self) -> Optional[MarketUniverse]:
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return None
+        try:
+            with open(self.snapshot_path) as f:
+                return MarketUniverse.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Snapshot des marchés illisible, reconstruction: {str(e)}")
+            return None
+
+    def load(self, background_refresh: bool = True) -> MarketUniverse:
+        """
+        Univers disponible immédiatement : snapshot si présent (rafraîchi en
+        arrière-plan s'il est périmé), sinon construction synchrone.
+        """
+        universe = self.load_snapshot()
+        if universe is None:
+            return self.build()
+        with self._lock:
+            self.universe = universe
+        if universe.age() > self.max_age:
+            if background_refresh:
+                self.refresh_in_background()
+            else:
+                return self.build()
+        return universe
+
+    def refresh_in_background(self) -> threading.Thread:
+        """Reconstruit l'univers dans un thread démon (un seul à la fois)"""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return self._refresh_thread
+        self._refresh_thread = threading.Thread(target=self._safe_build, name='universe-refresh',
+                                                daemon=True)
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def _safe_build(self) -> None:
+        try:
+            self.build()
+        except Exception as e:
+            self.logger.error(f"Rafraîchissement de l'univers échoué: {str(e)}")
+
+    def get(self) -> MarketUniverse:
+        """Univers courant (chargé au premier appel), rafraîchi s'il est périmé"""
+        with self._lock:
+            universe = self.universe
+        if universe is None:
+            return self.load()
+        if universe.age() > self.max_age:
+            self.refresh_in_background()
+        return universe
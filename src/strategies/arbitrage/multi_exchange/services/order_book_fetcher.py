@@ -0,0 +1,135 @@
+"""
+Récupération concurrente des order books
+@author: Patmoorea
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import time
+
+
+@dataclass
+class BookFetchResult:
+    """Résultat d'une récupération d'order book pour (exchange, symbole)"""
+    exchange: str
+    symbol: str
+    book: Optional[Dict] = None
+    latency: float = 0.0        # Durée de la requête en secondes
+    received_at: float = 0.0    # Horodatage local (time.time()) de réception
+    status: str = 'ok'          # ok | error | timeout | dropped
+    error: Optional[str] = None
+    exchange_timestamp: Optional[float] = None  # Horodatage exchange du book (s), si fourni
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'ok' and self.book is not None
+
+    def staleness(self, now: Optional[float] = None) -> float:
+        """Âge du book en secondes (inf si aucun book reçu)"""
+        if not self.ok:
+            return float('inf')
+        reference = self.exchange_timestamp if self.exchange_timestamp is not None else self.received_at
+        return (now if now is not None else time.time()) - reference
+
+
+class OrderBookFetcher:
+    """
+    Fan-out réellement concurrent des requêtes d'order book.
+
+    - les clients async natifs (méthode coroutine) sont attendus directement ;
+    - les clients bloquants passent par un pool de threads borné ;
+    - chaque requête est limitée par exchange_timeout ;
+    - scan_deadline borne la durée totale d'un fetch_all : avec drop_late,
+      les exchanges en retard sont abandonnés au lieu d'être attendus.
+    """
+
+    def __init__(self,
+                 max_workers: int = 16,
+                 exchange_timeout: float = 2.0,
+                 scan_deadline: Optional[float] = None,
+                 drop_late: bool = True):
+        self.exchange_timeout = exchange_timeout
+        self.scan_deadline = scan_deadline
+        self.drop_late = drop_late
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='orderbook')
+
+    @staticmethod
+    def _resolve_method(exchange: Any):
+        """Méthode de récupération du book : API BaseExchange puis API ccxt"""
+        method = getattr(exchange, 'get_order_book', None)
+        if method is None:
+            method = getattr(exchange, 'fetch_order_book', None)
+        if method is None:
+            raise AttributeError(
+                f"{exchange.__class__.__name__} n'expose ni get_order_book ni fetch_order_book"
+            )
+        return method
+
+    async def _call(self, exchange: Any, symbol: str) -> Dict:
+        method = self._resolve_method(exchange)
+        if asyncio.iscoroutinefunction(method):
+            return await method(symbol)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, method, symbol)
+
+    async def fetch(self, exchange: Any, symbol: str) -> BookFetchResult:
+        """Récupère un order book avec timeout, sans jamais lever d'exception"""
+        name = exchange.__class__.__name__
+        start = time.perf_counter()
+        try:
+            book = await asyncio.wait_for(self._call(exchange, symbol), self.exchange_timeout)
+            exchange_ts = book.get('timestamp') if isinstance(book, dict) else None
+            return BookFetchResult(name, symbol, book,
+                                   latency=time.perf_counter() - start,
+                                   received_at=time.time(),
+                                   exchange_timestamp=exchange_ts / 1000 if exchange_ts else None)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Timeout order book {name} {symbol} ({self.exchange_timeout}s)")
+            return BookFetchResult(name, symbol, latency=time.perf_counter() - start,
+                                   status='timeout', error='timeout')
+        except Exception as e:
+            self.logger.error(f"Erreur get_order_book pour {name}: {str(e)}")
+            return BookFetchResult(name, symbol, latency=time.perf_counter() - start,
+                                   status='error', error=str(e))
+
+    async def fetch_all(self,
+                        requests: Sequence[Tuple[Any, str]],
+                        deadline: Optional[float] = None) -> List[BookFetchResult]:
+        """
+        Lance toutes les requêtes en parallèle et retourne les résultats
+        dans l'ordre des requêtes.
+
+        @param deadline: durée maximale du scan (défaut: scan_deadline)
+        """
+        deadline = self.scan_deadline if deadline is None else deadline
+        tasks = [asyncio.ensure_future(self.fetch(exchange, symbol))
+                 for exchange, symbol in requests]
+        if not tasks:
+            return []
+
+        start = time.perf_counter()
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+
+        if pending and not self.drop_late:
+            await asyncio.wait(pending)
+            pending = set()
+
+        results = []
+        for task, (exchange, symbol) in zip(tasks, requests):
+            if task in pending:
+                task.cancel()
+                results.append(BookFetchResult(
+                    exchange.__class__.__name__, symbol,
+                    latency=time.perf_counter() - start,
+                    status='dropped', error='scan deadline exceeded'
+                ))
+            else:
+                results.append(task.result())
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
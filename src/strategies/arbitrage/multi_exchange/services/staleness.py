@@ -0,0 +1,126 @@
+"""
+Suivi de fraîcheur des books et expiration des opportunités
+@author: Patmoorea
+"""
+from typing import Dict, List, Optional
+import time
+
+
+class LatencyTracker:
+    """
+    Estimation de la latence aller simple par exchange (moyenne exponentielle).
+
+    Quand le book porte un horodatage exchange, l'échantillon est
+    réception locale - horodatage exchange (décalage d'horloge inclus) ;
+    sinon on prend la moitié du temps de requête.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.estimates: Dict[str, float] = {}
+
+    def observe(self, venue: str, received_at: float,
+                exchange_timestamp: Optional[float] = None,
+                request_latency: Optional[float] = None) -> None:
+        if exchange_timestamp is not None:
+            sample = max(0.0, received_at - exchange_timestamp)
+        elif request_latency is not None:
+            sample = request_latency / 2
+        else:
+            return
+        previous = self.estimates.get(venue)
+        self.estimates[venue] = sample if previous is None else \
+            previous + self.alpha * (sample - previous)
+
+    def one_way(self, venue: str) -> float:
+        """Latence aller simple estimée en secondes (0 si inconnue)"""
+        return self.estimates.get(venue, 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {venue: latency * 1000 for venue, latency in self.estimates.items()}
+
+
+def make_leg(venue: str, symbol: str, book: Dict, received_at: Optional[float] = None) -> Dict:
+    """
+    Description horodatée d'une jambe d'opportunité.
+    book['timestamp'] (ms, format ccxt) est repris comme horodatage exchange.
+    """
+    exchange_ts = book.get('timestamp') if isinstance(book, dict) else None
+    return {
+        'venue': venue,
+        'symbol': symbol,
+        'received_at': received_at if received_at is not None else book.get('received_at', time.time()),
+        'exchange_timestamp': exchange_ts / 1000 if exchange_ts else None
+    }
+
+
+class StalenessPolicy:
+    """
+    Expire ou déclasse les opportunités dont la jambe la plus ancienne
+    dépasse le budget (secondes).
+
+    L'âge d'une jambe est mesuré depuis l'horodatage exchange s'il existe,
+    sinon depuis la réception locale augmentée de la latence estimée.
+    mode='expire' retire l'opportunité, mode='downrank' la conserve en
+    fin de liste avec un score de fraîcheur < 1.
+    """
+
+    def __init__(self, budget: float = 1.0, mode: str = 'expire',
+                 tracker: Optional[LatencyTracker] = None):
+        if mode not in ('expire', 'downrank'):
+            raise ValueError("mode doit valoir 'expire' ou 'downrank'")
+        self.budget = budget
+        self.mode = mode
+        self.tracker = tracker or LatencyTracker()
+        self.metrics = {'evaluated': 0, 'expired': 0, 'downranked': 0}
+        self.expired_by_venue: Dict[str, int] = {}
+
+    def leg_age(self, leg: Dict, now: Optional[float] = None) -> float:
+        now = now if now is not None else time.time()
+        if leg.get('exchange_timestamp') is not None:
+            return now - leg['exchange_timestamp']
+        return now - leg['received_at'] + self.tracker.one_way(leg['venue'])
+
+    def annotate(self, opportunity: Dict, now: Optional[float] = None) -> float:
+        """Ajoute l'âge de la jambe la plus ancienne (ms) et retourne cet âge en secondes"""
+        legs = opportunity.get('legs') or []
+        ages = [(self.leg_age(leg, now), leg['venue']) for leg in legs]
+        age, venue = max(ages) if ages else (0.0, None)
+        opportunity['oldest_leg_age_ms'] = age * 1000
+        opportunity['oldest_leg_venue'] = venue
+        return age
+
+    def is_fresh(self, opportunity: Dict, now: Optional[float] = None) -> bool:
+        return self.annotate(opportunity, now) <= self.budget
+
+    def apply(self, opportunities: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """Filtre (ou déclasse) une liste d'opportunités en conservant leur ordre relatif"""
+        now = now if now is not None else time.time()
+        kept = []
+        for opportunity in opportunities:
+            self.metrics['evaluated'] += 1
+            age = self.annotate(opportunity, now)
+            if age <= self.budget:
+                opportunity['freshness'] = 1.0
+                kept.append(opportunity)
+                continue
+            venue = opportunity['oldest_leg_venue']
+            self.expired_by_venue[venue] = self.expired_by_venue.get(venue, 0) + 1
+            if self.mode == 'expire':
+                self.metrics['expired'] += 1
+            else:
+                self.metrics['downranked'] += 1
+                opportunity['freshness'] = self.budget / age
+                kept.append(opportunity)
+        kept.sort(key=lambda opp: opp['freshness'] < 1.0)
+        return kept
+
+    def get_metrics(self) -> Dict:
+        evaluated = self.metrics['evaluated']
+        stale = self.metrics['expired'] + self.metrics['downranked']
+        return {
+            **self.metrics,
+            'expiry_rate': stale / evaluated if evaluated else 0.0,
+            'stale_by_venue': dict(self.expired_by_venue),
+            'one_way_latency_ms': self.tracker.snapshot()
+        }
@@ -0,0 +1,117 @@
+"""
+Profils de profondeur cumulée pour le dimensionnement VWAP
+@author: Patmoorea
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class DepthProfile:
+    """
+    Côté d'un order book (asks ou bids) pré-agrégé en tableaux cumulés.
+
+    cum_size[k] et cum_notional[k] contiennent la taille et le notionnel
+    des k premiers niveaux (cum_*[0] = 0). Une fois construits, le coût
+    d'exécution ou le VWAP pour n'importe quelle taille s'obtient par
+    recherche dichotomique en O(log profondeur), sans re-parcourir le book.
+    """
+
+    def __init__(self, levels: List, side: str):
+        if side not in ('asks', 'bids'):
+            raise ValueError("side doit valoir 'asks' ou 'bids'")
+        self.side = side
+        # Niveaux ccxt : [prix, quantité] ou [prix, quantité, nombre/horodatage]
+        data = np.asarray(levels, dtype=float)[:, :2] if len(levels) else np.zeros((0, 2))
+        self.prices = data[:, 0]
+        self.sizes = data[:, 1]
+        self.cum_size = np.concatenate(([0.0], np.cumsum(self.sizes)))
+        self.cum_notional = np.concatenate(([0.0], np.cumsum(self.prices * self.sizes)))
+
+    @classmethod
+    def from_book(cls, book: Dict, side: str) -> 'DepthProfile':
+        return cls(book.get(side) or [], side)
+
+    @property
+    def depth(self) -> float:
+        """Taille totale disponible sur ce côté du book"""
+        return float(self.cum_size[-1])
+
+    def _level_index(self, size: float) -> int:
+        """Indice (0-based) du niveau sur lequel s'exécute la size-ième unité"""
+        return int(np.searchsorted(self.cum_size, size, side='left')) - 1
+
+    def notional(self, size: float) -> float:
+        """Notionnel exécuté pour une taille donnée (inf si profondeur insuffisante)"""
+        if size <= 0:
+            return 0.0
+        if size > self.cum_size[-1]:
+            return float('inf')
+        i = self._level_index(size)
+        return float(self.cum_notional[i] + (size - self.cum_size[i]) * self.prices[i])
+
+    def vwap(self, size: float) -> float:
+        """Prix moyen pondéré d'exécution pour une taille donnée"""
+        if size <= 0:
+            return float(self.prices[0]) if self.prices.size else float('nan')
+        return self.notional(size) / size
+
+    def marginal_price(self, size: float) -> Optional[float]:
+        """Prix du niveau atteint juste après avoir consommé size (None si épuisé)"""
+        i = int(np.searchsorted(self.cum_size, size, side='right')) - 1
+        if i >= self.prices.size:
+            return None
+        return float(self.prices[i])
+
+
+def optimal_trade_size(buy: DepthProfile,
+                       sell: DepthProfile,
+                       buy_fee: float = 0.0,
+                       sell_fee: float = 0.0,
+                       max_size: Optional[float] = None) -> Dict:
+    """
+    Taille maximisant le profit d'un achat sur `buy` (asks) revendu sur `sell` (bids).
+
+    Le profit marginal (bid marginal net - ask marginal net) est une fonction
+    en escalier décroissante : la taille optimale est le dernier point où il
+    reste positif. On le trouve par dichotomie sur les niveaux d'asks, puis
+    par une seconde dichotomie sur les bids du dernier niveau rentable.
+    """
+    cap = min(buy.depth, sell.depth)
+    if max_size is not None:
+        cap = min(cap, max_size)
+
+    def profitable(level: int) -> bool:
+        start = buy.cum_size[level]
+        if start >= cap:
+            return False
+        bid = sell.marginal_price(start)
+        return bid is not None and bid * (1 - sell_fee) > buy.prices[level] * (1 + buy_fee)
+
+    # Nombre de niveaux d'asks rentables à leur premier lot
+    lo, hi = 0, buy.prices.size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if profitable(mid):
+            lo = mid + 1
+        else:
+            hi = mid
+
+    if lo == 0:
+        return {'size': 0.0, 'buy_vwap': None, 'sell_vwap': None,
+                'gross_profit': 0.0, 'net_profit': 0.0}
+
+    last_level = lo - 1
+    threshold = buy.prices[last_level] * (1 + buy_fee) / (1 - sell_fee)
+    # Bids triés par prix décroissant : nombre de niveaux strictement au-dessus du seuil
+    bid_levels = int(np.searchsorted(-sell.prices, -threshold, side='left'))
+    size = float(min(buy.cum_size[last_level + 1], sell.cum_size[bid_levels], cap))
+
+    cost = buy.notional(size)
+    proceeds = sell.notional(size)
+    return {
+        'size': size,
+        'buy_vwap': cost / size,
+        'sell_vwap': proceeds / size,
+        'gross_profit': proceeds - cost,
+        'net_profit': proceeds * (1 - sell_fee) - cost * (1 + buy_fee)
+    }
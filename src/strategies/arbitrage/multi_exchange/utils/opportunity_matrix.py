@@ -0,0 +1,108 @@
+"""
+Matrice d'opportunités cross-exchange vectorisée
+@author: Patmoorea
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class OpportunityMatrix:
+    """
+    Regroupe le meilleur bid/ask (et leurs tailles) de tous les exchanges
+    × symboles dans des tableaux NumPy de forme (E, S).
+
+    Le tenseur des ratios de profit (achat i, vente j, symbole s) est
+    calculé en une seule passe, sans boucle Python sur les paires.
+    """
+
+    def __init__(self, exchange_names: Sequence[str], symbols: Sequence[str]):
+        self.exchange_names = list(exchange_names)
+        self.symbols = list(symbols)
+        shape = (len(self.exchange_names), len(self.symbols))
+        # NaN = pas de cotation exploitable pour (exchange, symbole)
+        self.asks = np.full(shape, np.nan)
+        self.ask_sizes = np.zeros(shape)
+        self.bids = np.full(shape, np.nan)
+        self.bid_sizes = np.zeros(shape)
+
+    @classmethod
+    def from_order_books(cls,
+                         exchange_names: Sequence[str],
+                         symbols: Sequence[str],
+                         order_books: Dict[Tuple[int, int], Dict]) -> 'OpportunityMatrix':
+        """
+        Construit la matrice à partir des order books indexés par
+        (indice exchange, indice symbole). Les books absents ou vides
+        restent à NaN et ne produisent aucune opportunité.
+        """
+        matrix = cls(exchange_names, symbols)
+        for (i, s), book in order_books.items():
+            matrix.set_top_of_book(i, s, book)
+        return matrix
+
+    def set_top_of_book(self, i: int, s: int, book: Dict) -> None:
+        """Renseigne le meilleur niveau d'un order book"""
+        asks = book.get('asks')
+        bids = book.get('bids')
+        if asks:
+            self.asks[i, s] = float(asks[0][0])
+            self.ask_sizes[i, s] = float(asks[0][1])
+        if bids:
+            self.bids[i, s] = float(bids[0][0])
+            self.bid_sizes[i, s] = float(bids[0][1])
+
+    def profit_ratios(self, trade_amount: float) -> np.ndarray:
+        """
+        Tenseur (E_achat, E_vente, S) des ratios (bid_vente - ask_achat) / ask_achat.
+
+        Les combinaisons invalides (même exchange, cotation absente,
+        taille insuffisante au meilleur niveau) valent -inf.
+        """
+        asks = np.where(self.ask_sizes >= trade_amount, self.asks, np.nan)
+        bids = np.where(self.bid_sizes >= trade_amount, self.bids, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratios = (bids[np.newaxis, :, :] - asks[:, np.newaxis, :]) / asks[:, np.newaxis, :]
+        ratios[~np.isfinite(ratios)] = -np.inf
+        n = len(self.exchange_names)
+        ratios[np.arange(n), np.arange(n), :] = -np.inf
+        return ratios
+
+    def candidate_indices(self, min_ratio: float,
+                          trade_amount: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Tableaux d'indices (achat, vente, symbole) dont le ratio dépasse min_ratio"""
+        ratios = self.profit_ratios(trade_amount)
+        return np.unravel_index(np.flatnonzero(ratios > min_ratio), ratios.shape)
+
+    def top_opportunities(self,
+                          min_ratio: float,
+                          trade_amount: float,
+                          top_k: Optional[int] = None) -> List[Tuple[int, int, int]]:
+        """
+        Retourne les indices (achat, vente, symbole) dont le ratio dépasse
+        min_ratio, triés par profit brut décroissant.
+
+        Avec top_k, seule une sélection partielle (argpartition) est faite
+        au lieu d'un tri complet du tenseur.
+        """
+        if top_k is not None and top_k <= 0:
+            return []
+
+        buy_idx, sell_idx, sym_idx = self.candidate_indices(min_ratio, trade_amount)
+        if buy_idx.size == 0:
+            return []
+
+        profits = (self.bids[sell_idx, sym_idx] - self.asks[buy_idx, sym_idx]) * trade_amount
+        order = self.rank(profits, top_k)
+
+        return [
+            (int(buy_idx[k]), int(sell_idx[k]), int(sym_idx[k]))
+            for k in order
+        ]
+
+    @staticmethod
+    def rank(values: np.ndarray, top_k: Optional[int] = None) -> np.ndarray:
+        """Indices des top_k plus grandes valeurs, par ordre décroissant (stable)"""
+        if top_k is not None and top_k < values.size:
+            keep = np.argpartition(-values, top_k - 1)[:top_k]
+            return keep[np.argsort(-values[keep], kind='stable')]
+        return np.argsort(-values, kind='stable')
@@ -0,0 +1,117 @@
+"""
+Cache borné TTL + LRU avec coalescence des requêtes concurrentes (single-flight)
+@author: Patmoorea
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Au plus maxsize entrées ; au-delà, la moins récemment utilisée est
+    évincée. Chaque entrée expire après son TTL (ttl par défaut ou
+    précisé à l'écriture), vérifié à la lecture.
+
+    get_or_fetch(key, fetch) : sur un défaut de cache, un seul appel
+    fetch() est lancé par clé ; les appelants concurrents sur la même clé
+    attendent ce même appel. Une erreur est propagée à tous les appelants
+    en attente et n'est pas mise en cache. L'annulation d'un appelant
+    n'annule pas l'appel partagé.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize doit être > 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, Optional[float]]]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expirations': 0}
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self._entries[key]
+            self.stats['expirations'] += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.stats['misses'] += 1
+            return default
+        self.stats['hits'] += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (value, self.clock() + ttl if ttl is not None else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Variante synchrone de get_or_fetch (sans coalescence)"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                           ttl: Optional[float] = None) -> Any:
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.stats['hits'] += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending)
+
+        self.stats['misses'] += 1
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+
+        def done(finished: asyncio.Future) -> None:
+            self._inflight.pop(key, None)
+            if not finished.cancelled() and finished.exception() is None:
+                self.set(key, finished.result(), ttl)
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        return {
+            **self.stats,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'inflight': len(self._inflight),
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+        }
@@ -3,4 +3,7 @@ import sys
 import os
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# src/config.py masquerait le package config/ de la racine : celui-ci est
+# importé avant que src/ ne passe en tête du path (comme à l'exécution)
+import config  # noqa: E402,F401
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
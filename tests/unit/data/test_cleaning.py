@@ -0,0 +1,51 @@
+import json
+from src.data.cleaning import StreamingCleaner, infer_symbol_timeframe
+from src.data.market_store import MarketStore
+
+HEADER = 'timestamp,open,high,low,close,volume\n'
+ROWS = [
+    '2024-01-01 00:00:00,10,11,9,10.5,1',
+    '2024-01-01 01:00:00,10.5,12,10,11,2',
+    '2024-01-01 01:00:00,10.5,12,10,11,2',      # doublon
+    '2023-12-31 23:00:00,10,11,9,10,1',         # hors ordre : conservé
+    'pas une date,10,11,9,10,1',
+    '2024-01-01 02:00:00,10,9,11,10,1',         # low > high
+    '2024-01-01 03:00:00,10,11,9,null,1',
+    '2024-01-01 04:00:00,10,11,9,10,-1',
+    '2024-01-01 05:00:00,10,11,9,10.5,3',       # 02h-04h absentes
+]
+
+
+def test_streaming_cleaner_filters_across_chunks_and_reports(tmp_path):
+    source = tmp_path / 'btc_usdt_1h_raw.csv'
+    source.write_text(HEADER + '\n'.join(ROWS) + '\n')
+    store = MarketStore(tmp_path / 'store')
+
+    report = StreamingCleaner(store, chunksize=3).clean_file(source, report_path=tmp_path / 'report.json')
+
+    assert (report.symbol, report.timeframe) == ('BTCUSDT', '1h')
+    assert (report.rows_in, report.rows_out, report.chunks) == (9, 4, 3)
+    assert report.dropped == {'invalid_timestamp': 1, 'missing_values': 1, 'duplicates': 1,
+                              'ohlc_inconsistent': 1, 'negative_volume': 1}
+    assert report.reordered == 1
+    assert report.missing_candles == 3
+    assert json.loads((tmp_path / 'report.json').read_text())['rows_out'] == 4
+    assert store.read('BTCUSDT', '1h')['close'].tolist() == [10.0, 10.5, 11.0, 10.5]
+
+
+def test_newest_first_file_is_kept_in_full(tmp_path):
+    hours = [f"2024-01-01 {hour:02d}:00:00,10,20,9,{10 + hour},1" for hour in range(6)]
+    source = tmp_path / 'btc_usdt_1h.csv'
+    source.write_text(HEADER + '\n'.join(reversed(hours)) + '\n')
+    store = MarketStore(tmp_path / 'store')
+
+    report = StreamingCleaner(store, chunksize=4).clean_file(source)
+
+    assert report.rows_out == 6 and report.reordered == 5
+    assert sum(report.dropped.values()) == 0 and report.missing_candles == 0
+    assert store.read('BTCUSDT', '1h')['close'].tolist() == [10.0, 11.0, 12.0, 13.0, 14.0, 15.0]
+
+
+def test_infer_symbol_timeframe_from_legacy_names():
+    assert infer_symbol_timeframe('data/historical/btc_usdt_1h_ultraclean.csv') == ('BTCUSDT', '1h')
+    assert infer_symbol_timeframe('BTCUSDT_15m.csv') == ('BTCUSDT', '15m')
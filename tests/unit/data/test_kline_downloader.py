@@ -0,0 +1,126 @@
+import asyncio
+import time
+import pytest
+from src.data.historical.kline_downloader import (IncompleteDownloadError, KlineDownloader, KlineRequestError,
+                                                  RateLimitError, TokenBucket, interval_ms)
+
+HOUR = interval_ms('1h')
+
+
+def fake_exchange(calls, fail_once=()):
+    """Page /klines synthétique : une bougie par heure dans [start, end)"""
+    failed = set()
+
+    async def fetch_page(symbol, interval, start, end, limit):
+        calls.append((symbol, start))
+        if start in fail_once and start not in failed:
+            failed.add(start)
+            raise ConnectionError('timeout')
+        rows = [[t, '1', '2', '0.5', '1.5', '10', t + HOUR - 1, '15', 3, '4', '6', '0']
+                for t in range(start, end, HOUR)][:limit]
+        return rows, {'X-MBX-USED-WEIGHT-1M': '10'}
+
+    return fetch_page
+
+
+def make_downloader(tmp_path, sink, calls, **kwargs):
+    return KlineDownloader(sink, checkpoint_dir=tmp_path, limit=10, retries=3,
+                           bucket=TokenBucket(capacity=1000, period=1.0),
+                           fetch_page=fake_exchange(calls, **kwargs))
+
+
+def test_plan_splits_range_in_aligned_pages(tmp_path):
+    downloader = KlineDownloader(lambda *a: None, checkpoint_dir=tmp_path, limit=10)
+    chunks = downloader.plan('1h', 30 * 60_000, 25 * HOUR)
+
+    assert chunks == [(0, 10 * HOUR), (10 * HOUR, 20 * HOUR), (20 * HOUR, 25 * HOUR)]
+    # Même grille quel que soit start
+    assert downloader.plan('1h', 15 * HOUR, 25 * HOUR) == chunks[1:]
+
+
+def test_download_streams_chunks_to_sink_and_resumes(tmp_path):
+    written = []
+    calls = []
+    sink = lambda symbol, interval, frame: written.append((symbol, len(frame)))
+    downloader = make_downloader(tmp_path, sink, calls, fail_once={10 * HOUR})
+
+    stats = asyncio.run(downloader.download(['BTCUSDT', 'ETHUSDT'], '1h', 0, 25 * HOUR))
+
+    assert stats['chunks'] == 6 and stats['rows'] == 50 and stats['retries'] == 1
+    assert sorted(written) == [('BTCUSDT', 5), ('BTCUSDT', 10), ('BTCUSDT', 10),
+                               ('ETHUSDT', 5), ('ETHUSDT', 10), ('ETHUSDT', 10)]
+    # Le chunk tronqué par end n'est pas consigné
+    assert downloader.completed('BTCUSDT', '1h') == {0, 10 * HOUR}
+
+    # Nouvelle exécution avec un end plus lointain : seul le chunk tronqué est repris
+    calls.clear()
+    written.clear()
+    again = make_downloader(tmp_path, sink, calls)
+    stats = asyncio.run(again.download(['BTCUSDT', 'ETHUSDT'], '1h', 0, 30 * HOUR))
+
+    assert sorted(calls) == [('BTCUSDT', 20 * HOUR), ('ETHUSDT', 20 * HOUR)]
+    assert stats['skipped'] == 4
+    assert sorted(written) == [('BTCUSDT', 10), ('ETHUSDT', 10)]
+
+
+def test_rate_limit_waits_for_retry_after(tmp_path):
+    attempts = []
+
+    async def fetch_page(symbol, interval, start, end, limit):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RateLimitError('Rate limit (429)', retry_after=0.3)
+        return [], {}
+
+    downloader = KlineDownloader(lambda *a: None, checkpoint_dir=tmp_path, limit=10, retries=2,
+                                 bucket=TokenBucket(capacity=1000, period=1.0), fetch_page=fetch_page)
+    asyncio.run(downloader.download(['BTCUSDT'], '1h', 0, 10 * HOUR))
+
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.3
+
+
+def test_client_errors_fail_fast_without_retries(tmp_path):
+    calls = []
+
+    async def fetch_page(symbol, interval, start, end, limit):
+        calls.append(start)
+        raise KlineRequestError('Requête refusée (400): Invalid symbol.', 400)
+
+    downloader = KlineDownloader(lambda *a: None, checkpoint_dir=tmp_path, limit=10, retries=3,
+                                 bucket=TokenBucket(capacity=1000, period=1.0), fetch_page=fetch_page)
+
+    with pytest.raises(KlineRequestError):
+        asyncio.run(downloader.download(['BADUSDT'], '1h', 0, 10 * HOUR))
+    # Un seul essai malgré retries=3
+    assert calls == [0]
+
+
+def test_missing_chunks_raise_with_stats(tmp_path):
+    calls = []
+    downloader = make_downloader(tmp_path, lambda *a: None, calls)
+
+    async def flaky(symbol, interval, start, end, limit):
+        if start == 10 * HOUR:
+            raise ConnectionError('timeout')
+        return await fake_exchange(calls)(symbol, interval, start, end, limit)
+
+    downloader._fetch_page = flaky
+    downloader.retries = 1
+    with pytest.raises(IncompleteDownloadError) as excinfo:
+        asyncio.run(downloader.download(['BTCUSDT'], '1h', 0, 20 * HOUR))
+
+    assert excinfo.value.stats['failed'] == 1 and excinfo.value.stats['chunks'] == 1
+    assert downloader.completed('BTCUSDT', '1h') == {0}
+
+
+def test_first_chunk_starts_at_start_and_is_not_checkpointed(tmp_path):
+    written, calls = [], []
+    sink = lambda symbol, interval, frame: written.append(frame['timestamp'].iloc[0].value // 1_000_000)
+    downloader = make_downloader(tmp_path, sink, calls)
+
+    asyncio.run(downloader.download(['BTCUSDT'], '1h', 5 * HOUR, 20 * HOUR))
+
+    assert sorted(calls) == [('BTCUSDT', 5 * HOUR), ('BTCUSDT', 10 * HOUR)]
+    assert min(written) == 5 * HOUR
+    assert downloader.completed('BTCUSDT', '1h') == {10 * HOUR}
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.data.market_store import MarketStore
+
+HOUR = 3_600_000
+JAN = 1_704_067_200_000            # 2024-01-01 UTC
+
+
+def candles(start, n, close=1.0):
+    ts = start + np.arange(n, dtype=np.int64) * HOUR
+    return pd.DataFrame({'timestamp': pd.to_datetime(ts, unit='ms'), 'open': close, 'high': close,
+                         'low': close, 'close': close, 'volume': 1.0, 'count': 3, 'ignore': '0'})
+
+
+def test_write_partitions_by_month_and_reads_range_with_pruning(tmp_path):
+    store = MarketStore(tmp_path)
+    store.write('BTC/USDT', '1h', candles(JAN, 24 * 60))      # janvier + février
+
+    index = store.index('BTCUSDT', '1h')
+    assert list(index['partitions']) == ['2024-01', '2024-02']
+    assert 'ignore' not in index['columns'] and index['columns']['trades'] == 'int64'
+
+    arrays = store.read_arrays('BTCUSDT', '1h', '2024-02-01', '2024-02-02', columns=['close'])
+    assert list(arrays) == ['close'] and len(arrays['close']) == 24
+    assert isinstance(arrays['close'], np.memmap)             # partition unique : pas de copie
+
+    frame = store.read('BTCUSDT', '1h', JAN + 740 * HOUR, JAN + 748 * HOUR)
+    assert len(frame) == 8 and frame['timestamp'].is_monotonic_increasing
+    with pytest.raises(KeyError):
+        store.read('BTCUSDT', '1h', columns=['vwap'])
+
+
+def test_write_merges_deduplicates_and_keeps_missing_columns(tmp_path):
+    store = MarketStore(tmp_path)
+    store.write('BTCUSDT', '1h', candles(JAN, 10, close=1.0))
+    partial = candles(JAN + 5 * HOUR, 10, close=2.0).drop(columns=['count'])
+    store.write('BTCUSDT', '1h', partial)
+
+    frame = store.read('BTCUSDT', '1h')
+    assert len(frame) == 15
+    assert frame['close'].tolist() == [1.0] * 5 + [2.0] * 10
+    assert frame['trades'].iloc[:10].tolist() == [3] * 10 and frame['trades'].iloc[10:].isna().all()
+    assert store.catalog()['BTCUSDT']['1h']['rows'] == 15
+
+
+def test_implicit_coverage_skips_holes(tmp_path):
+    store = MarketStore(tmp_path)
+    frame = pd.concat([candles(JAN, 5), candles(JAN + 8 * HOUR, 2)])
+    store.write('BTCUSDT', '1h', frame)
+
+    assert store.coverage('BTCUSDT', '1h') == [(JAN, JAN + 5 * HOUR), (JAN + 8 * HOUR, JAN + 10 * HOUR)]
+    assert store.missing('BTCUSDT', '1h', JAN, JAN + 10 * HOUR) == [(JAN + 5 * HOUR, JAN + 8 * HOUR)]
+
+
+def test_rewrites_switch_versions_through_the_index(tmp_path):
+    store = MarketStore(tmp_path)
+    dataset = tmp_path / 'BTCUSDT' / '1h'
+    # Ancien nommage sans version, et reste d'une écriture interrompue
+    store.write('BTCUSDT', '1h', candles(JAN, 5, close=1.0))
+    (dataset / '2024-01.1').rename(dataset / '2024-01')
+    index = store.index('BTCUSDT', '1h')
+    del index['partitions']['2024-01']['version']
+    store._save_index('BTCUSDT', '1h', index)
+    (dataset / '2024-01.1').mkdir()
+    (dataset / '2024-01.1' / 'close.npy').write_bytes(b'partiel')
+
+    before = store.read_arrays('BTCUSDT', '1h', columns=['close'])['close']
+    store.write('BTCUSDT', '1h', candles(JAN + 5 * HOUR, 5, close=2.0))
+
+    assert store.index('BTCUSDT', '1h')['partitions']['2024-01']['version'] == 1
+    assert sorted(p.name for p in dataset.iterdir()) == ['2024-01.1', '_index.json']
+    assert store.read('BTCUSDT', '1h')['close'].tolist() == [1.0] * 5 + [2.0] * 5
+    # Un lecteur de l'ancienne version garde sa vue mappée
+    assert before.tolist() == [1.0] * 5
+
+    store.write('BTCUSDT', '1h', candles(JAN + 10 * HOUR, 1, close=3.0))
+    assert sorted(p.name for p in dataset.iterdir()) == ['2024-01.2', '_index.json']
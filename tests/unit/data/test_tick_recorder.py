@@ -0,0 +1,29 @@
+import time
+from src.data.tick_recorder import TickReader, TickRecorder
+
+
+def test_recorder_roundtrip_and_time_range_seek(tmp_path):
+    recorder = TickRecorder(tmp_path, batch_size=10, flush_interval=60, max_segment_bytes=200)
+    for i in range(50):
+        recorder.record('btcusdt@trade' if i % 2 else 'ethusdt@trade', f'{{"i":{i}}}', timestamp=i * 1000)
+    recorder.close()
+
+    reader = TickReader(tmp_path)
+    assert len(reader.segments()) > 1
+    assert [ts for ts, _, _ in reader.read()] == [i * 1000 for i in range(50)]
+
+    selected = list(reader.read(start=20_000, end=25_000, streams=['btcusdt@trade']))
+    assert [(ts, payload) for ts, _, payload in selected] == [(21_000, b'{"i":21}'), (23_000, b'{"i":23}')]
+    assert recorder.stats['records'] == 50 and recorder.stats['blocks'] == 5
+
+
+def test_idle_feed_is_flushed_by_the_writer_thread(tmp_path):
+    recorder = TickRecorder(tmp_path, batch_size=1000, flush_interval=0.05)
+    recorder.record('btcusdt@trade', b'{"i":1}', timestamp=1)
+
+    deadline = time.monotonic() + 2
+    while recorder.stats['records'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert recorder.stats['records'] == 1
+    recorder.close()
@@ -0,0 +1,45 @@
+import pytest
+from src.data_collection.candle_aggregator import CandleAggregator
+
+MINUTE = 60_000
+
+
+def test_trades_build_bars_with_vwap_and_taker_buy_volume():
+    closed = []
+    aggregator = CandleAggregator(['1m', '5m'], on_close=closed.append)
+
+    aggregator.add_trade('BTCUSDT', 100.0, 1.0, 1_000, buyer_is_maker=False)
+    aggregator.add_trade('BTCUSDT', 102.0, 3.0, 30_000, buyer_is_maker=True)
+    aggregator.add_trade('BTCUSDT', 101.0, 1.0, MINUTE + 1)      # Ferme la 1m
+
+    assert [(bar.timeframe, bar.open_time) for bar in closed] == [('1m', 0)]
+    bar = closed[0]
+    assert (bar.open, bar.high, bar.low, bar.close) == (100.0, 102.0, 100.0, 102.0)
+    assert bar.vwap == pytest.approx((100 + 306) / 4)
+    assert bar.taker_buy_volume == 1.0
+    assert aggregator.current('BTCUSDT', '5m').trades == 3
+
+    assert aggregator.advance(5 * MINUTE) == 2
+    assert sorted(bar.timeframe for bar in closed[1:]) == ['1m', '5m']
+
+
+def test_one_minute_klines_close_higher_bar_on_last_minute():
+    closed = []
+    aggregator = CandleAggregator(['15m'], on_close=closed.append)
+
+    for i in range(15):
+        aggregator.handle_message({'e': 'kline', 's': 'BTCUSDT', 'k': {
+            't': i * MINUTE, 'i': '1m', 'x': True, 'o': str(100 + i), 'h': str(101 + i),
+            'l': str(99 + i), 'c': str(100.5 + i), 'v': '2', 'q': str(2 * (100 + i)), 'V': '1', 'n': 3}})
+
+    assert len(closed) == 1
+    bar = closed[0]
+    assert (bar.open, bar.high, bar.low, bar.close) == (100.0, 115.0, 99.0, 114.5)
+    assert bar.volume == 30 and bar.taker_buy_volume == 15 and bar.trades == 45
+    assert bar.vwap == pytest.approx(107.0)
+
+
+def test_default_timeframes_come_from_the_config_package():
+    from config.constants import Constants
+
+    assert CandleAggregator().timeframes == list(Constants.TIMEFRAMES)
@@ -0,0 +1,34 @@
+import lz4.frame
+import numpy as np
+import pandas as pd
+from src.data_collection.storage.compression import MAGIC, CompressedStorage
+
+
+def sample():
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=4, freq='h', tz='Europe/Paris'),
+        'close': [1.5, 2.5, np.nan, 4.0],
+        'trades': np.arange(4, dtype=np.int64),
+        'side': ['buy', None, 'sell', 'vente'],
+        'filled': pd.array([1, None, 3, 4], dtype='Int64'),
+        'venue': pd.Categorical(['binance', 'okx', 'binance', 'okx'])
+    }, index=pd.Index([10, 20, 30, 40], name='id'))
+
+
+def test_binary_round_trip_preserves_dtypes_and_index(tmp_path):
+    path = tmp_path / 'frame.lz4'
+    frame = sample()
+
+    CompressedStorage().save(frame, path)
+    loaded = CompressedStorage().load(path)
+
+    assert path.read_bytes().startswith(MAGIC)
+    pd.testing.assert_frame_equal(loaded, frame)
+
+
+def test_legacy_json_files_stay_readable(tmp_path):
+    path = tmp_path / 'legacy.lz4'
+    frame = pd.DataFrame({'close': [1.5, 2.5], 'volume': [3.25, 4.75]})
+    path.write_bytes(lz4.frame.compress(frame.to_json().encode()))
+
+    pd.testing.assert_frame_equal(CompressedStorage().load(path), frame)
@@ -0,0 +1,54 @@
+import json
+from src.data_collection.decoders import FastDecoder
+
+
+def kline(symbol, close, closed=True):
+    return json.dumps({'e': 'kline', 'E': 1, 's': symbol, 'k': {
+        't': 0, 'T': 59_999, 'i': '1m', 'o': '1', 'h': '3', 'l': '0.5', 'c': close,
+        'v': '10', 'q': '20', 'n': 4, 'x': closed}})
+
+
+def test_full_batches_are_emitted_as_dataframes():
+    emitted = []
+    decoder = FastDecoder(batch_size=2, on_batch=lambda kind, frame: emitted.append((kind, frame)))
+
+    for close in ('1.5', '2.5', '3.5'):
+        assert decoder.decode(kline('BTCUSDT', close)) == 'kline'
+    frames = decoder.flush()
+
+    assert [kind for kind, _ in emitted] == ['kline', 'kline']
+    assert emitted[0][1]['close'].tolist() == [1.5, 2.5]
+    assert frames['kline']['symbol'].tolist() == ['BTCUSDT']
+
+
+def test_combined_envelope_depth_and_invalid_messages():
+    decoder = FastDecoder()
+    depth = {'stream': 'btcusdt@depth', 'data': {
+        'e': 'depthUpdate', 'E': 5, 's': 'BTCUSDT', 'U': 1, 'u': 2,
+        'b': [['100', '1']], 'a': [['101', '2'], ['102', '0']]}}
+
+    assert decoder.decode(json.dumps(depth)) == 'depth'
+    assert decoder.decode('not json') is None
+    rows = decoder.flush()['depth']
+
+    assert rows['side'].tolist() == [1, -1, -1]
+    assert rows['qty'].tolist() == [1.0, 2.0, 0.0]
+    stats = decoder.stats.snapshot()
+    assert stats['messages'] == 1 and stats['errors'] == 1
+    assert sum(stats['decode_us_histogram'].values()) == 1
+
+
+def test_malformed_messages_leave_no_partial_rows():
+    decoder = FastDecoder()
+    bad_kline = json.loads(kline('BTCUSDT', 'oops'))
+    bad_depth = {'e': 'depthUpdate', 'E': 5, 's': 'BTCUSDT', 'U': 1, 'u': 2,
+                 'b': [['100', '1']], 'a': [['101', 'bad']]}
+
+    assert decoder.decode(bad_kline) is None
+    assert decoder.decode(bad_depth) is None
+    assert decoder.decode(kline('BTCUSDT', '2.0')) == 'kline'
+
+    frames = decoder.flush()
+    assert frames['kline']['close'].tolist() == [2.0]
+    assert 'depth' not in frames
+    assert decoder.stats.errors == 2
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timezone
+from src.data.market_store import MarketStore
+from src.data_collection.market_data import MarketDataCollector
+
+HOUR = 3_600_000
+JAN = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeExchange:
+    """fetch_ohlcv façon ccxt : au plus limit bougies horaires à partir de since"""
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        self.calls.append(since)
+        return [[t, 1.0, 2.0, 0.5, 1.5, 10.0] for t in range(since, since + limit * HOUR, HOUR)]
+
+
+def at(hours):
+    return datetime.fromtimestamp((JAN.timestamp() * 1000 + hours * HOUR) / 1000, tz=timezone.utc)
+
+
+def test_historical_data_only_fetches_missing_ranges(tmp_path):
+    exchange = FakeExchange()
+    collector = MarketDataCollector(exchange, store=MarketStore(tmp_path), page_limit=10)
+
+    first = asyncio.run(collector.get_historical_data('BTC/USDT', '1h', at(0), at(25)))
+    assert len(first) == 25 and len(exchange.calls) == 3
+
+    exchange.calls.clear()
+    again = asyncio.run(collector.get_historical_data('BTC/USDT', '1h', at(5), at(20)))
+    assert exchange.calls == [] and len(again) == 15
+
+    # Fenêtre chevauchante : seule la plage [25h, 40h) est demandée
+    wider = asyncio.run(collector.get_historical_data('BTC/USDT', '1h', at(10), at(40)))
+    assert exchange.calls == [int(at(25).timestamp() * 1000), int(at(35).timestamp() * 1000)]
+    assert len(wider) == 30 and wider.index.is_unique and wider.index.is_monotonic_increasing
+
+
+class CappedExchange(FakeExchange):
+    """Pages plafonnées à 4 bougies quel que soit limit, données jusqu'à available_until"""
+
+    def __init__(self, available_until):
+        super().__init__()
+        self.available_until = available_until
+
+    def fetch_ohlcv(self, symbol, timeframe, since, limit):
+        return [row for row in super().fetch_ohlcv(symbol, timeframe, since, 4)
+                if row[0] < self.available_until]
+
+
+def test_short_pages_keep_paging_and_coverage_stops_at_last_candle(tmp_path):
+    last_available = int(at(18).timestamp() * 1000)
+    exchange = CappedExchange(available_until=last_available)
+    store = MarketStore(tmp_path)
+    collector = MarketDataCollector(exchange, store=store, page_limit=10)
+
+    frame = asyncio.run(collector.get_historical_data('BTC/USDT', '1h', at(0), at(25)))
+
+    assert len(frame) == 18
+    # Rien reçu après 18h : la plage [18h, 25h) reste à récupérer
+    assert store.missing('BTC/USDT', '1h', at(0), at(25)) == [(last_available, int(at(25).timestamp() * 1000))]
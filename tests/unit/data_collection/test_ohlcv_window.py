@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+from src.data_collection.ohlcv_window import EMA, RSI, OHLCVWindow
+
+
+def test_window_wraps_and_returns_ordered_views():
+    window = OHLCVWindow(capacity=3)
+    for i in range(5):
+        window.update(i, i, i, i, float(i), 1.0)
+    assert window.update(4, 4, 5, 3, 4.5, 2.0) is False     # Bougie en cours modifiée
+
+    closes = window.view('close')
+    assert closes.tolist() == [2.0, 3.0, 4.5]
+    assert window.view('timestamp').tolist() == [2, 3, 4]
+    assert closes.base is not None
+    assert window.to_frame()['volume'].tolist() == [1.0, 1.0, 2.0]
+
+
+def test_incremental_indicators_match_batch_computation():
+    closes = [10, 11, 10.5, 12, 11, 13, 12.5, 14]
+    window = OHLCVWindow(capacity=5)
+    rsi = window.add_indicator('rsi', RSI(3))
+    ema = window.add_indicator('ema', EMA(3))
+    for i, close in enumerate(closes):
+        window.update(i, close, close, close, close + 1, 1.0)
+        window.update(i, close, close, close, close, 1.0)
+
+    series = pd.Series(closes)
+    delta = series.diff().dropna()
+    gains, losses = delta.clip(lower=0), (-delta).clip(lower=0)
+    avg_gain, avg_loss = gains[:3].mean(), losses[:3].mean()
+    for gain, loss in zip(gains[3:], losses[3:]):
+        avg_gain, avg_loss = (avg_gain * 2 + gain) / 3, (avg_loss * 2 + loss) / 3
+
+    assert rsi.value == pytest.approx(100 - 100 / (1 + avg_gain / avg_loss))
+    assert ema.value == pytest.approx(series.ewm(span=3, adjust=False).mean().iloc[-1])
+
+
+def test_indicator_is_not_ready_during_warm_up():
+    window = OHLCVWindow(capacity=10)
+    rsi = window.add_indicator('rsi', RSI(3))
+    readiness = []
+    for i, close in enumerate([10, 11, 10.5, 12, 11]):
+        window.update(i, close, close, close, close, 1.0)
+        readiness.append(rsi.ready)
+
+    assert readiness == [False, False, False, True, True]
@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+import zlib
+from src.data_collection.depth_stream import DepthBookManager
+from src.data_collection.order_book import BookGapError, LocalOrderBook, okx_checksum
+
+
+def test_book_side_keeps_levels_sorted_with_best_first():
+    book = LocalOrderBook('binance', 'BTC/USDT')
+    book.apply_snapshot([['100', '1'], ['99', '2']], [['101', '1'], ['102', '3']], update_id=10)
+
+    book.apply_diff(11, 12, bids=[['100.5', '4'], ['99', '0']], asks=[['101', '0'], ['103', '1']])
+
+    prices, sizes = book.bids.top(2)
+    assert prices.tolist() == [100.5, 100.0]
+    assert sizes.tolist() == [4.0, 1.0]
+    assert book.asks.top()[0].tolist() == [102.0, 103.0]
+    assert prices.base is not None        # Vue sur le tableau interne, sans copie
+    assert book.to_ccxt(1)['asks'] == [[102.0, 3.0]]
+
+
+def test_sequence_gap_and_stale_diffs():
+    book = LocalOrderBook('binance', 'BTC/USDT')
+    book.apply_snapshot([['100', '1']], [['101', '1']], update_id=10)
+
+    assert book.apply_diff(5, 9, [['100', '5']], []) is False
+    assert book.best_bid() == (100.0, 1.0)
+    with pytest.raises(BookGapError):
+        book.apply_diff(15, 16, [], [])
+    assert not book.synced
+
+
+def test_okx_checksum_validates_diffs():
+    book = LocalOrderBook('okx', 'BTC/USDT', checksum_fn=okx_checksum)
+    book.apply_snapshot([['100', '1']], [['101', '1']], update_id=1)
+    expected = zlib.crc32(b'100.5:2:101:1:100:1')
+    expected = expected - (1 << 32) if expected >= (1 << 31) else expected
+
+    assert book.apply_diff(2, 2, [['100.5', '2']], [], prev_update_id=1, checksum=expected)
+    with pytest.raises(BookGapError):
+        book.apply_diff(3, 3, [['99', '1']], [], prev_update_id=2, checksum=expected)
+    assert book.stats['checksum_errors'] == 1
+
+
+@pytest.mark.asyncio
+async def test_binance_manager_resyncs_from_snapshot_on_gap():
+    snapshots = iter([
+        {'bids': [[100, 1]], 'asks': [[101, 1]], 'nonce': 10, 'timestamp': None},
+        {'bids': [[99, 1]], 'asks': [[100.5, 1]], 'nonce': 30, 'timestamp': None},
+    ])
+    manager = DepthBookManager('binance', ['BTC/USDT'], snapshot_fetcher=lambda symbol: next(snapshots))
+    updates = []
+    manager.add_listener(lambda exchange, symbol, book: updates.append(book.last_update_id))
+    await manager.resync('BTC/USDT')
+
+    def diff(first, final, bid):
+        return {'e': 'depthUpdate', 'E': 1_700_000_000_000, 's': 'BTCUSDT',
+                'U': first, 'u': final, 'b': [[bid, '2']], 'a': []}
+
+    await manager.handle_message(diff(9, 11, '100.2'))
+    await manager.handle_message(diff(20, 21, '100.3'))     # Trou : resync
+    await manager.wait_resyncs()
+    await manager.handle_message(diff(31, 31, '99.5'))
+
+    assert updates == [11, 31]
+    assert manager.get_order_book('BTC/USDT')['bids'][0] == [99.5, 2.0]
+    assert manager.get_stats()['BTC/USDT']['gaps'] == 1
+
+
+def test_okx_sequence_reset_triggers_resync():
+    book = LocalOrderBook('okx', 'BTC/USDT')
+    book.apply_snapshot([['100', '1']], [['101', '1']], update_id=500)
+
+    with pytest.raises(BookGapError):
+        book.apply_diff(3, 3, [['100', '2']], [], prev_update_id=2)
+    assert not book.synced
+    assert book.stats['gaps'] == 1
+
+
+@pytest.mark.asyncio
+async def test_diffs_received_during_resync_are_replayed():
+    release = asyncio.Event()
+    snapshots = iter([
+        {'bids': [[100, 1]], 'asks': [[101, 1]], 'nonce': 10, 'timestamp': None},
+        {'bids': [[99, 1]], 'asks': [[100.5, 1]], 'nonce': 30, 'timestamp': None},
+    ])
+
+    async def fetch(symbol):
+        snapshot = next(snapshots)
+        if snapshot['nonce'] == 30:
+            await release.wait()
+        return snapshot
+
+    manager = DepthBookManager('binance', ['BTC/USDT'], snapshot_fetcher=fetch)
+    await manager.resync('BTC/USDT')
+
+    def diff(first, final, bid):
+        return {'e': 'depthUpdate', 'E': 1_700_000_000_000, 's': 'BTCUSDT',
+                'U': first, 'u': final, 'b': [[bid, '2']], 'a': []}
+
+    await manager.handle_message(diff(20, 21, '100.3'))     # Trou : resync en tâche de fond
+    # La lecture n'est pas bloquée par le snapshot REST
+    await manager.handle_message(diff(25, 29, '98'))
+    await manager.handle_message(diff(30, 32, '99.5'))
+    release.set()
+    await manager.wait_resyncs()
+
+    book = manager.books['BTC/USDT']
+    assert book.last_update_id == 32
+    assert book.best_bid() == (99.5, 2.0)
+
+
+@pytest.mark.asyncio
+async def test_failed_snapshot_is_retried_until_the_book_resyncs():
+    snapshots = iter([
+        {'bids': [[100, 1]], 'asks': [[101, 1]], 'nonce': 10, 'timestamp': None},
+        ConnectionError('503'),
+        {'bids': [[99, 1]], 'asks': [[100.5, 1]], 'nonce': 30, 'timestamp': None},
+    ])
+
+    def fetch(symbol):
+        snapshot = next(snapshots)
+        if isinstance(snapshot, Exception):
+            raise snapshot
+        return snapshot
+
+    manager = DepthBookManager('binance', ['BTC/USDT'], snapshot_fetcher=fetch,
+                               resync_base_delay=0.001)
+    await manager.resync('BTC/USDT')
+
+    def diff(first, final, bid):
+        return {'e': 'depthUpdate', 'E': 1_700_000_000_000, 's': 'BTCUSDT',
+                'U': first, 'u': final, 'b': [[bid, '2']], 'a': []}
+
+    await manager.handle_message(diff(20, 21, '100.3'))     # Trou : premier snapshot en échec
+    await manager.wait_resyncs()
+    await manager.handle_message(diff(31, 31, '99.5'))
+
+    book = manager.books['BTC/USDT']
+    assert book.synced and book.last_update_id == 31
+    assert book.best_bid() == (99.5, 2.0)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import pytest
+from src.data_collection import ws_optimized
+from src.data_collection.ws_optimized import MultiplexedWSClient, StreamQueue
+
+
+def test_streams_are_sharded_into_combined_urls():
+    client = MultiplexedWSClient(base_url='wss://example.com', streams_per_connection=2)
+    client.subscribe(['a@trade', 'b@trade', 'c@trade'])
+
+    assert client.shards == [['a@trade', 'b@trade'], ['c@trade']]
+    assert client.shard_url(0) == 'wss://example.com/stream?streams=a@trade/b@trade'
+
+
+@pytest.mark.asyncio
+async def test_dispatch_routes_and_drops_oldest_when_full():
+    client = MultiplexedWSClient(queue_size=2, overflow='drop_oldest')
+    client.subscribe(['btcusdt@trade'])
+
+    for i in range(3):
+        await client.dispatch(json.dumps({'stream': 'btcusdt@trade', 'data': {'i': i}}))
+    await client.dispatch(json.dumps({'result': None, 'id': 1}))
+
+    assert [(await client.get('btcusdt@trade'))['i'] for _ in range(2)] == [1, 2]
+    assert client.get_stats()['streams']['btcusdt@trade'] == {'received': 3, 'dropped': 1, 'queued': 0}
+
+
+@pytest.mark.asyncio
+async def test_drop_newest_policy_keeps_queued_messages():
+    queue = StreamQueue(maxsize=1, overflow='drop_newest')
+    await queue.put('first')
+    await queue.put('second')
+
+    assert await queue.get() == 'first'
+    assert queue.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_subscribe_during_connect_is_sent_once_connected(monkeypatch):
+    connecting = asyncio.Event()
+    release = asyncio.Event()
+    urls, sent = [], []
+
+    class FakeWS:
+        async def send(self, message):
+            sent.append(json.loads(message)['params'])
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            await asyncio.sleep(3600)
+
+    class FakeConnect:
+        def __init__(self, url, **kwargs):
+            urls.append(url)
+
+        async def __aenter__(self):
+            connecting.set()
+            await release.wait()
+            return FakeWS()
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(ws_optimized.websockets, 'connect', FakeConnect)
+    client = MultiplexedWSClient(base_url='wss://example.com')
+    client.subscribe(['a@trade'])
+    runner = asyncio.ensure_future(client.run())
+
+    await connecting.wait()
+    client.subscribe(['b@trade'])       # Shard en cours de connexion
+    release.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+    assert urls == ['wss://example.com/stream?streams=a@trade']
+    assert sent == [['b@trade']]
+    client.stop()
+    runner.cancel()
+    await asyncio.gather(runner, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_recorder_captures_raw_message_before_decoding():
+    recorded = []
+
+    class Recorder:
+        def record(self, stream, raw):
+            recorded.append((stream, raw))
+
+    def failing_decode(raw):
+        raise ValueError('décodage impossible')
+
+    client = MultiplexedWSClient(decode=failing_decode, recorder=Recorder())
+    client.subscribe(['btcusdt@trade'])
+    raw = json.dumps({'stream': 'btcusdt@trade', 'data': {'p': '1'}}, separators=(',', ':'))
+
+    with pytest.raises(ValueError):
+        await client.dispatch(raw)
+    assert recorded == [('btcusdt@trade', raw)]
+
+
+@pytest.mark.asyncio
+async def test_live_subscriptions_are_batched_and_rate_limited(monkeypatch):
+    sent = []
+    clock = [0.0]
+
+    class FakeWS:
+        async def send(self, message):
+            sent.append((clock[0], json.loads(message)['params']))
+
+    async def fake_sleep(delay):
+        clock[0] += delay
+
+    monkeypatch.setattr(ws_optimized.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(ws_optimized.asyncio, 'sleep', fake_sleep)
+    client = MultiplexedWSClient(streams_per_connection=10, params_per_message=3, control_rate=5.0)
+    client.subscribe(['a@trade'])
+    client.connections[0] = FakeWS()
+
+    # Un seul groupe de flux pour le shard, découpé en messages de 3 flux
+    client.subscribe([f"s{i}@trade" for i in range(7)])
+    await asyncio.gather(*[task for task in asyncio.all_tasks() if task is not asyncio.current_task()])
+
+    assert [params for _, params in sent] == [['s0@trade', 's1@trade', 's2@trade'],
+                                              ['s3@trade', 's4@trade', 's5@trade'],
+                                              ['s6@trade']]
+    times = [at for at, _ in sent]
+    assert all(b - a >= 0.2 - 1e-9 for a, b in zip(times, times[1:]))
+
+
+@pytest.mark.asyncio
+async def test_stream_iterator_ends_after_stop():
+    client = MultiplexedWSClient()
+    client.subscribe(['btcusdt@trade'])
+    received = []
+
+    async def consume():
+        async for message in client.stream('btcusdt@trade'):
+            received.append(message)
+
+    consumer = asyncio.ensure_future(consume())
+    await client.dispatch(json.dumps({'stream': 'btcusdt@trade', 'data': {'i': 1}}))
+    await asyncio.sleep(0)
+    client.stop()
+
+    await asyncio.wait_for(consumer, timeout=1)
+    assert received == [{'i': 1}]
@@ -0,0 +1,67 @@
+import math
+import pytest
+from modules.triangular import CurrencyGraph, TriangularArbitrage
+
+MARKETS = {
+    'BTC/USDT': {'base': 'BTC', 'quote': 'USDT'},
+    'ETH/USDT': {'base': 'ETH', 'quote': 'USDT'},
+    'ETH/BTC': {'base': 'ETH', 'quote': 'BTC'},
+}
+# Prix cohérents : ETH/BTC = ETH/USDT / BTC/USDT
+FAIR = {'BTC/USDT': {'bid': 50_000.0, 'ask': 50_000.0},
+        'ETH/USDT': {'bid': 2_500.0, 'ask': 2_500.0},
+        'ETH/BTC': {'bid': 0.05, 'ask': 0.05}}
+
+
+def engine(min_profit=0.5, fee=0.0):
+    arbitrage = TriangularArbitrage({'min_profit': min_profit, 'fee': fee})
+    arbitrage.load_markets('binance', MARKETS)
+    return arbitrage
+
+
+def test_fair_prices_have_no_cycle():
+    arbitrage = engine(fee=0.001)
+
+    assert arbitrage.update_tickers('binance', FAIR) == []
+    assert arbitrage.find_negative_cycles('binance') == []
+    assert arbitrage.graphs['binance'].find_negative_cycle() is None
+
+
+def test_incremental_update_only_reevaluates_touched_cycles():
+    arbitrage = engine()
+    assert len(arbitrage.edge_cycles['binance'][('ETH', 'BTC')]) == 1    # un seul sens passe par l'arête
+    arbitrage.update_tickers('binance', FAIR)
+
+    # ETH/BTC sous-évalué de 2% : USDT -> BTC -> ETH -> USDT rentable
+    found = arbitrage.update_ticker('binance', 'ETH/BTC', 0.049, 0.049)
+    assert len(found) == 1
+    assert found[0]['profit'] == pytest.approx((0.05 / 0.049 - 1) * 100)
+    assert set(found[0]['symbols']) == set(MARKETS)
+
+    # Un marché inconnu ne touche aucun cycle, l'opportunité reste en cache
+    assert arbitrage.update_ticker('binance', 'XRP/USDT', 1.0, 1.0) == []
+    assert len(arbitrage.opportunities['binance']) == 1
+
+    # Retour au prix juste : l'opportunité disparaît
+    assert arbitrage.update_ticker('binance', 'ETH/BTC', 0.05, 0.05) == []
+    assert arbitrage.opportunities['binance'] == {}
+
+
+def test_find_negative_cycles_on_profitable_triangle():
+    arbitrage = engine(fee=0.001)
+    arbitrage.update_tickers('binance', {**FAIR, 'ETH/BTC': {'bid': 0.049, 'ask': 0.049}})
+
+    [opportunity] = arbitrage.find_negative_cycles('binance')
+
+    expected = (0.05 / 0.049 * 0.999 ** 3 - 1) * 100
+    assert math.isclose(opportunity['profit'], expected, rel_tol=1e-9)
+    assert opportunity['path'][0] == opportunity['path'][-1] and len(opportunity['path']) == 4
+
+
+def test_currency_graph_edge_weights():
+    graph = CurrencyGraph(fee=0.0)
+    graph.add_market('ETH/BTC', 'ETH', 'BTC')
+    graph.update_rate('ETH/BTC', 0.05, 0.0)
+
+    assert math.isclose(graph.weight(('ETH', 'BTC')), -math.log(0.05))
+    assert graph.weight(('BTC', 'ETH')) == math.inf        # pas d'ask : arête inactive
@@ -0,0 +1,97 @@
+import math
+import time
+import numpy as np
+import pytest
+from src.strategies.arbitrage.analytics.advanced_analytics import ArbitrageAnalytics, SpreadRingBuffer
+
+
+def test_window_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0.5, 0.1, 500)
+    buffer = SpreadRingBuffer(capacity=1000, window=1e9)
+    for i, value in enumerate(values):
+        buffer.append(value, timestamp=float(i))
+
+    stats = buffer.stats()
+    assert stats['count'] == 500
+    assert stats['mean'] == pytest.approx(values.mean())
+    assert stats['std'] == pytest.approx(values.std())
+    assert stats['min'] == values.min()
+    assert stats['max'] == values.max()
+    # Percentiles approchés par l'histogramme logarithmique (~1 % relatif)
+    assert stats['p95'] == pytest.approx(np.quantile(values, 0.95), rel=0.02)
+
+
+def test_percentiles_follow_the_time_window():
+    buffer = SpreadRingBuffer(capacity=1000, window=50.0)
+    for i in range(100):
+        buffer.append(10.0, timestamp=float(i))        # anciens spreads élevés
+    for i in range(100, 200):
+        buffer.append(1.0, timestamp=float(i))
+
+    stats = buffer.stats()
+    # Les spreads à 10 sont sortis de la fenêtre : percentiles et max cohérents
+    assert stats['max'] == 1.0
+    assert stats['p50'] == stats['p99'] == 1.0
+
+
+def test_ring_buffer_evicts_beyond_capacity():
+    buffer = SpreadRingBuffer(capacity=10, window=1e9)
+    for i in range(25):
+        buffer.append(float(i), timestamp=float(i))
+
+    timestamps, values = buffer.view()
+    assert values.tolist() == [float(i) for i in range(15, 25)]
+    assert buffer.stats()['min'] == 15.0
+
+
+def test_get_stats_unknown_pair_does_not_allocate():
+    analytics = ArbitrageAnalytics()
+
+    stats = analytics.get_stats('binance', 'BTC/USDT')
+
+    assert stats['count'] == 0 and math.isnan(stats['mean'])
+    assert analytics.buffers == {}
+
+
+def test_aggregated_stats_have_the_per_pair_shape():
+    analytics = ArbitrageAnalytics(capacity=100)
+    now = time.time()
+    for i in range(10):
+        analytics.record_spread(1.0 + i, 'binance', 'BTC/USDT', timestamp=now + i)
+        analytics.record_spread(20.0 + i, 'kraken', 'BTC/USDT', timestamp=now + i)
+
+    per_pair = analytics.buffers[('binance', 'BTC/USDT')].stats()
+    aggregated = analytics.get_stats(pair='BTC/USDT')
+    values = np.concatenate([np.arange(1.0, 11.0), np.arange(20.0, 30.0)])
+
+    assert set(aggregated) == set(per_pair)
+    assert aggregated['count'] == 20
+    assert aggregated['mean'] == pytest.approx(values.mean())
+    assert aggregated['std'] == pytest.approx(values.std())
+    # Percentile au rang le plus proche sur l'union des fenêtres
+    assert aggregated['p50'] == pytest.approx(np.quantile(values, 0.5, method='inverted_cdf'), rel=0.02)
+
+
+def test_histogram_percentiles_track_evictions_and_negative_spreads():
+    buffer = SpreadRingBuffer(capacity=100, window=1e9)
+    for i in range(300):
+        buffer.append(-5.0 if i < 200 else 0.01 * (i - 200), timestamp=float(i))
+
+    _, values = buffer.view()
+    stats = buffer.stats()
+    assert buffer.histogram.counts.sum() == 100
+    assert stats['p50'] == pytest.approx(np.quantile(values, 0.5), rel=0.02)
+    assert stats['p99'] <= stats['max'] == pytest.approx(0.99)
+
+
+def test_moments_are_resynced_every_turn():
+    buffer = SpreadRingBuffer(capacity=10, window=1e9)
+    for i in range(10):
+        buffer.append(1e12 if i == 0 else 1.0, timestamp=float(i))
+    for i in range(10, 20):
+        buffer.append(1.0, timestamp=float(i))
+
+    stats = buffer.stats()
+    assert buffer._sum == 10.0
+    assert stats['std'] == 0.0
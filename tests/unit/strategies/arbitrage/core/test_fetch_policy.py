@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from src.strategies.arbitrage.core.fetch_policy import CircuitOpenError, FetchPolicy
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_failure_budget():
+    policy = FetchPolicy(retries=3, base_delay=0.001, failure_budget=2, cooldown=60)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError('down')
+
+    with pytest.raises(CircuitOpenError):
+        await policy.call('binance', failing)
+    # Deux échecs ouvrent le circuit : la troisième tentative n'est pas envoyée
+    assert len(calls) == 2
+
+    with pytest.raises(CircuitOpenError):
+        await policy.call('binance', lambda: 'ok')
+    stats = policy.get_stats()['binance']
+    assert stats['circuit'] == 'open'
+    assert stats['rejected'] == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_recovers_and_records_latency():
+    policy = FetchPolicy(retries=3, base_delay=0.001)
+    attempts = {'n': 0}
+
+    async def flaky():
+        attempts['n'] += 1
+        if attempts['n'] < 2:
+            raise TimeoutError('slow')
+        return 42
+
+    assert await policy.call('okx', flaky) == 42
+    stats = policy.get_stats()['okx']
+    assert stats['successes'] == 1
+    assert stats['failures'] == 1
+    assert stats['p95_ms'] is not None
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_over_slow_primary():
+    policy = FetchPolicy(hedge=True, hedge_min_samples=3, timeout=5)
+    calls = {'n': 0}
+
+    async def fetch():
+        calls['n'] += 1
+        # Les 3 premiers appels servent d'échantillon, le 4e est lent, le doublon rapide
+        await asyncio.sleep(2 if calls['n'] == 4 else 0.01)
+        return calls['n']
+
+    for _ in range(3):
+        await policy.call('gateio', fetch)
+
+    assert await policy.call('gateio', fetch) == 5
+    stats = policy.get_stats()['gateio']
+    assert stats['hedged'] == 1
+    assert stats['hedge_wins'] == 1
+
+
+@pytest.mark.asyncio
+async def test_zero_retries_still_makes_one_attempt():
+    policy = FetchPolicy(retries=0)
+
+    assert await policy.call('kraken', lambda: 'ok') == 'ok'
+
+    def failing():
+        raise ConnectionError('down')
+
+    with pytest.raises(ConnectionError):
+        await policy.call('kraken', failing)
+    assert policy.get_stats()['kraken']['failures'] == 1
+
+
+@pytest.mark.asyncio
+async def test_symbol_errors_do_not_count_toward_the_circuit():
+    policy = FetchPolicy(retries=3, base_delay=0.001, failure_budget=1, venue_errors=(ConnectionError,))
+    calls = []
+
+    def bad_symbol():
+        calls.append(1)
+        raise ValueError('Prix invalides')
+
+    with pytest.raises(ValueError):
+        await policy.call('binance', bad_symbol)
+
+    assert calls == [1]                                 # pas de retry
+    assert policy.get_stats()['binance']['circuit'] == 'closed'
+    assert policy.get_stats()['binance']['failures'] == 0
@@ -0,0 +1,148 @@
+import time
+import ccxt
+import pytest
+from src.strategies.arbitrage.core.fetch_policy import CircuitOpenError
+from src.strategies.arbitrage.core.real_arbitrage import USDCArbitrage
+
+
+class FakeExchange:
+    id = 'binance'
+
+    def __init__(self, tickers, books, has=None):
+        self.tickers = tickers
+        self.books = books
+        self.has = has if has is not None else {'fetchBidsAsks': True}
+        self.book_calls = []
+
+    def load_markets(self):
+        return {symbol: {'symbol': symbol, 'active': True, 'spot': True} for symbol in self.tickers}
+
+    def fetch_bids_asks(self, symbols):
+        return {symbol: self.tickers[symbol] for symbol in symbols}
+
+    def fetch_order_book(self, symbol, params=None):
+        self.book_calls.append(symbol)
+        bid, ask = self.books[symbol]
+        return {'bids': [[bid, 1.0]], 'asks': [[ask, 1.0]]}
+
+
+def strategy(exchange, **config):
+    arbitrage = USDCArbitrage({'exchanges': [], 'use_universe': False, 'min_spread': 0.01, **config})
+    arbitrage.exchanges = {exchange.id: exchange}
+    return arbitrage
+
+
+TICKERS = {
+    'BTC/USDC': {'bid': 98.0, 'ask': 100.0},       # 2 %
+    'ETH/USDC': {'bid': 99.9, 'ask': 100.0},       # 0.1 %
+    'SOL/USDC': {'bid': None, 'ask': 10.0},        # incomplet
+    'XRP/USDC': {'bid': 2.0, 'ask': 1.0},          # croisé
+}
+
+
+def test_shortlist_spreads_keeps_only_valid_wide_spreads():
+    arbitrage = strategy(FakeExchange(TICKERS, {}))
+
+    assert arbitrage._shortlist_spreads(TICKERS, list(TICKERS)) == ['BTC/USDC']
+    assert arbitrage._shortlist_spreads({}, ['BTC/USDC']) == []
+
+
+def test_bulk_scan_confirms_only_shortlisted_pairs_on_the_book():
+    exchange = FakeExchange(TICKERS, {'BTC/USDC': (97.0, 100.0), 'ETH/USDC': (99.9, 100.0)})
+    arbitrage = strategy(exchange)
+
+    opportunities = arbitrage.scan_all_pairs(bulk=True)
+
+    assert exchange.book_calls == ['BTC/USDC']
+    assert opportunities == {'binance:BTC/USDC': pytest.approx(0.03)}
+
+
+def test_scan_without_bulk_endpoint_checks_every_pair():
+    exchange = FakeExchange(TICKERS, {'BTC/USDC': (97.0, 100.0), 'ETH/USDC': (99.9, 100.0),
+                                      'SOL/USDC': (9.9, 10.0), 'XRP/USDC': (0.995, 1.0)}, has={})
+    arbitrage = strategy(exchange)
+
+    assert list(arbitrage.scan_all_pairs(bulk=True)) == ['binance:BTC/USDC']
+    assert sorted(exchange.book_calls) == sorted(TICKERS)
+
+
+def test_universe_wiring_resolves_usdc_pairs():
+    exchange = FakeExchange(TICKERS, {})
+    arbitrage = USDCArbitrage({'exchanges': [], 'min_spread': 0.01})
+    arbitrage.exchanges = {exchange.id: exchange}
+    arbitrage.universe_builder.exchanges = arbitrage.exchanges
+
+    assert sorted(arbitrage._get_usdc_symbols('binance', exchange)) == sorted(TICKERS)
+
+
+class FlakyExchange(FakeExchange):
+    """Carnet en échec selon errors (une exception par appel), puis lent/rapide selon delays"""
+
+    def __init__(self, errors=(), delays=()):
+        super().__init__({}, {})
+        self.errors = list(errors)
+        self.delays = list(delays)
+
+    def fetch_order_book(self, symbol, params=None):
+        self.book_calls.append(symbol)
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'bids': [[99.0, 1.0]], 'asks': [[100.0, 1.0]]}
+
+    def fetch_ticker(self, symbol):
+        raise ccxt.NetworkError('ticker indisponible')
+
+    def fetch_trades(self, symbol, limit=None):
+        raise ccxt.NetworkError('trades indisponibles')
+
+
+def test_venue_errors_open_the_circuit():
+    exchange = FlakyExchange(errors=[ccxt.NetworkError('down')] * 10)
+    arbitrage = strategy(exchange, failure_budget=2, retry_base_delay=0.001)
+
+    # Carnet puis ticker en échec réseau : le circuit s'ouvre avant les trades
+    with pytest.raises(CircuitOpenError):
+        arbitrage._safe_fetch_prices(exchange, 'BTC/USDC')
+    assert arbitrage.get_fetch_stats()['binance']['circuit'] == 'open'
+    with pytest.raises(CircuitOpenError):
+        arbitrage._safe_fetch_prices(exchange, 'BTC/USDC')
+    assert len(exchange.book_calls) == 1
+
+
+def test_symbol_errors_leave_the_circuit_closed():
+    exchange = FlakyExchange(errors=[ccxt.BadSymbol('inconnu')] * 10)
+    arbitrage = strategy(exchange, failure_budget=2, retry_base_delay=0.001)
+    exchange.fetch_ticker = exchange.fetch_trades = lambda *args, **kwargs: (_ for _ in ()).throw(ValueError('vide'))
+
+    with pytest.raises(ConnectionError) as excinfo:
+        arbitrage._safe_fetch_prices(exchange, 'BTC/USDC', retries=2)
+
+    assert not isinstance(excinfo.value, CircuitOpenError)
+    assert len(exchange.book_calls) == 2
+    assert arbitrage.fetch_policy.is_available('binance')
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_hedges_a_slow_order_book():
+    exchange = FlakyExchange(delays=[0.5, 0.0])
+    arbitrage = strategy(exchange, hedge_requests=True)
+    # Historique de latences rapides : la requête doublée part après le p95
+    arbitrage.fetch_policy._venue('binance')[0].latencies.extend([0.01] * 20)
+
+    assert await arbitrage._safe_fetch_prices_async(exchange, 'BTC/USDC') == (99.0, 100.0)
+
+    stats = arbitrage.get_fetch_stats()['binance']
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 1
+    assert exchange.book_calls == ['BTC/USDC', 'BTC/USDC']
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_stops_on_open_circuit():
+    exchange = FlakyExchange(errors=[ccxt.NetworkError('down')] * 10)
+    arbitrage = strategy(exchange, failure_budget=2, retry_base_delay=0.001)
+
+    with pytest.raises(CircuitOpenError):
+        await arbitrage._safe_fetch_prices_async(exchange, 'BTC/USDC')
+    assert len(exchange.book_calls) == 2
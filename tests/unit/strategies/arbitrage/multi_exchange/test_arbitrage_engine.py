@@ -0,0 +1,112 @@
+import asyncio
+from src.strategies.arbitrage.multi_exchange.core import arbitrage_engine
+from src.strategies.arbitrage.multi_exchange.core.arbitrage_engine import MultiExchangeArbitrage
+from src.strategies.arbitrage.multi_exchange.services.staleness import StalenessPolicy
+
+PAIRS = ['BTC/USDC', 'BTC/USDT']
+
+
+def book(bid, ask):
+    return {'bids': [[bid, 1.0]], 'asks': [[ask, 2.0]], 'timestamp': None}
+
+
+class FakeAsyncExchange:
+    def __init__(self, name, books, has=None, bulk_error=None, error=None):
+        self.id = name
+        self.books = books
+        self.has = has or {}
+        self.bulk_error = bulk_error
+        self.error = error
+        self.calls = []
+
+    async def fetch_order_books(self, pairs):
+        self.calls.append(('bulk', tuple(pairs)))
+        if self.bulk_error:
+            raise self.bulk_error
+        return {pair: dict(self.books[pair]) for pair in pairs}
+
+    async def fetch_order_book(self, pair):
+        self.calls.append(('single', pair))
+        if self.error:
+            raise self.error
+        return dict(self.books[pair])
+
+    async def close(self):
+        pass
+
+
+def engine_with(*venues):
+    # Sans __init__ : pas de clients ccxt réels
+    engine = MultiExchangeArbitrage.__new__(MultiExchangeArbitrage)
+    engine.threshold = 0.1
+    engine.staleness_policy = StalenessPolicy(5.0)
+    engine.sync_staleness_policy = None
+    engine.exchanges = {venue.id: None for venue in venues}
+    engine.async_exchanges = {venue.id: venue for venue in venues}
+    return engine
+
+
+BOOKS = {'BTC/USDC': book(101.0, 101.5), 'BTC/USDT': book(99.5, 100.0)}
+
+
+def test_async_check_uses_bulk_endpoint_and_keeps_other_venues_on_failure():
+    bulk = FakeAsyncExchange('binance', BOOKS, has={'fetchOrderBooks': True})
+    down = FakeAsyncExchange('okx', BOOKS, error=ConnectionError('timeout'))
+    engine = engine_with(bulk, down)
+
+    opportunities = asyncio.run(engine.check_arbitrage_async())
+
+    assert bulk.calls == [('bulk', tuple(PAIRS))]
+    assert [opp['exchange'] for opp in opportunities] == ['binance']
+    assert opportunities[0]['spread'] == (101.0 / 100.0 - 1) * 100
+
+
+def test_failing_bulk_endpoint_falls_back_to_per_pair_fetches():
+    venue = FakeAsyncExchange('gateio', BOOKS, has={'fetchOrderBooks': True},
+                              bulk_error=RuntimeError('not supported'))
+    engine = engine_with(venue)
+
+    opportunities = asyncio.run(engine.check_arbitrage_async())
+
+    assert venue.calls[0][0] == 'bulk'
+    assert sorted(call for call in venue.calls[1:]) == [('single', pair) for pair in PAIRS]
+    assert len(opportunities) == 1 and opportunities[0]['exchange'] == 'gateio'
+
+
+def test_next_deadline_keeps_fixed_grid_and_skips_missed_ticks(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(arbitrage_engine.time, 'monotonic', lambda: now[0])
+
+    # Fetch plus court que l'intervalle : échéance suivante sur la grille
+    assert MultiExchangeArbitrage._next_deadline(95.0, 10.0) == 105.0
+    # Fetch de 27 s avec un intervalle de 10 s : les ticks 105/115 sont sautés
+    now[0] = 122.0
+    assert MultiExchangeArbitrage._next_deadline(95.0, 10.0) == 125.0
+
+
+class SlowSyncExchange:
+    """Client ccxt synchrone dont chaque book prend 2 s (horloge simulée)"""
+
+    def __init__(self, clock):
+        self.clock = clock
+
+    def fetch_order_book(self, pair):
+        self.clock[0] += 2.0
+        return dict(BOOKS[pair])
+
+
+def test_sync_check_does_not_expire_sequentially_fetched_books(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(arbitrage_engine.time, 'time', lambda: clock[0])
+    engine = engine_with()
+    engine.staleness_policy = StalenessPolicy(1.0)
+    engine.exchanges = {'binance': SlowSyncExchange(clock)}
+
+    opportunities = engine.check_arbitrage()
+
+    # Le premier book a 2 s : annoté, mais conservé sans budget synchrone
+    assert [opp['exchange'] for opp in opportunities] == ['binance']
+    assert opportunities[0]['oldest_leg_age_ms'] == 2000.0
+
+    engine.sync_staleness_policy = StalenessPolicy(1.0)
+    assert engine.check_arbitrage() == []
@@ -0,0 +1,250 @@
+import pytest
+import time
+from decimal import Decimal
+from src.exchanges.base_exchange import BaseExchange
+from src.strategies.arbitrage.multi_exchange.arbitrage_scanner import ArbitrageScanner
+from src.strategies.arbitrage.multi_exchange.fee_calculator import FeeCalculator
+from src.strategies.arbitrage.multi_exchange.services.order_book_fetcher import OrderBookFetcher
+from src.strategies.arbitrage.multi_exchange.services.staleness import StalenessPolicy
+
+
+def make_exchange(name, books):
+    """Crée un exchange factice renvoyant des order books fixes par symbole"""
+    def get_order_book(self, symbol):
+        return books[symbol]
+
+    cls = type(name, (BaseExchange,), {
+        'get_ticker': lambda self, symbol: {},
+        'get_balance': lambda self: {},
+        'place_order': lambda self, *args, **kwargs: {},
+        'get_order_book': get_order_book,
+    })
+    return cls('key', 'secret')
+
+
+def book(bid, ask, size='5'):
+    return {
+        'bids': [[Decimal(bid), Decimal(size)]],
+        'asks': [[Decimal(ask), Decimal(size)]]
+    }
+
+
+@pytest.fixture
+def exchanges():
+    return [
+        make_exchange('ExA', {'BTC/USDT': book('50000', '50010'), 'ETH/USDT': book('3000', '3001')}),
+        make_exchange('ExB', {'BTC/USDT': book('50200', '50210'), 'ETH/USDT': book('2990', '2991')}),
+        make_exchange('ExC', {'BTC/USDT': book('49900', '49950', size='0.5'), 'ETH/USDT': book('3010', '3011')}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_matrix_scan_matches_loop_scan(exchanges):
+    scanner = ArbitrageScanner(exchanges, min_profit_threshold=Decimal('0.001'))
+
+    expected = []
+    for symbol in ['BTC/USDT', 'ETH/USDT']:
+        expected.extend(await scanner.scan_opportunities(symbol))
+    expected.sort(key=lambda x: x['net_profit'], reverse=True)
+
+    result = await scanner.scan_opportunities_matrix(['BTC/USDT', 'ETH/USDT'])
+
+    timing = {'legs', 'oldest_leg_age_ms', 'oldest_leg_venue', 'freshness'}
+    strip = lambda opps: [{k: v for k, v in o.items() if k not in timing} for o in opps]
+    assert strip(result) == strip(expected)
+    assert result[0]['buy_exchange'] == 'ExA'
+    assert result[0]['sell_exchange'] == 'ExB'
+
+
+@pytest.mark.asyncio
+async def test_incremental_scan_returns_the_full_scan_schema(exchanges):
+    scanner = ArbitrageScanner(exchanges, min_profit_threshold=Decimal('0.001'))
+
+    expected = []
+    for symbol in ['BTC/USDT', 'ETH/USDT']:
+        expected.extend(await scanner.scan_opportunities(symbol))
+    expected.sort(key=lambda x: x['net_profit'], reverse=True)
+
+    result = await scanner.scan_incremental(['BTC/USDT', 'ETH/USDT'])
+
+    assert [list(o) for o in result] == [list(o) for o in expected]
+    timing = {'legs', 'oldest_leg_age_ms', 'oldest_leg_venue', 'freshness'}
+    # Ordre indifférent entre opportunités de même profit net
+    strip = lambda opps: sorted(({k: v for k, v in o.items() if k not in timing} for o in opps),
+                                key=lambda o: (-o['net_profit'], o['buy_exchange'], o['sell_exchange']))
+    assert strip(result) == strip(expected)
+    # Les entrées du moteur ne reçoivent pas l'annotation de fraîcheur
+    assert all('freshness' not in o for o in scanner.incremental_engine.opportunities.values())
+
+
+@pytest.mark.asyncio
+async def test_matrix_scan_top_k_and_size_filter(exchanges):
+    scanner = ArbitrageScanner(exchanges, min_profit_threshold=Decimal('0.001'))
+
+    result = await scanner.scan_opportunities_matrix(['BTC/USDT', 'ETH/USDT'], top_k=1)
+    assert len(result) == 1
+
+    # ExC n'a que 0.5 BTC au meilleur niveau : exclu pour un trade de 1 BTC
+    result = await scanner.scan_opportunities_matrix(['BTC/USDT'])
+    assert all('ExC' not in (o['buy_exchange'], o['sell_exchange']) for o in result)
+
+
+@pytest.mark.asyncio
+async def test_scan_drops_late_and_failing_exchanges(exchanges):
+    class SlowBooks(dict):
+        def __getitem__(self, symbol):
+            time.sleep(0.5)
+            return book('60000', '60010')
+
+    class FailingBooks(dict):
+        def __getitem__(self, symbol):
+            raise ConnectionError('down')
+
+    venues = exchanges[:2] + [make_exchange('Slow', SlowBooks()), make_exchange('Down', FailingBooks())]
+    fetcher = OrderBookFetcher(exchange_timeout=2.0, scan_deadline=0.2)
+    scanner = ArbitrageScanner(venues, min_profit_threshold=Decimal('0.001'), fetcher=fetcher)
+
+    result = await scanner.scan_opportunities('BTC/USDT')
+
+    assert [(o['buy_exchange'], o['sell_exchange']) for o in result] == [('ExA', 'ExB')]
+    report = {r['exchange']: r for r in scanner.get_scan_report()}
+    assert report['Slow']['status'] == 'dropped'
+    assert report['Down']['status'] == 'error'
+    assert report['ExA']['status'] == 'ok'
+    assert report['ExA']['staleness_ms'] >= 0
+
+
+@pytest.mark.asyncio
+async def test_depth_aware_scan_uses_vwap_and_optimal_size():
+    deep_asks = {'bids': [[Decimal('99'), Decimal('1')]],
+                 'asks': [[Decimal('100'), Decimal('1')], [Decimal('101'), Decimal('2')], [Decimal('103'), Decimal('5')]]}
+    deep_bids = {'bids': [[Decimal('104'), Decimal('1')], [Decimal('102'), Decimal('1')],
+                          [Decimal('101.5'), Decimal('3')], [Decimal('99'), Decimal('10')]],
+                 'asks': [[Decimal('105'), Decimal('1')]]}
+    scanner = ArbitrageScanner(
+        [make_exchange('Buy', {'X/USDT': deep_asks}), make_exchange('Sell', {'X/USDT': deep_bids})],
+        min_profit_threshold=Decimal('0.001')
+    )
+
+    # Le meilleur niveau ne suffit pas pour 2 unités : seul le mode profondeur les voit
+    assert await scanner.scan_opportunities('X/USDT', trade_amount=Decimal('2')) == []
+    result = await scanner.scan_opportunities('X/USDT', trade_amount=Decimal('2'), depth_aware=True)
+
+    assert len(result) == 1
+    assert result[0]['buy_price'] == Decimal('100.5')
+    assert result[0]['sell_price'] == Decimal('103.0')
+    assert result[0]['optimal_amount'] == Decimal('3.0')
+    assert result[0]['optimal_profit'] == Decimal('5.5')
+
+
+@pytest.mark.asyncio
+async def test_matrix_scan_filters_on_net_profit_with_fee_table(exchanges):
+    fee_calculator = FeeCalculator()
+    # 0.5% sur ExC rend A -> C non rentable, B -> C reste juste au-dessus du seuil
+    fee_calculator.fee_table.set_fees('ExA', '*', maker=0.0, taker=0.0)
+    fee_calculator.fee_table.set_fees('ExB', '*', maker=0.0, taker=0.0)
+    fee_calculator.fee_table.set_fees('ExC', '*', maker=0.005, taker=0.005)
+    fee_calculator.fee_table.mark_refreshed()
+    scanner = ArbitrageScanner(exchanges, min_profit_threshold=Decimal('0.001'),
+                               fee_calculator=fee_calculator)
+
+    result = await scanner.scan_opportunities_matrix(['BTC/USDT', 'ETH/USDT'])
+    pairs = [(o['buy_exchange'], o['sell_exchange'], o['symbol']) for o in result]
+
+    assert pairs == [('ExA', 'ExB', 'BTC/USDT'), ('ExB', 'ExA', 'ETH/USDT'), ('ExB', 'ExC', 'ETH/USDT')]
+    assert result[0]['total_fees'] == Decimal('0.0')
+    assert float(result[2]['total_fees']) == pytest.approx(3010 * 0.005)
+    assert result[2]['net_profit'] == result[2]['gross_profit'] - result[2]['total_fees']
+
+
+def test_batch_net_profit_matches_scalar_formula():
+    fee_calculator = FeeCalculator()
+    fee_calculator.fee_table.set_fees('ExA', 'BTC/USDT', maker=0.0005, taker=0.001)
+    fee_calculator.fee_table.set_withdrawal_fee('ExA', 'BTC', 0.0002)
+
+    result = fee_calculator.calculate_net_profits_batch(
+        ['ExA', 'ExB'], ['ExB', 'ExA'], ['BTC/USDT', 'BTC/USDT'],
+        [1.0, 2.0], [100.0, 100.0], [101.0, 100.5]
+    )
+
+    assert result['buy_fees'].tolist() == pytest.approx([0.1, 0.2])
+    assert result['sell_fees'].tolist() == pytest.approx([0.101, 0.201])
+    assert result['transfer_fees'].tolist() == pytest.approx([0.0202, 0.0])
+    assert result['net_profit'].tolist() == pytest.approx([1 - 0.1 - 0.101 - 0.0202, 1 - 0.2 - 0.201])
+    assert result['is_profitable'].tolist() == [True, True]
+
+
+@pytest.mark.asyncio
+async def test_refresh_fee_table_loads_withdrawals_and_falls_back_to_tier_zero(exchanges):
+    class VenueFees(FeeCalculator):
+        async def _fetch_trading_fees(self, exchange):
+            return {'BTC/USDT': {'maker': 0.0002, 'taker': 0.0004}}
+
+        async def _fetch_withdrawal_fees(self, exchange):
+            return {'BTC': 0.0005}
+
+    fee_calculator = VenueFees()
+    table = await fee_calculator.refresh_fee_table(exchanges[:1])
+
+    assert table.withdrawal_fees(['ExA'], ['BTC/USDT']).tolist() == [0.0005]
+    # Tier inconnu : taux du tier 0, pas le taux par défaut
+    assert table.rate('ExA', 'BTC/USDT', tier=3) == 0.0004
+    assert table.rate('ExA', 'BTC/USDT', tier=3, side='maker') == 0.0002
+    table.set_fees('ExA', 'BTC/USDT', maker=0.0001, taker=0.0002, tier=3)
+    assert table.rate('ExA', 'BTC/USDT', tier=3) == 0.0002
+    assert table.rate('ExB', 'BTC/USDT', tier=3) == table.default_taker
+
+
+@pytest.mark.asyncio
+async def test_scalar_fees_use_the_fee_table_like_the_batch_path(exchanges):
+    class VenueFees(FeeCalculator):
+        fetches = 0
+
+        async def _fetch_trading_fees(self, exchange):
+            self.fetches += 1
+            return {'BTC/USDT': {'maker': 0.0005, 'taker': 0.001}}
+
+        async def _fetch_withdrawal_fees(self, exchange):
+            return {'BTC': 0.0002} if exchange.__class__.__name__ == 'ExA' else {}
+
+    fee_calculator = VenueFees()
+    buy, sell = exchanges[0], exchanges[1]
+
+    fees = await fee_calculator.calculate_total_fees(
+        buy, sell, 'BTC/USDT', Decimal('1'), Decimal('100'), Decimal('101'))
+    batch = fee_calculator.calculate_net_profits_batch(
+        [buy], [sell], ['BTC/USDT'], 1.0, 100.0, 101.0)
+
+    assert all(isinstance(fees[key], Decimal) for key in ('buy_fees', 'sell_fees', 'transfer_fees'))
+    for key in ('buy_fees', 'sell_fees', 'transfer_fees', 'net_profit'):
+        assert float(fees[key]) == pytest.approx(batch[key][0])
+    assert fees['transfer_fees'] == Decimal('0.0002') * Decimal('101')
+
+    await fee_calculator.calculate_total_fees(
+        buy, sell, 'BTC/USDT', Decimal('1'), Decimal('100'), Decimal('101'))
+    # Un chargement par exchange, réutilisé jusqu'à l'expiration du TTL
+    assert fee_calculator.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_exchange_timestamp_expires_opportunity(exchanges):
+    stale = book('50200', '50210')
+    stale['timestamp'] = (time.time() - 5) * 1000
+    exchanges[1] = make_exchange('ExB', {'BTC/USDT': stale, 'ETH/USDT': book('2990', '2991')})
+    scanner = ArbitrageScanner(exchanges, min_profit_threshold=Decimal('0.001'),
+                               staleness_policy=StalenessPolicy(budget=1.0))
+
+    result = await scanner.scan_opportunities_matrix(['BTC/USDT', 'ETH/USDT'])
+
+    assert all(o['symbol'] != 'BTC/USDT' or 'ExB' not in (o['buy_exchange'], o['sell_exchange'])
+               for o in result)
+    assert all(o['freshness'] == 1.0 for o in result)
+    metrics = scanner.get_staleness_metrics()
+    assert metrics['expired'] >= 1
+    assert metrics['stale_by_venue']['ExB'] >= 1
+    assert (await scanner.execute_arbitrage({
+        'buy_exchange': 'ExA', 'sell_exchange': 'ExB', 'symbol': 'BTC/USDT',
+        'amount': Decimal('1'), 'buy_price': Decimal('50010'), 'sell_price': Decimal('50200'),
+        'legs': [{'venue': 'ExB', 'symbol': 'BTC/USDT', 'received_at': time.time() - 5,
+                  'exchange_timestamp': None}]
+    }))['status'] == 'expired'
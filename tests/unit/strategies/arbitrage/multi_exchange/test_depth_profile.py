@@ -0,0 +1,19 @@
+import pytest
+from src.strategies.arbitrage.multi_exchange.utils.depth_profile import DepthProfile
+
+
+def test_vwap_walks_the_levels():
+    profile = DepthProfile([[100, 1], [101, 2]], 'asks')
+
+    assert profile.depth == 3
+    assert profile.vwap(2) == pytest.approx((100 + 101) / 2)
+    assert profile.notional(4) == float('inf')
+
+
+def test_three_element_levels_keep_price_and_size():
+    # Kraken/Bitfinex : [prix, quantité, horodatage ou nombre d'ordres]
+    profile = DepthProfile([[100, 1, 1_700_000_000], [101, 2, 1_700_000_001]], 'asks')
+
+    assert profile.prices.tolist() == [100.0, 101.0]
+    assert profile.sizes.tolist() == [1.0, 2.0]
+    assert profile.vwap(3) == pytest.approx((100 + 202) / 3)
@@ -0,0 +1,69 @@
+import random
+from src.strategies.arbitrage.multi_exchange.core.incremental_engine import (
+    IncrementalArbitrageEngine,
+    IndexedMaxHeap,
+)
+
+
+def test_indexed_heap_matches_sorted_order():
+    heap = IndexedMaxHeap()
+    reference = {}
+    rng = random.Random(7)
+    for _ in range(500):
+        key = rng.randrange(50)
+        if rng.random() < 0.2:
+            heap.remove(key)
+            reference.pop(key, None)
+        else:
+            priority = rng.random()
+            heap.push(key, priority)
+            reference[key] = priority
+
+    expected = sorted(reference.items(), key=lambda item: item[1], reverse=True)
+    assert heap.top() == expected
+    assert heap.top(5) == expected[:5]
+
+
+def test_only_dirty_entries_are_rescored():
+    engine = IncrementalArbitrageEngine(min_profit_ratio=0.001)
+    for exchange, bid, ask in [('a', 100.0, 100.1), ('b', 100.5, 100.6), ('c', 99.0, 99.1)]:
+        engine.update(exchange, 'BTC/USDT', bid, 1.0, ask, 1.0)
+        engine.update(exchange, 'ETH/USDT', 10.0, 1.0, 10.01, 1.0)
+
+    assert engine.recompute() == 12
+    best = engine.best()
+    assert [(o['buy_exchange'], o['sell_exchange']) for o in best] == [('c', 'b'), ('c', 'a'), ('a', 'b')]
+
+    # Book inchangé : rien à recalculer
+    assert engine.update('a', 'BTC/USDT', 100.0, 1.0, 100.1, 1.0) is False
+    assert engine.recompute() == 0
+
+    # Seules les 4 paires impliquant (c, BTC) sont réévaluées
+    engine.update('c', 'BTC/USDT', 100.2, 1.0, 100.5, 1.0)
+    assert engine.recompute() == 4
+    assert [(o['buy_exchange'], o['sell_exchange']) for o in engine.best()] == [('a', 'b')]
+
+
+def test_remove_drops_opportunities():
+    engine = IncrementalArbitrageEngine(min_profit_ratio=0.001)
+    engine.update_book('a', 'X', {'bids': [[10.0, 1]], 'asks': [[10.0, 1]]})
+    engine.update_book('b', 'X', {'bids': [[10.5, 1]], 'asks': [[10.6, 1]]})
+    assert len(engine.best()) == 1
+
+    engine.update_book('b', 'X', {'bids': [], 'asks': []})
+    assert engine.best() == []
+
+
+def test_unchanged_book_refreshes_opportunity_timestamps():
+    engine = IncrementalArbitrageEngine(min_profit_ratio=0.001)
+    engine.update('a', 'X', 10.0, 1.0, 10.0, 1.0, timestamp=100.0)
+    engine.update('b', 'X', 10.5, 1.0, 10.6, 1.0, timestamp=100.0)
+    assert engine.best()[0]['timestamp'] == 100.0
+
+    # Cotations reconfirmées : l'opportunité n'expire pas sur des données fraîches
+    engine.update('a', 'X', 10.0, 1.0, 10.0, 1.0, timestamp=105.0)
+    engine.update('b', 'X', 10.5, 1.0, 10.6, 1.0, timestamp=106.0)
+    assert engine.recompute() == 0
+    opportunity = engine.best()[0]
+    assert opportunity['timestamp'] == 105.0
+    assert [leg['received_at'] for leg in opportunity['legs']] == [105.0, 106.0]
@@ -0,0 +1,91 @@
+import json
+import pytest
+from src.strategies.arbitrage.analytics.pairs_config import get_symbol
+from src.strategies.arbitrage.multi_exchange.services.market_universe import SNAPSHOT_VERSION, UniverseBuilder
+
+
+class FakeExchange:
+    def __init__(self, markets, fail=False):
+        self.markets = markets
+        self.fail = fail
+        self.calls = 0
+
+    def load_markets(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('down')
+        return self.markets
+
+
+def market(base, quote, native_id, active=True):
+    return {
+        'symbol': f"{base}/{quote}", 'id': native_id, 'base': base, 'quote': quote,
+        'active': active, 'spot': True,
+        'precision': {'price': 0.01, 'amount': 0.0001},
+        'limits': {'amount': {'min': 0.0001}, 'cost': {'min': 5}}
+    }
+
+
+def make_exchanges():
+    return {
+        'binance': FakeExchange({'BTC/USDT': market('BTC', 'USDT', 'BTCUSDT'),
+                                 'ETH/USDT': market('ETH', 'USDT', 'ETHUSDT')}),
+        'gateio': FakeExchange({'BTC/USDT': market('BTC', 'USDT', 'BTC_USDT'),
+                                'ETH/USDT': market('ETH', 'USDT', 'ETH_USDT', active=False)}),
+    }
+
+
+def test_universe_translates_and_finds_common_pairs(tmp_path):
+    builder = UniverseBuilder(make_exchanges(), snapshot_path=tmp_path / 'universe.json')
+    universe = builder.build()
+
+    assert universe.to_native('gateio', 'BTC/USDT') == 'BTC_USDT'
+    assert universe.to_unified('binance', 'ETHUSDT') == 'ETH/USDT'
+    assert universe.common_pairs() == {'BTC/USDT': ['binance', 'gateio']}
+    assert universe.rules('binance', 'BTC/USDT').min_cost == 5
+    assert json.loads((tmp_path / 'universe.json').read_text())['version'] == SNAPSHOT_VERSION
+
+
+def test_fresh_snapshot_skips_load_markets(tmp_path):
+    path = tmp_path / 'universe.json'
+    UniverseBuilder(make_exchanges(), snapshot_path=path).build()
+
+    exchanges = make_exchanges()
+    builder = UniverseBuilder(exchanges, snapshot_path=path, max_age=3600)
+    universe = builder.load()
+
+    assert universe.to_native('binance', 'BTC/USDT') == 'BTCUSDT'
+    assert all(exchange.calls == 0 for exchange in exchanges.values())
+
+
+def test_failed_exchange_keeps_previous_markets(tmp_path):
+    exchanges = make_exchanges()
+    builder = UniverseBuilder(exchanges, snapshot_path=tmp_path / 'universe.json')
+    builder.build()
+
+    exchanges['gateio'].fail = True
+    universe = builder.build()
+
+    assert 'gateio' in builder.errors
+    assert universe.to_native('gateio', 'BTC/USDT') == 'BTC_USDT'
+
+
+def test_derivatives_keep_settle_and_unknown_activity_is_excluded():
+    swap = dict(market('BTC', 'USDT', 'BTC-USDT-SWAP'), symbol='BTC/USDT:USDT', spot=False, type='swap')
+    unknown = market('SOL', 'USDT', 'SOL-USDT', active=None)
+    exchanges = {'okx': FakeExchange({'BTC/USDT': market('BTC', 'USDT', 'BTC-USDT'),
+                                      'BTC/USDT:USDT': swap, 'SOL/USDT': unknown})}
+
+    universe = UniverseBuilder(exchanges, spot_only=False).build()
+
+    assert universe.to_native('okx', 'BTC/USDT') == 'BTC-USDT'
+    assert universe.to_native('okx', 'BTC/USDT:USDT') == 'BTC-USDT-SWAP'
+    assert universe.symbols('okx') == ['BTC/USDT', 'BTC/USDT:USDT']
+
+
+def test_get_symbol_raises_value_error_for_unlisted_pair():
+    universe = UniverseBuilder(make_exchanges()).build()
+
+    assert get_symbol('gateio', 'BTC', universe) == 'BTC_USDT'
+    with pytest.raises(ValueError):
+        get_symbol('gateio', 'DOGE', universe)
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from src.utils.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_per_key_ttl():
+    clock = Clock()
+    cache = TTLCache(maxsize=2, ttl=10.0, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=1.0)
+    assert cache.get('a') == 1                  # 'a' devient la plus récente
+    cache.set('c', 3)                           # évince 'b'
+
+    assert 'b' not in cache and cache.get_stats()['evictions'] == 1
+    clock.now = 5.0
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    clock.now = 10.0
+    assert cache.get('a') is None and cache.get_stats()['expirations'] >= 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch():
+    cache = TTLCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'last': 42}
+
+    results = await asyncio.gather(*[cache.get_or_fetch('ticker_BTC', fetch) for _ in range(10)])
+
+    assert calls == [1] and all(result == {'last': 42} for result in results)
+    assert await cache.get_or_fetch('ticker_BTC', fetch) == {'last': 42}
+    stats = cache.get_stats()
+    assert (stats['misses'], stats['coalesced'], stats['hits']) == (1, 9, 1)
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_all_waiters_and_are_not_cached():
+    cache = TTLCache()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0)
+        raise ConnectionError('timeout')
+
+    results = await asyncio.gather(*[cache.get_or_fetch('k', failing) for _ in range(3)],
+                                   return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results) and len(calls) == 1
+
+    async def ok():
+        return 1
+
+    assert await cache.get_or_fetch('k', ok) == 1